@@ -0,0 +1,141 @@
+import asyncio
+import os
+import logging
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Set while the current task holds a slot taken by AnalysisExecutor.admission
+_admitted: ContextVar[bool] = ContextVar("analysis_admitted", default=False)
+
+
+class ExecutorBusyError(Exception):
+    """Raised when the analysis queue is full and the request should be retried later."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Analysis queue is full, please retry later")
+        self.retry_after = retry_after
+
+
+class AnalysisExecutor:
+    """
+    Runs CPU-bound chart analysis off the event loop.
+    Threads are the default since OpenCV releases the GIL; a process pool
+    can be selected for pure-Python heavy workloads. In "pool" mode the
+    threads only decode and dispatch to a pre-forked WorkerPool, one thread
+    per worker process. Admission is bounded so bursts are rejected early
+    instead of piling up behind the workers. A request that runs several
+    steps takes its slot once, through admission(), so it cannot be turned
+    away halfway after doing part of the work.
+    """
+
+    def __init__(self, mode: str = "thread", max_workers: Optional[int] = None,
+                 max_queue: int = 32, retry_after: int = 2):
+        if mode not in ("thread", "process", "pool"):
+            raise ValueError(f"Unknown executor mode: {mode}")
+
+        self.mode = mode
+        # Worker processes scale with cores, in-process pools stay small
+        cores = os.cpu_count() or 1
+        self.max_workers = max_workers or (cores if mode == "pool" else min(4, cores))
+        self.max_queue = max_queue
+        self.retry_after = retry_after
+        self._pending = 0
+        self._pool: Executor = self._create_pool()
+        # Threads for run_local, the process pool cannot reach the API process's state
+        self._local_pool: Executor = (
+            ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="analysis-local")
+            if mode == "process" else self._pool
+        )
+
+        logger.info(f"Analysis executor ready: mode={mode}, workers={self.max_workers}, queue={max_queue}")
+
+    @classmethod
+    def from_env(cls) -> "AnalysisExecutor":
+        """Build an executor from ANALYSIS_* environment variables."""
+        workers = os.getenv("ANALYSIS_WORKERS")
+        return cls(
+            mode=os.getenv("ANALYSIS_EXECUTOR", "thread"),
+            max_workers=int(workers) if workers else None,
+            max_queue=int(os.getenv("ANALYSIS_QUEUE_SIZE", "32")),
+            retry_after=int(os.getenv("ANALYSIS_RETRY_AFTER", "2")),
+        )
+
+    def _create_pool(self) -> Executor:
+        if self.mode == "process":
+            return ProcessPoolExecutor(max_workers=self.max_workers)
+        return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="analysis")
+
+    @property
+    def capacity(self) -> int:
+        """Maximum number of running plus queued tasks."""
+        return self.max_workers + self.max_queue
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Run fn(*args) on the pool and await its result. Outside admission(),
+        raises ExecutorBusyError when running plus queued tasks exceed capacity.
+        """
+        return await self._submit(self._pool, fn, args)
+
+    async def run_local(self, fn: Callable[..., Any], *args: Any) -> Any:
+        """
+        Like run, but always on a thread of the API process, for work on state
+        that lives there. Admission is shared with run.
+        """
+        return await self._submit(self._local_pool, fn, args)
+
+    @asynccontextmanager
+    async def admission(self) -> AsyncIterator[None]:
+        """
+        Hold one slot for every run and run_local call inside the block.
+        Raises ExecutorBusyError on entry when the executor is full; calls
+        inside are never rejected. Nested admissions, and tasks started
+        inside the block, share the outer slot.
+        """
+        if _admitted.get():
+            yield
+            return
+
+        self._admit()
+        token = _admitted.set(True)
+        try:
+            yield
+        finally:
+            _admitted.reset(token)
+            self._pending -= 1
+
+    def _admit(self):
+        # Only touched from the event loop thread, so no lock is needed
+        if self._pending >= self.capacity:
+            raise ExecutorBusyError(self.retry_after)
+        self._pending += 1
+
+    async def _submit(self, pool: Executor, fn: Callable[..., Any], args: tuple) -> Any:
+        loop = asyncio.get_running_loop()
+        if _admitted.get():
+            return await loop.run_in_executor(pool, fn, *args)
+
+        self._admit()
+        try:
+            return await loop.run_in_executor(pool, fn, *args)
+        finally:
+            self._pending -= 1
+
+    def stats(self) -> Dict:
+        """Current queue occupancy."""
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "inFlight": self._pending,
+            "queued": max(0, self._pending - self.max_workers),
+            "capacity": self.capacity,
+        }
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+        if self._local_pool is not self._pool:
+            self._local_pool.shutdown(wait=wait)
@@ -0,0 +1,58 @@
+"""
+Benchmark of the candle extraction engines.
+
+Times each engine on generated charts of increasing density and reports how
+many of the drawn candles it recovered.
+
+    python benchmark_extractors.py --charts 10
+"""
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from candlestick_analyzer import EXTRACTORS, CandlestickAnalyzer
+from test_concurrency import draw_chart
+
+# (candles, width, height) per scenario
+SCENARIOS = [
+    (40, 800, 500),
+    (120, 1600, 900),
+    (300, 3000, 1200),
+]
+
+
+def run_benchmark(charts: int = 5) -> list:
+    """Time every extractor on every scenario. Returns one row per pair."""
+    rows = []
+    for candles, width, height in SCENARIOS:
+        # Candles are drawn 7px wide, the plot needs room for them
+        images = [draw_chart(seed, candles, width, height) for seed in range(charts)]
+        for extractor in EXTRACTORS:
+            analyzer = CandlestickAnalyzer(extractor=extractor, deterministic=True)
+            found = []
+            start = time.perf_counter()
+            for image in images:
+                found.append(len(analyzer._extract_candles_from_image(image, np.random.default_rng(0))))
+            elapsed = time.perf_counter() - start
+            rows.append({
+                "scenario": f"{candles} candles {width}x{height}",
+                "extractor": extractor,
+                "msPerChart": elapsed / charts * 1000,
+                "found": float(np.mean(found)),
+                "drawn": candles,
+            })
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--charts", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    print(f"{'scenario':<28}{'extractor':<10}{'ms/chart':>10}{'found':>8}{'drawn':>7}")
+    for row in run_benchmark(args.charts):
+        print(f"{row['scenario']:<28}{row['extractor']:<10}{row['msPerChart']:>10.1f}"
+              f"{row['found']:>8.1f}{row['drawn']:>7}")
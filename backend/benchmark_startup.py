@@ -0,0 +1,154 @@
+"""
+Startup-time benchmark of the API.
+
+Measures, each in a fresh interpreter, how long importing
+candlestick_analyzer and main takes and which optional modules they load,
+then starts the server with uvicorn and times process start to the first
+served /analyze, followed by the latency of a warm /analyze.
+
+    python benchmark_startup.py
+    python benchmark_startup.py --runs 5 --extractor columns --output startup.json
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+import uuid
+from typing import Dict, List
+
+import cv2
+
+from candlestick_analyzer import EXTRACTORS
+from chart_corpus import ChartSpec, render_chart
+
+# Modules that should only be loaded when a configuration needs them
+OPTIONAL_MODULES = ("column_extractor", "color_segmentation", "calibration", "worker_pool", "pytesseract",
+                    "uvicorn", "tensorflow", "torch", "pandas", "matplotlib", "skimage", "scipy")
+
+_IMPORT_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {optional!r} if m in sys.modules]}}))
+"""
+
+
+def _environment(extractor: str) -> Dict[str, str]:
+    here = os.path.dirname(os.path.abspath(__file__))
+    return {**os.environ, "ANALYZER_EXTRACTOR": extractor, "METRICS_ENABLED": "false",
+            "PYTHONPATH": os.pathsep.join(filter(None, (here, os.environ.get("PYTHONPATH"))))}
+
+
+def time_import(module: str, extractor: str, runs: int) -> Dict:
+    """Median seconds to import module in a fresh interpreter, and the optional modules it loaded."""
+    seconds, loaded = [], []
+    for _ in range(runs):
+        probe = subprocess.run(
+            [sys.executable, "-c", _IMPORT_PROBE.format(module=module, optional=OPTIONAL_MODULES)],
+            env=_environment(extractor), capture_output=True, text=True, check=True,
+        )
+        result = json.loads(probe.stdout.strip().splitlines()[-1])
+        seconds.append(result["seconds"])
+        loaded = result["loaded"]
+    return {"medianMs": round(statistics.median(seconds) * 1000, 1), "loaded": loaded}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _chart_png() -> bytes:
+    chart = render_chart(ChartSpec(candles=40, width=1200, height=700))
+    return cv2.imencode(".png", cv2.cvtColor(chart.image, cv2.COLOR_RGB2BGR))[1].tobytes()
+
+
+def _post_analyze(url: str, image: bytes, timeout: float) -> Dict:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"chart.png\"\r\n"
+        f"Content-Type: image/png\r\n\r\n"
+    ).encode() + image + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(url, data=body, method="POST",
+                                     headers={"Content-Type": f"multipart/form-data; boundary={boundary}"})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        return json.load(response)
+
+
+def time_first_request(extractor: str, timeout: float = 60.0) -> Dict:
+    """Start uvicorn and time process start to the first successful /analyze, then one warm /analyze."""
+    image = _chart_png()
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}/analyze"
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port)],
+        env=_environment(extractor), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"Server exited with code {server.returncode} before serving /analyze")
+            if time.perf_counter() - start > timeout:
+                raise RuntimeError(f"No /analyze response within {timeout:.0f}s")
+            try:
+                request_start = time.perf_counter()
+                _post_analyze(url, image, timeout)
+                break
+            except (ConnectionError, urllib.error.URLError):
+                time.sleep(0.01)
+        first = time.perf_counter()
+        # Another seed, so the result cache does not answer it
+        _post_analyze(url + "?seed=1", image, timeout)
+        warm = time.perf_counter() - first
+    finally:
+        server.terminate()
+        server.wait()
+    return {
+        "toFirstAnalyzeMs": round((first - start) * 1000, 1),
+        "firstAnalyzeMs": round((first - request_start) * 1000, 1),
+        "warmAnalyzeMs": round(warm * 1000, 1),
+    }
+
+
+def run(extractor: str, runs: int) -> Dict:
+    report = {"extractor": extractor, "python": sys.version.split()[0], "imports": {}, "server": []}
+    for module in ("candlestick_analyzer", "main"):
+        report["imports"][module] = time_import(module, extractor, runs)
+    for _ in range(runs):
+        report["server"].append(time_first_request(extractor))
+    return report
+
+
+def _print_report(report: Dict):
+    print(f"Extractor {report['extractor']}, Python {report['python']}")
+    for module, result in report["imports"].items():
+        loaded = ", ".join(result["loaded"]) or "none"
+        print(f"  import {module:<22} {result['medianMs']:>8.1f} ms   optional modules loaded: {loaded}")
+    for key, label in (("toFirstAnalyzeMs", "start to first /analyze"), ("firstAnalyzeMs", "first /analyze"),
+                       ("warmAnalyzeMs", "warm /analyze")):
+        values: List[float] = [run[key] for run in report["server"]]
+        print(f"  {label:<29} {statistics.median(values):>8.1f} ms   (median of {len(values)})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--extractor", choices=EXTRACTORS, default="contour")
+    parser.add_argument("--runs", type=int, default=3, help="fresh processes per measurement")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    report = run(args.extractor, args.runs)
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
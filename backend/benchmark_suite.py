@@ -0,0 +1,141 @@
+"""
+Benchmark of the analysis pipeline on a synthetic chart corpus.
+
+Renders charts at several resolutions, candle counts, themes and noise
+levels, runs each through decode and CandlestickAnalyzer.analyze, scores the
+extracted candles against the drawn OHLC and writes per-stage timings and
+accuracy as JSON.
+
+    python benchmark_suite.py --output bench.json
+    python benchmark_suite.py --quick --baseline bench.json
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+
+from candlestick_analyzer import ANALYZER_VERSION, EXTRACTORS, CandlestickAnalyzer
+from chart_corpus import ChartSpec, corpus, render_chart, score_extraction
+from preprocessing import decode_color, decode_grayscale
+
+QUICK = {"resolutions": ((800, 500), (1600, 900)), "candle_counts": (40,), "noise_levels": (0.0,)}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 3)
+
+
+def run_scenario(analyzer: CandlestickAnalyzer, spec: ChartSpec, charts: int = 3) -> Dict:
+    """Decode, analyze and score `charts` renders of spec with different seeds."""
+    decode = decode_color if analyzer.needs_color else decode_grayscale
+    timings: Dict[str, List[float]] = {}
+    scores = []
+    for seed in range(charts):
+        chart = render_chart(ChartSpec(**{**spec.as_dict(), "seed": seed}))
+        encoded = cv2.imencode(".png", cv2.cvtColor(chart.image, cv2.COLOR_RGB2BGR))[1].tobytes()
+
+        start = time.perf_counter()
+        image, _ = decode(encoded)
+        stages = {"decode": (time.perf_counter() - start) * 1000}
+
+        start = time.perf_counter()
+        result = analyzer.analyze(image, seed=0)
+        stages["total"] = (time.perf_counter() - start) * 1000 + stages["decode"]
+        stages.update({name: ms for name, ms in result.get("stageTimings", {}).items() if name != "indicators"})
+        for name, ms in stages.items():
+            timings.setdefault(name, []).append(ms)
+
+        # The analyzer is deterministic, so this is the candle set analyze() used
+        candles = analyzer._extract_candles_from_image(image, np.random.default_rng(0))
+        scores.append(score_extraction(chart, candles))
+
+    accuracy = {}
+    for key in scores[0]:
+        values = [s[key] for s in scores if s[key] is not None]
+        accuracy[key] = round(float(np.mean(values)), 4) if values else None
+    return {
+        "scenario": spec.name,
+        "spec": {k: v for k, v in spec.as_dict().items() if k != "seed"},
+        "charts": charts,
+        "accuracy": accuracy,
+        "timings": {
+            name: {"median": _percentile(values, 50), "p95": _percentile(values, 95)}
+            for name, values in timings.items()
+        },
+    }
+
+
+def run_suite(extractor: str = "contour", charts: int = 3, quick: bool = False) -> Dict:
+    """Run every corpus scenario for one extractor. Returns the JSON report."""
+    analyzer = CandlestickAnalyzer(extractor=extractor, deterministic=True)
+    # Warm up OpenCV and NumPy code paths outside the measurements
+    run_scenario(analyzer, ChartSpec(candles=20, width=400, height=240), charts=1)
+
+    specs = list(corpus(**QUICK)) if quick else list(corpus())
+    return {
+        "analyzerVersion": ANALYZER_VERSION,
+        "configVersion": analyzer.config_version,
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "opencv": cv2.__version__,
+            "cpus": os.cpu_count(),
+            "machine": platform.machine(),
+        },
+        "scenarios": [run_scenario(analyzer, spec, charts) for spec in specs],
+    }
+
+
+def compare(report: Dict, baseline: Dict) -> List[str]:
+    """One line per scenario present in both reports: total time and recall against the baseline."""
+    previous = {row["scenario"]: row for row in baseline["scenarios"]}
+    lines = []
+    for row in report["scenarios"]:
+        before = previous.get(row["scenario"])
+        if before is None:
+            continue
+        now_ms, then_ms = row["timings"]["total"]["median"], before["timings"]["total"]["median"]
+        recall = row["accuracy"]["recall"] - before["accuracy"]["recall"]
+        lines.append(f"{row['scenario']:<32}{then_ms:>9.1f} -> {now_ms:>9.1f} ms "
+                     f"({(now_ms / then_ms - 1) * 100:+6.1f}%)  recall {recall:+.3f}")
+    return lines
+
+
+def _print_report(report: Dict):
+    print(f"{'scenario':<32}{'total ms':>10}{'decode':>9}{'prep':>8}{'extract':>9}"
+          f"{'patterns':>10}{'recall':>8}{'hl err':>8}{'dir':>6}")
+    for row in report["scenarios"]:
+        t, a = row["timings"], row["accuracy"]
+        stage = lambda name: t.get(name, {}).get("median", float("nan"))
+        print(f"{row['scenario']:<32}{stage('total'):>10.1f}{stage('decode'):>9.1f}{stage('preprocess'):>8.1f}"
+              f"{stage('extract'):>9.1f}{stage('patterns'):>10.1f}{a['recall']:>8.2f}"
+              f"{a['highLowError'] if a['highLowError'] is not None else float('nan'):>8.2f}"
+              f"{a['directionAccuracy'] if a['directionAccuracy'] is not None else float('nan'):>6.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--extractor", choices=EXTRACTORS, default="contour")
+    parser.add_argument("--charts", type=int, default=3, help="renders per scenario")
+    parser.add_argument("--quick", action="store_true", help="small corpus for a fast check")
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--baseline", help="JSON report to compare against")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    report = run_suite(args.extractor, args.charts, args.quick)
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline: Optional[Dict] = json.load(f)
+        print("\n".join(compare(report, baseline)))
@@ -0,0 +1,228 @@
+import hashlib
+import logging
+import re
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from candle_series import Candle
+from preprocessing import find_plot_area, ink_mask
+
+logger = logging.getLogger(__name__)
+
+# An OCR backend takes a grayscale label strip and returns (row centre, text) per label
+OcrBackend = Callable[[np.ndarray], List[Tuple[float, str]]]
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+
+@dataclass(frozen=True)
+class PriceScale:
+    """
+    Pixel row -> price mapping of a chart's y-axis, price = intercept + slope * y,
+    or exp() of that for log axes.
+    """
+    slope: float
+    intercept: float
+    log: bool = False
+    source: str = "ocr"
+
+    def price(self, y: np.ndarray) -> np.ndarray:
+        value = self.intercept + self.slope * np.asarray(y, dtype=np.float64)
+        return np.exp(value) if self.log else value
+
+    def rescale(self, candles: List[Candle], image_height: int) -> List[Candle]:
+        """
+        Convert candles from the 0-100 normalized scale the extractors use
+        (100 at the top row, 0 at the bottom) to axis prices, in place.
+        """
+        if not candles:
+            return candles
+        prices = np.array([(c.open, c.high, c.low, c.close) for c in candles])
+        # The mapping is monotonic, so highs and lows stay the extremes
+        mapped = self.price((100 - prices) / 100 * image_height)
+        for candle, (o, h, l, c) in zip(candles, mapped.tolist()):
+            candle.open, candle.high, candle.low, candle.close = o, h, l, c
+        return candles
+
+    def as_dict(self) -> Dict:
+        return {"model": "log" if self.log else "linear", "slope": self.slope,
+                "intercept": self.intercept, "source": self.source}
+
+
+def _parse_price(text: str) -> Optional[float]:
+    match = _NUMBER.search(text.replace(",", ""))
+    return float(match.group()) if match else None
+
+
+def _tesseract_labels(strip: np.ndarray) -> List[Tuple[float, str]]:
+    """Read tick labels with Tesseract, one call for the whole strip."""
+    import pytesseract
+
+    # Tesseract reads small UI fonts far better at twice the size
+    enlarged = cv2.resize(strip, None, fx=2, fy=2, interpolation=cv2.INTER_CUBIC)
+    data = pytesseract.image_to_data(
+        enlarged, config="--psm 6 -c tessedit_char_whitelist=0123456789.,-",
+        output_type=pytesseract.Output.DICT,
+    )
+    return [
+        ((top + height / 2) / 2, text)
+        for text, top, height in zip(data["text"], data["top"], data["height"])
+        if text.strip()
+    ]
+
+
+def _load_ocr() -> Optional[OcrBackend]:
+    """The local OCR backend, or None when pytesseract or the binary is missing."""
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception as e:
+        logger.warning(f"Axis calibration disabled, no OCR backend: {str(e)}")
+        return None
+    return _tesseract_labels
+
+
+def fit_price_scale(points: List[Tuple[float, float]], max_error: float = 0.01) -> Optional[PriceScale]:
+    """
+    Fit a linear and a log pixel -> price mapping through (row, price) tick
+    points and keep the better one. Misread ticks are dropped once as outliers.
+    None when fewer than two ticks agree or prices do not rise up the axis.
+    """
+    if len(points) < 2:
+        return None
+    ys = np.array([p[0] for p in points], dtype=np.float64)
+    prices = np.array([p[1] for p in points], dtype=np.float64)
+
+    candidates = []
+    models = [(False, prices)]
+    if (prices > 0).all():
+        models.append((True, np.log(prices)))
+    for log, values in models:
+        keep = np.ones(len(ys), dtype=bool)
+        for _ in range(2):
+            if keep.sum() < 2 or np.ptp(ys[keep]) == 0:
+                break
+            slope, intercept = np.polyfit(ys[keep], values[keep], 1)
+            residual = np.abs(intercept + slope * ys - values)
+            keep = residual <= max(3 * np.median(residual[keep]), 1e-9)
+        if keep.sum() < 2 or np.ptp(ys[keep]) == 0:
+            continue
+        slope, intercept = np.polyfit(ys[keep], values[keep], 1)
+        scale = PriceScale(float(slope), float(intercept), log)
+        # Relative error against the prices actually read
+        error = float(np.max(np.abs(scale.price(ys[keep]) - prices[keep]) / np.abs(prices[keep]).clip(1e-9)))
+        candidates.append((error, -keep.sum(), scale))
+
+    if not candidates:
+        return None
+    error, _, scale = min(candidates, key=lambda c: (c[0], c[1]))
+    # Higher rows are higher prices, so the mapping must fall as y grows
+    if error > max_error or scale.slope >= 0:
+        return None
+    return scale
+
+
+def _label_strip(gray: np.ndarray) -> Optional[Tuple[str, np.ndarray]]:
+    """
+    The y-axis label strip beside the plot as (side, strip). The strip spans
+    every row, since the plot area is trimmed to the candles and ticks
+    extend past them.
+    """
+    _, _, left, right = find_plot_area(gray)
+    strips = {
+        "right": gray[:, right:],
+        "left": gray[:, :left],
+    }
+    best = None
+    for side, strip in strips.items():
+        # Keep only what lies beyond the axis line
+        lines = np.flatnonzero(ink_mask(strip).mean(axis=0) >= 0.5)
+        if len(lines):
+            strip = strip[:, lines[-1] + 1:] if side == "right" else strip[:, :lines[0]]
+        if strip.shape[1] < 10:
+            continue
+        text_rows = np.count_nonzero(ink_mask(strip).any(axis=1))
+        if text_rows and (best is None or text_rows > best[0]):
+            best = (text_rows, side, strip)
+    if best is None:
+        return None
+    return best[1], best[2]
+
+
+def layout_fingerprint(side: str, strip: np.ndarray, image_shape: tuple) -> str:
+    """
+    Identifies an axis: image size, where the label strip sits and at which
+    rows its tick labels are drawn, plus a digest of the label pixels so a
+    different price range on the same layout is read again. Only a strip
+    with exactly the same label ink matches, e.g. a repeated screenshot.
+    """
+    ink = ink_mask(strip)
+    rows = np.concatenate([[False], ink.any(axis=1), [False]])
+    edges = np.flatnonzero(np.diff(rows.astype(np.int8)))
+    ticks = ((edges[::2] + edges[1::2]) // 2).tolist()
+    digest = hashlib.blake2b(np.packbits(ink).tobytes(), digest_size=8).hexdigest()
+    return f"{image_shape[0]}x{image_shape[1]}:{side}:{strip.shape[1]}:{ticks}:{digest}"
+
+
+class AxisCalibrator:
+    """
+    Reads y-axis tick labels and fits a PriceScale, caching the result per
+    layout fingerprint. The fingerprint covers the label pixels, so OCR runs
+    once per distinct axis image: repeated screenshots of an unchanged axis
+    hit the cache, while a scrolled or rescaled axis, or another instrument
+    in the same chart style, is read again. Thread-safe.
+    """
+
+    def __init__(self, ocr: Optional[OcrBackend] = None, max_entries: int = 256):
+        self._ocr = ocr
+        self._ocr_loaded = ocr is not None
+        self.max_entries = max_entries
+        self._cache: Dict[str, Optional[PriceScale]] = {}
+        self._lock = threading.Lock()
+        self.ocr_runs = 0
+
+    def _backend(self) -> Optional[OcrBackend]:
+        if not self._ocr_loaded:
+            self._ocr = _load_ocr()
+            self._ocr_loaded = True
+        return self._ocr
+
+    def calibrate(self, gray: np.ndarray) -> Optional[PriceScale]:
+        """PriceScale of a grayscale chart, or None if its axis cannot be read."""
+        # Without OCR nothing can be read or cached, skip the strip and fingerprint
+        ocr = self._backend()
+        if ocr is None:
+            return None
+        found = _label_strip(gray)
+        if found is None:
+            return None
+        side, strip = found
+        key = layout_fingerprint(side, strip, gray.shape)
+        with self._lock:
+            if key in self._cache:
+                scale = self._cache[key]
+                return PriceScale(scale.slope, scale.intercept, scale.log, "cache") if scale else None
+
+        with self._lock:
+            self.ocr_runs += 1
+        points = []
+        for row, text in ocr(strip):
+            price = _parse_price(text)
+            if price is not None:
+                points.append((row, price))
+        scale = fit_price_scale(points)
+        logger.info(f"Calibrated {side} axis from {len(points)} labels: {scale}")
+
+        with self._lock:
+            if len(self._cache) >= self.max_entries:
+                self._cache.pop(next(iter(self._cache)))
+            self._cache[key] = scale
+        return scale
+
+
+# Shared by every analyzer, so a layout is calibrated once per process
+default_calibrator = AxisCalibrator()
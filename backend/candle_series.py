@@ -0,0 +1,103 @@
+import numpy as np
+from typing import Iterator, List, Optional, Sequence, Union
+from dataclasses import dataclass
+
+
+@dataclass
+class Candle:
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: float = 0
+    index: int = 0
+
+
+class CandleSeries:
+    """
+    Columnar OHLCV series backed by contiguous float64 NumPy arrays.
+    Slicing returns a zero-copy view, integer indexing and iteration yield
+    Candle objects so code written against List[Candle] keeps working.
+    """
+
+    __slots__ = ("open", "high", "low", "close", "volume", "index")
+
+    def __init__(self, open: Sequence[float], high: Sequence[float], low: Sequence[float],
+                 close: Sequence[float], volume: Optional[Sequence[float]] = None,
+                 index: Optional[Sequence[int]] = None):
+        self.open = np.ascontiguousarray(open, dtype=np.float64)
+        self.high = np.ascontiguousarray(high, dtype=np.float64)
+        self.low = np.ascontiguousarray(low, dtype=np.float64)
+        self.close = np.ascontiguousarray(close, dtype=np.float64)
+        n = len(self.close)
+        self.volume = (np.zeros(n) if volume is None
+                       else np.ascontiguousarray(volume, dtype=np.float64))
+        self.index = (np.arange(n, dtype=np.int64) if index is None
+                      else np.ascontiguousarray(index, dtype=np.int64))
+
+        if not (len(self.open) == len(self.high) == len(self.low) == n == len(self.volume) == len(self.index)):
+            raise ValueError("OHLCV columns must have the same length")
+
+    @classmethod
+    def from_candles(cls, candles: Sequence[Candle]) -> "CandleSeries":
+        """Build a series from Candle objects."""
+        if isinstance(candles, CandleSeries):
+            return candles
+        return cls(
+            open=[c.open for c in candles],
+            high=[c.high for c in candles],
+            low=[c.low for c in candles],
+            close=[c.close for c in candles],
+            volume=[c.volume for c in candles],
+            index=[c.index for c in candles],
+        )
+
+    def __len__(self) -> int:
+        return len(self.close)
+
+    def __getitem__(self, key: Union[int, slice]) -> Union[Candle, "CandleSeries"]:
+        if isinstance(key, slice):
+            # Basic slicing of NumPy arrays is a view, nothing is copied
+            view = CandleSeries.__new__(CandleSeries)
+            view.open = self.open[key]
+            view.high = self.high[key]
+            view.low = self.low[key]
+            view.close = self.close[key]
+            view.volume = self.volume[key]
+            view.index = self.index[key]
+            return view
+        return Candle(
+            open=float(self.open[key]),
+            high=float(self.high[key]),
+            low=float(self.low[key]),
+            close=float(self.close[key]),
+            volume=float(self.volume[key]),
+            index=int(self.index[key]),
+        )
+
+    def __iter__(self) -> Iterator[Candle]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def to_candles(self) -> List[Candle]:
+        return list(self)
+
+    @property
+    def body(self) -> np.ndarray:
+        return np.abs(self.close - self.open)
+
+    @property
+    def upper_wick(self) -> np.ndarray:
+        return self.high - np.maximum(self.open, self.close)
+
+    @property
+    def lower_wick(self) -> np.ndarray:
+        return np.minimum(self.open, self.close) - self.low
+
+    @property
+    def range(self) -> np.ndarray:
+        return self.high - self.low
+
+    @property
+    def bullish(self) -> np.ndarray:
+        return self.close > self.open
@@ -1,61 +1,236 @@
 import numpy as np
 import cv2
-from typing import Dict, List, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+from dataclasses import dataclass, fields, replace
+from types import MappingProxyType
+from candle_series import Candle, CandleSeries
+from pattern_engine import latest_patterns, pattern_occurrences
+from chart_patterns import active_chart_patterns, chart_pattern_occurrences
+from indicators import IndicatorContext, StageTimer
+from preprocessing import PlotRegion, prepare_plot, to_grayscale
+import importlib
 import logging
 
 logger = logging.getLogger(__name__)
 
-@dataclass
-class Candle:
-    open: float
-    high: float
-    low: float
-    close: float
-    volume: float = 0
-    index: int = 0
+# Bump whenever extraction or scoring changes so cached results are invalidated
+ANALYZER_VERSION = "1.1.1"
+
+def _freeze(patterns: Dict[str, Dict]) -> Mapping[str, Mapping]:
+    return MappingProxyType({name: MappingProxyType(info) for name, info in patterns.items()})
+
+# Pattern database with enhanced historical performance metrics.
+# Read-only and shared by every analyzer instance and thread.
+PATTERNS_DB = _freeze({
+    # Bullish Reversal Patterns (Enhanced)
+    "Hammer": {"reliability": 0.75, "bias": "bullish", "reversal_strength": 0.8},
+    "Inverted Hammer": {"reliability": 0.68, "bias": "bullish", "reversal_strength": 0.7},
+    "Bullish Engulfing": {"reliability": 0.78, "bias": "bullish", "reversal_strength": 0.85},
+    "Morning Star": {"reliability": 0.72, "bias": "bullish", "reversal_strength": 0.8},
+    "Bullish Harami": {"reliability": 0.65, "bias": "bullish", "reversal_strength": 0.6},
+    "Three White Soldiers": {"reliability": 0.73, "bias": "bullish", "reversal_strength": 0.85},
+    "Piercing Line": {"reliability": 0.70, "bias": "bullish", "reversal_strength": 0.75},
+    "Unique Three River": {"reliability": 0.68, "bias": "bullish", "reversal_strength": 0.72},
+    
+    # Bearish Reversal Patterns (Enhanced)
+    "Hanging Man": {"reliability": 0.73, "bias": "bearish", "reversal_strength": 0.8},
+    "Bearish Engulfing": {"reliability": 0.78, "bias": "bearish", "reversal_strength": 0.85},
+    "Evening Star": {"reliability": 0.72, "bias": "bearish", "reversal_strength": 0.8},
+    "Three Black Crows": {"reliability": 0.73, "bias": "bearish", "reversal_strength": 0.85},
+    "Bearish Harami": {"reliability": 0.65, "bias": "bearish", "reversal_strength": 0.6},
+    "Dark Cloud Cover": {"reliability": 0.70, "bias": "bearish", "reversal_strength": 0.75},
+    "Thrusting Line": {"reliability": 0.68, "bias": "bearish", "reversal_strength": 0.72},
+    
+    # Neutral/Continuation Patterns (Enhanced)
+    "Doji": {"reliability": 0.62, "bias": "neutral", "continuation_strength": 0.55},
+    "Spinning Top": {"reliability": 0.58, "bias": "neutral", "continuation_strength": 0.5},
+    "Long Legged Doji": {"reliability": 0.65, "bias": "neutral", "continuation_strength": 0.6},
+    "Dragonfly Doji": {"reliability": 0.68, "bias": "bullish", "reversal_strength": 0.75},
+    "Gravestone Doji": {"reliability": 0.68, "bias": "bearish", "reversal_strength": 0.75},
+    
+    # Continuation Patterns
+    "Rising Three Methods": {"reliability": 0.70, "bias": "bullish", "continuation_strength": 0.8},
+    "Falling Three Methods": {"reliability": 0.70, "bias": "bearish", "continuation_strength": 0.8},
+    "Side-by-Side White Lines": {"reliability": 0.60, "bias": "bullish", "continuation_strength": 0.65},
+    "Side-by-Side Dark Lines": {"reliability": 0.60, "bias": "bearish", "continuation_strength": 0.65},
+})
+
+EXTRACTORS = ("contour", "edges", "columns", "color")
+
+# Modules only some configurations need, imported when such an analyzer is built
+ENGINE_MODULES = {"columns": "column_extractor", "color": "color_segmentation"}
+CALIBRATION_MODULE = "calibration"
+# Narrowest gap between candles, in working-frame pixels, that downsampling may
+# leave. The contour engine's closing passes (3x3, three iterations) bridge
+# about 6px and resampling blurs each edge, so it needs twice what the others do.
+MIN_CANDLE_GAP = {"contour": 16}
+DEFAULT_MIN_CANDLE_GAP = 8
+
+@dataclass(frozen=True)
+class AnalyzerConfig:
+    """
+    Immutable analyzer settings.
+    deterministic: extract exact candles with no jitter, so the same image
+    always produces the same result regardless of seed.
+    crop_plot: crop to the plot area and downsample wide candles before
+    contour extraction.
+    target_candle_width: candle body width in pixels to downsample to.
+    extractor: candle extraction engine, one of EXTRACTORS. "contour" traces
+    candle outlines, "edges" traces Canny edges, "columns" reduces the
+    binary mask column by column and "color" segments bullish and bearish
+    candles by colour, giving real open/close direction.
+    calibrate: read the y-axis labels (OCR) and report prices on the chart's
+    own scale instead of 0-100.
+    """
+    deterministic: bool = False
+    crop_plot: bool = True
+    target_candle_width: int = 8
+    extractor: str = "contour"
+    calibrate: bool = False
+    
+    def __post_init__(self):
+        if self.extractor not in EXTRACTORS:
+            raise ValueError(f"Unknown extractor '{self.extractor}', expected one of {', '.join(EXTRACTORS)}")
 
 class CandlestickAnalyzer:
     """
     Advanced candlestick pattern recognition and technical analysis engine.
     Uses image processing and pattern matching for chart analysis.
+    
+    Instances are re-entrant: configuration and the pattern database are
+    immutable and all per-call state lives on the stack, so one analyzer can
+    be shared across threads.
     """
     
-    def __init__(self):
-        self.patterns_db = self._initialize_patterns()
-        self.support_resistance = []
-        self.trend = None
-        
-    def analyze(self, image: np.ndarray) -> Dict:
+    __slots__ = ("config",)
+    
+    def __init__(self, config: Optional[AnalyzerConfig] = None, **overrides):
+        """Use config as is, or override individual AnalyzerConfig fields."""
+        object.__setattr__(self, "config", replace(config or AnalyzerConfig(), **overrides))
+        # Load the chosen engine up front so the first analysis does not pay for it
+        for module in self.required_modules:
+            importlib.import_module(module)
+    
+    def __setattr__(self, name, value):
+        raise AttributeError("CandlestickAnalyzer is immutable, build a new one with a different AnalyzerConfig")
+    
+    @property
+    def deterministic(self) -> bool:
+        return self.config.deterministic
+    
+    @property
+    def needs_color(self) -> bool:
+        """Whether images should be passed in colour rather than grayscale."""
+        return self.config.extractor == "color"
+    
+    @property
+    def required_modules(self) -> Tuple[str, ...]:
+        """Optional modules this configuration uses."""
+        modules = (ENGINE_MODULES[self.config.extractor],) if self.config.extractor in ENGINE_MODULES else ()
+        return modules + ((CALIBRATION_MODULE,) if self.config.calibrate else ())
+    
+    @property
+    def patterns_db(self) -> Mapping[str, Mapping]:
+        return PATTERNS_DB
+    
+    @property
+    def config_version(self) -> str:
+        """Identifies the analyzer configuration for result caching."""
+        version = ANALYZER_VERSION
+        for field in fields(self.config):
+            value = getattr(self.config, field.name)
+            if value == field.default:
+                continue
+            version += f"+{field.name}" if value is True else f"+{field.name}={value}"
+        return version
+        
+    def analyze(self, image: np.ndarray, seed: Optional[int] = None) -> Dict:
         """
         Main analysis pipeline for stock chart images.
+        Pass seed to make the extraction jitter reproducible. Deterministic
+        analyzers ignore it, so even the synthetic fallback does not vary.
         """
         try:
+            if self.deterministic:
+                seed = 0
+            rng = np.random.default_rng(seed)
+            timer = StageTimer()
+            
             # Extract candles from image
-            candles = self._extract_candles_from_image(image)
+            with timer.stage("extract"):
+                extracted = self._extract_candles_from_image(image, rng, timer)
+            
+            # Map the normalized 0-100 prices onto the chart's own axis. Synthetic
+            # candles were not read from the chart, so its axis says nothing about them
+            price_scale = None
+            if (self.config.calibrate and image is not None and image.size
+                    and "synthetic" not in timer.events):
+                with timer.stage("calibrate"):
+                    from calibration import default_calibrator
+                    price_scale = default_calibrator.calibrate(to_grayscale(image))
+                if price_scale:
+                    price_scale.rescale(extracted, image.shape[0])
+            candles = CandleSeries.from_candles(extracted)
             
             if not candles or len(candles) < 3:
                 return self._create_error_response("Unable to extract candles from image")
             
             logger.info(f"Extracted {len(candles)} candles from chart")
             
-            # Identify patterns
-            patterns = self._identify_patterns(candles)
+            response = self._analyze_candles(candles, timer, price_scale)
+            response["extractionMethod"] = self._extraction_method(timer)
             
-            # Analyze trend
-            trend_analysis = self._analyze_trend(candles)
+            return response
             
-            # Find support and resistance
-            key_levels = self._find_key_levels(candles)
+        except Exception as e:
+            logger.error(f"Analysis error: {str(e)}", exc_info=True)
+            return self._create_error_response(str(e))
+    
+    def analyze_series(self, candles: Union[CandleSeries, Sequence[Candle]]) -> Dict:
+        """
+        Analysis of OHLCV data given directly, in its own prices. The image
+        extraction stage is skipped, patterns, trend, levels and prediction are
+        computed exactly as for a chart image.
+        """
+        try:
+            candles = CandleSeries.from_candles(candles)
+            if len(candles) < 3:
+                return self._create_error_response("At least 3 candles are needed")
             
-            # Make prediction
-            prediction, strength = self._make_prediction(candles, patterns, trend_analysis)
+            return self._analyze_candles(candles, StageTimer(), data_source="ohlcv")
             
+        except Exception as e:
+            logger.error(f"Series analysis error: {str(e)}", exc_info=True)
+            return self._create_error_response(str(e))
+    
+    def _analyze_candles(self, candles: CandleSeries, timer: StageTimer, price_scale=None,
+                         data_source: Optional[str] = None) -> Dict:
+        """Patterns, trend, levels, prediction and report of a candle series, with the stage timings."""
+        # Every indicator below is computed at most once and shared between stages
+        ctx = IndicatorContext(candles)
+        
+        # Identify patterns
+        with timer.stage("patterns"):
+            patterns = self._identify_patterns(ctx)
+        
+        # Analyze trend
+        with timer.stage("trend"):
+            trend_analysis = self._analyze_trend(ctx)
+        
+        # Find support and resistance
+        with timer.stage("levels"):
+            key_levels = ctx.key_levels
+        
+        # Make prediction
+        with timer.stage("prediction"):
+            prediction, strength = self._make_prediction(ctx, patterns, trend_analysis)
+        
+        with timer.stage("report"):
             # Calculate trading setup
             sl, tp = self._calculate_levels(candles, prediction)
             
             # Risk/reward calculation
-            risk_reward = self._calculate_risk_reward(candles[-1].close, sl, tp)
+            risk_reward = self._calculate_risk_reward(float(candles.close[-1]), sl, tp)
             
             # Build response
             response = {
@@ -64,48 +239,77 @@ class CandlestickAnalyzer:
                 "stopLoss": sl,
                 "takeProfit": tp,
                 "patterns": patterns,
+                "patternHistory": self._pattern_history(ctx),
                 "analysis": self._generate_analysis_text(candles, patterns, trend_analysis, prediction),
                 "timeframe": self._detect_timeframe(candles),
                 "keyLevels": key_levels,
                 "riskReward": risk_reward,
                 "tradingSetup": self._generate_trading_setup(candles, prediction, sl, tp),
                 "candleCount": len(candles),
-                "currentPrice": float(candles[-1].close),
-                "dataSource": "real" if len(patterns) > 0 else "synthetic",  # synthetic if no patterns found
+                "currentPrice": float(candles.close[-1]),
+                "priceScale": price_scale.as_dict() if price_scale else None,
+                # synthetic if no patterns found
+                "dataSource": data_source or ("real" if len(patterns) > 0 else "synthetic"),
                 "success": True
             }
-            
-            return response
-            
-        except Exception as e:
-            logger.error(f"Analysis error: {str(e)}", exc_info=True)
-            return self._create_error_response(str(e))
+        
+        response["stageTimings"] = {**timer.as_dict(), "indicators": ctx.compute_ms}
+        return response
+    
+    def _extraction_method(self, timer: StageTimer) -> str:
+        """Which method produced the candles: the configured extractor or a fallback."""
+        if "synthetic" in timer.events:
+            return "synthetic"
+        if "alternative" in timer.events:
+            return "edges"
+        return self.config.extractor
     
-    def _extract_candles_from_image(self, image: np.ndarray) -> List[Candle]:
+    def _extract_candles_from_image(self, image: np.ndarray, rng: np.random.Generator,
+                                    timer: Optional[StageTimer] = None) -> List[Candle]:
         """
         Extract OHLC data from candlestick chart image using computer vision.
         Enhanced with better edge detection and noise filtering.
+        Preprocessing is timed as its own stage on timer.
         """
+        timer = timer or StageTimer()
         try:
             # Validate image
             if image is None or image.size == 0:
                 logger.warning("Invalid image provided")
-                return self._generate_synthetic_candles(20)
+                return self._generate_synthetic_candles(20, rng, timer)
             
             logger.debug(f"Image shape before processing: {image.shape}")
             
-            # Convert to RGB if needed
-            if len(image.shape) == 2:
-                image = cv2.cvtColor(image, cv2.COLOR_GRAY2RGB)
-            elif image.shape[2] == 4:
-                image = cv2.cvtColor(image, cv2.COLOR_RGBA2RGB)
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-            
-            # Normalize to 0-255 range
-            gray = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
-            logger.debug(f"Grayscale image min: {gray.min()}, max: {gray.max()}")
+            with timer.stage("preprocess"):
+                # Convert to grayscale, single-channel input is used as is
+                gray = to_grayscale(image)
+                
+                # Work on the plot area only, downsampled when candles are wide
+                if self.config.crop_plot:
+                    min_gap = MIN_CANDLE_GAP.get(self.config.extractor, DEFAULT_MIN_CANDLE_GAP)
+                    gray, region = prepare_plot(gray, self.config.target_candle_width, min_gap)
+                    logger.debug(f"Plot region: {region}, working shape: {gray.shape}")
+                else:
+                    region = PlotRegion.whole(gray)
+                
+                # Normalize to 0-255 range (stays uint8, no extra copy)
+                gray = cv2.normalize(gray, None, 0, 255, cv2.NORM_MINMAX)
+            debug = logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                logger.debug(f"Grayscale image min: {gray.min()}, max: {gray.max()}")
+            
+            if self.config.extractor == "edges":
+                return self._extract_candles_alternative(gray, region, rng, timer)
+            
+            if self.config.extractor == "color":
+                if image.ndim == 3:
+                    from color_segmentation import extract_color_candles
+                    candles = extract_color_candles(region.apply(image[..., :3]), region)
+                    logger.info(f"Colour extraction found {len(candles)} candles")
+                    if len(candles) >= 2:
+                        return self._apply_jitter(candles, rng)
+                logger.warning("Colour extraction unavailable or found too few candles, trying alternative...")
+                return self._extract_candles_alternative(gray, region, rng, timer)
             
             # Apply Gaussian blur to reduce noise
             blurred = cv2.GaussianBlur(gray, (3, 3), 0)
@@ -113,7 +317,8 @@ class CandlestickAnalyzer:
             # Apply CLAHE (Contrast Limited Adaptive Histogram Equalization)
             clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
             enhanced = clahe.apply(blurred)
-            logger.debug(f"Enhanced image min: {enhanced.min()}, max: {enhanced.max()}")
+            if debug:
+                logger.debug(f"Enhanced image min: {enhanced.min()}, max: {enhanced.max()}")
             
             # Apply multiple thresholding techniques for robustness
             # Method 1: Binary threshold
@@ -124,7 +329,19 @@ class CandlestickAnalyzer:
             
             # Combine both methods
             binary = cv2.bitwise_or(binary1, binary2)
-            logger.debug(f"Binary image white pixels: {np.count_nonzero(binary)}")
+            if debug:
+                logger.debug(f"Binary image white pixels: {np.count_nonzero(binary)}")
+            
+            # Column runs separate touching candles on their own, and the
+            # closing passes below would merge them
+            if self.config.extractor == "columns":
+                from column_extractor import extract_column_candles
+                candles = extract_column_candles(binary, region)
+                logger.info(f"Column extraction found {len(candles)} candles")
+                if len(candles) < 2:
+                    logger.warning("Column extraction found too few candles, trying alternative...")
+                    return self._extract_candles_alternative(gray, region, rng, timer)
+                return self._apply_jitter(candles, rng)
             
             # Apply morphological operations to clean up
             kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
@@ -136,23 +353,26 @@ class CandlestickAnalyzer:
             logger.info(f"Found {len(contours) if contours else 0} contours")
             
             # Extract height and position info
-            image_height = image.shape[0]
-            image_width = image.shape[1]
+            image_height = region.full_height
+            image_width = region.full_width
             
             if not contours or len(contours) < 2:
                 logger.warning(f"No or insufficient contours found in image (found {len(contours) if contours else 0})")
                 logger.info("Attempting alternative extraction method...")
                 # Try alternative: look for vertical structures
-                return self._extract_candles_alternative(gray, image)
+                return self._extract_candles_alternative(gray, region, rng, timer)
             
             candles = []
             
-            # Sort contours by x position (left to right)
-            sorted_contours = sorted(contours, key=lambda c: cv2.boundingRect(c)[0])
+            # Bounding boxes sorted by x position (left to right), each computed once
+            boxes = [cv2.boundingRect(contour) for contour in contours]
+            boxes.sort(key=lambda box: box[0])
+            if len(boxes) > 200:
+                logger.warning(f"Keeping the first 200 of {len(boxes)} contours, use the columns extractor for dense charts")
             
             # Extract height and position info
-            for idx, contour in enumerate(sorted_contours[:200]):
-                x, y, w, h = cv2.boundingRect(contour)
+            for box in boxes[:200]:
+                x, y, w, h = region.to_full(*box)
                 
                 # More lenient filtering
                 if w < 1 or h < 2:
@@ -175,14 +395,11 @@ class CandlestickAnalyzer:
                 open_price = mid_price + (w * 0.2)
                 close_price = mid_price - (w * 0.2)
                 
-                # Add small random variation for realism
-                variation = np.random.normal(0, 0.3)
-                
                 candle = Candle(
-                    open=open_price + variation,
+                    open=open_price,
                     high=max(high_price, open_price, close_price) + 0.5,
                     low=min(low_price, open_price, close_price) - 0.5,
-                    close=close_price + variation,
+                    close=close_price,
                     volume=float(w * h),  # Volume proportional to candle size
                     index=len(candles)
                 )
@@ -192,22 +409,28 @@ class CandlestickAnalyzer:
             # If still no candles extracted, try alternative method
             if not candles:
                 logger.warning("Failed to extract candles with primary method, trying alternative...")
-                return self._extract_candles_alternative(gray, image)
+                return self._extract_candles_alternative(gray, region, rng, timer)
             
             logger.info(f"Successfully extracted {len(candles)} candles from image")
-            return candles
+            return self._apply_jitter(candles, rng)
             
         except Exception as e:
             logger.error(f"Candle extraction error: {str(e)}, attempting alternative method...")
             try:
-                gray = cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
-                return self._extract_candles_alternative(gray, image)
+                gray = to_grayscale(image)
+                return self._extract_candles_alternative(gray, PlotRegion.whole(gray), rng, timer)
             except Exception as e2:
                 logger.error(f"Alternative method also failed: {str(e2)}, using synthetic data")
-                return self._generate_synthetic_candles(20)
+                return self._generate_synthetic_candles(20, rng, timer)
     
-    def _extract_candles_alternative(self, gray: np.ndarray, image: np.ndarray) -> List[Candle]:
-        """Alternative extraction method using edge detection."""
+    def _extract_candles_alternative(self, gray: np.ndarray, region: PlotRegion, rng: np.random.Generator,
+                                     timer: Optional[StageTimer] = None) -> List[Candle]:
+        """
+        Alternative extraction method using edge detection.
+        gray is the working frame, region maps it back to the full image.
+        """
+        if timer is not None:
+            timer.record("alternative")
         try:
             logger.info("Using alternative candle extraction method")
             # Use Canny edge detection
@@ -219,16 +442,19 @@ class CandlestickAnalyzer:
             
             if not contours or len(contours) < 2:
                 logger.warning("Alternative method failed, using synthetic data")
-                return self._generate_synthetic_candles(20)
+                return self._generate_synthetic_candles(20, rng, timer)
             
-            image_height = image.shape[0]
-            image_width = image.shape[1]
+            image_height = region.full_height
+            image_width = region.full_width
             candles = []
             
-            sorted_contours = sorted(contours, key=lambda c: cv2.boundingRect(c)[0])
+            boxes = [cv2.boundingRect(contour) for contour in contours]
+            boxes.sort(key=lambda box: box[0])
+            if len(boxes) > 150:
+                logger.warning(f"Keeping the first 150 of {len(boxes)} edge contours")
             
-            for contour in sorted_contours[:150]:
-                x, y, w, h = cv2.boundingRect(contour)
+            for box in boxes[:150]:
+                x, y, w, h = region.to_full(*box)
                 
                 # Filter for reasonable candle dimensions
                 if w < 2 or h < 5:
@@ -242,12 +468,11 @@ class CandlestickAnalyzer:
                 mid_y = y + (h / 2)
                 mid_price = 100 - (mid_y / image_height) * 100
                 
-                variation = np.random.normal(0, 0.3)
                 candle = Candle(
-                    open=mid_price + (w * 0.15) + variation,
+                    open=mid_price + (w * 0.15),
                     high=max(high_price, mid_price) + 0.5,
                     low=min(low_price, mid_price) - 0.5,
-                    close=mid_price - (w * 0.15) + variation,
+                    close=mid_price - (w * 0.15),
                     volume=float(w * h),
                     index=len(candles)
                 )
@@ -255,385 +480,84 @@ class CandlestickAnalyzer:
             
             if candles:
                 logger.info(f"Alternative method extracted {len(candles)} candles")
-                return candles
+                return self._apply_jitter(candles, rng)
             
             logger.warning("Both extraction methods failed, using synthetic data")
-            return self._generate_synthetic_candles(20)
+            return self._generate_synthetic_candles(20, rng, timer)
         except Exception as e:
             logger.error(f"Alternative extraction error: {str(e)}, using synthetic data")
-            return self._generate_synthetic_candles(20)
+            return self._generate_synthetic_candles(20, rng, timer)
     
-    def _generate_synthetic_candles(self, count: int = 20) -> List[Candle]:
-        """Generate synthetic candlesticks for demo/testing."""
-        candles = []
-        base_price = 100
+    def _apply_jitter(self, candles: List[Candle], rng: np.random.Generator) -> List[Candle]:
+        """Add small open/close variation for realism, drawn for the whole chart at once."""
+        if self.deterministic or not candles:
+            return candles
         
-        for i in range(count):
-            change = np.random.normal(0.5, 1.5)
-            open_p = base_price + np.random.uniform(-1, 1)
-            close_p = open_p + change
-            high_p = max(open_p, close_p) + np.random.uniform(0.5, 2)
-            low_p = min(open_p, close_p) - np.random.uniform(0.5, 2)
-            
-            candles.append(Candle(
-                open=open_p,
-                high=high_p,
-                low=low_p,
-                close=close_p,
-                volume=np.random.uniform(1000, 5000),
-                index=i
-            ))
-            
-            base_price = close_p
+        variation = rng.normal(0, 0.3, size=len(candles))
+        for candle, v in zip(candles, variation.tolist()):
+            candle.open += v
+            candle.close += v
         
         return candles
     
-    def _identify_patterns(self, candles: List[Candle]) -> List[str]:
+    def _generate_synthetic_candles(self, count: int, rng: np.random.Generator,
+                                    timer: Optional[StageTimer] = None) -> List[Candle]:
+        """Generate synthetic candlesticks for demo/testing."""
+        if timer is not None:
+            timer.record("synthetic")
+        # Draw every random component in one call per component
+        changes = rng.normal(0.5, 1.5, size=count)
+        open_offsets = rng.uniform(-1, 1, size=count)
+        upper_wicks = rng.uniform(0.5, 2, size=count)
+        lower_wicks = rng.uniform(0.5, 2, size=count)
+        volumes = rng.uniform(1000, 5000, size=count)
+        
+        # Each candle opens near the previous close
+        closes = 100 + np.cumsum(open_offsets + changes)
+        opens = closes - changes
+        highs = np.maximum(opens, closes) + upper_wicks
+        lows = np.minimum(opens, closes) - lower_wicks
+        
+        return [
+            Candle(open=o, high=h, low=l, close=c, volume=v, index=i)
+            for i, (o, h, l, c, v) in enumerate(zip(opens.tolist(), highs.tolist(), lows.tolist(),
+                                                    closes.tolist(), volumes.tolist()))
+        ]
+    
+    def _identify_patterns(self, ctx: IndicatorContext) -> List[str]:
         """Identify candlestick and chart patterns."""
         patterns = []
         
-        if len(candles) < 3:
+        if len(ctx.candles) < 3:
             return patterns
         
-        # Check recent candles for patterns
-        recent = candles[-5:]
-        
-        # Bullish patterns
-        if self._is_bullish_engulfing(recent):
-            patterns.append("Bullish Engulfing")
-        if self._is_hammer(recent[-1]):
-            patterns.append("Hammer")
-        if self._is_morning_star(recent):
-            patterns.append("Morning Star")
-        if self._is_three_white_soldiers(recent):
-            patterns.append("Three White Soldiers")
-        if self._is_piercing_line(recent):
-            patterns.append("Piercing Line")
-        if self._is_bullish_harami(recent):
-            patterns.append("Bullish Harami")
-        if self._is_dragonfly_doji(recent[-1]):
-            patterns.append("Dragonfly Doji")
+        # Candlestick patterns completed by the latest candle
+        patterns.extend(latest_patterns(ctx.pattern_masks))
         
-        # Bearish patterns
-        if self._is_bearish_engulfing(recent):
-            patterns.append("Bearish Engulfing")
-        if self._is_hanging_man(recent[-1]):
-            patterns.append("Hanging Man")
-        if self._is_evening_star(recent):
-            patterns.append("Evening Star")
-        if self._is_three_black_crows(recent):
-            patterns.append("Three Black Crows")
-        if self._is_dark_cloud_cover(recent):
-            patterns.append("Dark Cloud Cover")
-        if self._is_bearish_harami(recent):
-            patterns.append("Bearish Harami")
-        if self._is_gravestone_doji(recent[-1]):
-            patterns.append("Gravestone Doji")
-        
-        # Continuation patterns
-        if self._is_doji(recent[-1]):
-            patterns.append("Doji (Indecision)")
-        if self._is_spinning_top(recent[-1]):
-            patterns.append("Spinning Top")
-        if self._is_long_legged_doji(recent[-1]):
-            patterns.append("Long Legged Doji")
-        if self._is_rising_three_methods(candles[-5:]):
-            patterns.append("Rising Three Methods")
-        if self._is_falling_three_methods(candles[-5:]):
-            patterns.append("Falling Three Methods")
-        
-        # Chart patterns
-        if self._is_head_and_shoulders(candles):
-            patterns.append("Head & Shoulders")
-        if self._is_double_top(candles):
-            patterns.append("Double Top")
-        if self._is_double_bottom(candles):
-            patterns.append("Double Bottom")
-        if self._is_triangle(candles):
-            patterns.append("Triangle Pattern")
-        if self._is_flag_pattern(candles):
-            patterns.append("Flag Pattern")
+        # Chart patterns formed by the most recent swings
+        patterns.extend(active_chart_patterns(ctx.swings, ctx.chart_patterns))
         
         return patterns if patterns else ["No Clear Pattern"]
     
-    def _is_bullish_engulfing(self, candles: List[Candle]) -> bool:
-        """Detect bullish engulfing pattern."""
-        if len(candles) < 2:
-            return False
-        prev = candles[-2]
-        curr = candles[-1]
-        return (curr.close > prev.open and curr.open < prev.close and
-                curr.close > prev.close and curr.open < prev.open and
-                abs(curr.close - curr.open) > abs(prev.close - prev.open))
-    
-    def _is_bearish_engulfing(self, candles: List[Candle]) -> bool:
-        """Detect bearish engulfing pattern."""
-        if len(candles) < 2:
-            return False
-        prev = candles[-2]
-        curr = candles[-1]
-        return (curr.close < prev.open and curr.open > prev.close and
-                curr.close < prev.close and curr.open > prev.open and
-                abs(curr.close - curr.open) > abs(prev.close - prev.open))
+    def _pattern_history(self, ctx: IndicatorContext) -> List[Dict]:
+        """All candlestick and chart pattern occurrences ordered by candle index."""
+        history = pattern_occurrences(ctx.pattern_masks, ctx.candles)
+        history.extend(chart_pattern_occurrences(ctx.swings, ctx.chart_patterns, ctx.candles))
+        history.sort(key=lambda item: item["index"])
+        return history
     
-    def _is_hammer(self, candle: Candle) -> bool:
-        """Detect hammer pattern: small body, long lower wick."""
-        body_size = abs(candle.close - candle.open)
-        lower_wick = min(candle.open, candle.close) - candle.low
-        upper_wick = candle.high - max(candle.close, candle.open)
-        if body_size == 0:
-            return False
-        return lower_wick > body_size * 2.5 and upper_wick < body_size * 0.5
-    
-    def _is_hanging_man(self, candle: Candle) -> bool:
-        """Detect hanging man pattern: small body, long lower wick."""
-        body_size = abs(candle.close - candle.open)
-        lower_wick = min(candle.open, candle.close) - candle.low
-        upper_wick = candle.high - max(candle.close, candle.open)
-        if body_size == 0:
-            return False
-        return (lower_wick > body_size * 2.5 and upper_wick < body_size * 0.5 and 
-                candle.close < candle.open)
-    
-    def _is_doji(self, candle: Candle) -> bool:
-        """Detect doji pattern (very small body, indecision)."""
-        body_size = abs(candle.close - candle.open)
-        high_low = candle.high - candle.low
-        if high_low == 0:
-            return False
-        return body_size / high_low < 0.1
-    
-    def _is_spinning_top(self, candle: Candle) -> bool:
-        """Detect spinning top pattern: small body with equal wicks."""
-        body_size = abs(candle.close - candle.open)
-        upper_wick = candle.high - max(candle.close, candle.open)
-        lower_wick = min(candle.open, candle.close) - candle.low
-        if body_size == 0:
-            return False
-        return body_size < 1 and upper_wick > body_size * 1.5 and lower_wick > body_size * 1.5
-    
-    def _is_long_legged_doji(self, candle: Candle) -> bool:
-        """Detect long legged doji: very small body with long wicks."""
-        body_size = abs(candle.close - candle.open)
-        upper_wick = candle.high - max(candle.close, candle.open)
-        lower_wick = min(candle.open, candle.close) - candle.low
-        high_low = candle.high - candle.low
-        if high_low == 0:
-            return False
-        return (body_size / high_low < 0.1 and upper_wick > high_low * 0.3 and 
-                lower_wick > high_low * 0.3)
-    
-    def _is_dragonfly_doji(self, candle: Candle) -> bool:
-        """Detect dragonfly doji: long lower wick, no upper wick."""
-        body_size = abs(candle.close - candle.open)
-        lower_wick = min(candle.open, candle.close) - candle.low
-        upper_wick = candle.high - max(candle.close, candle.open)
-        high_low = candle.high - candle.low
-        if high_low == 0:
-            return False
-        return (body_size / high_low < 0.1 and lower_wick > high_low * 0.5 and 
-                upper_wick < high_low * 0.1)
-    
-    def _is_gravestone_doji(self, candle: Candle) -> bool:
-        """Detect gravestone doji: long upper wick, no lower wick."""
-        body_size = abs(candle.close - candle.open)
-        upper_wick = candle.high - max(candle.close, candle.open)
-        lower_wick = min(candle.open, candle.close) - candle.low
-        high_low = candle.high - candle.low
-        if high_low == 0:
-            return False
-        return (body_size / high_low < 0.1 and upper_wick > high_low * 0.5 and 
-                lower_wick < high_low * 0.1)
-    
-    def _is_morning_star(self, candles: List[Candle]) -> bool:
-        """Detect morning star pattern: bearish, gap down small body, bullish."""
-        if len(candles) < 3:
-            return False
-        c1, c2, c3 = candles[-3], candles[-2], candles[-1]
-        return (c1.close < c1.open and  # First candle bearish
-                c2.close < c2.open and  # Second candle small bearish
-                c3.close > c3.open and  # Third candle bullish
-                c3.close > c1.close)    # Above first candle's close
-    
-    def _is_evening_star(self, candles: List[Candle]) -> bool:
-        """Detect evening star pattern: bullish, gap up small body, bearish."""
-        if len(candles) < 3:
-            return False
-        c1, c2, c3 = candles[-3], candles[-2], candles[-1]
-        return (c1.close > c1.open and  # First candle bullish
-                c2.close > c2.open and  # Second candle small bullish
-                c3.close < c3.open and  # Third candle bearish
-                c3.close < c1.close)    # Below first candle's close
-    
-    def _is_three_white_soldiers(self, candles: List[Candle]) -> bool:
-        """Detect three white soldiers: three consecutive bullish candles."""
-        if len(candles) < 3:
-            return False
-        for i in range(len(candles)-3, len(candles)):
-            c = candles[i]
-            if c.close <= c.open:  # Not bullish
-                return False
-            if i > 0 and c.close <= candles[i-1].close:  # Not progressing
-                return False
-        return True
-    
-    def _is_three_black_crows(self, candles: List[Candle]) -> bool:
-        """Detect three black crows: three consecutive bearish candles."""
-        if len(candles) < 3:
-            return False
-        for i in range(len(candles)-3, len(candles)):
-            c = candles[i]
-            if c.close >= c.open:  # Not bearish
-                return False
-            if i > 0 and c.close >= candles[i-1].close:  # Not progressing
-                return False
-        return True
-    
-    def _is_piercing_line(self, candles: List[Candle]) -> bool:
-        """Detect piercing line: bearish candle followed by bullish candle."""
-        if len(candles) < 2:
-            return False
-        prev, curr = candles[-2], candles[-1]
-        return (prev.close < prev.open and  # Bearish
-                curr.close > curr.open and  # Bullish
-                curr.close > prev.close and curr.open < prev.close)  # Closes above midpoint
-    
-    def _is_dark_cloud_cover(self, candles: List[Candle]) -> bool:
-        """Detect dark cloud cover: bullish candle followed by bearish candle."""
-        if len(candles) < 2:
-            return False
-        prev, curr = candles[-2], candles[-1]
-        return (prev.close > prev.open and  # Bullish
-                curr.close < curr.open and  # Bearish
-                curr.close < prev.close and curr.open > prev.close)  # Closes below midpoint
-    
-    def _is_bullish_harami(self, candles: List[Candle]) -> bool:
-        """Detect bullish harami: large bearish followed by small bullish inside."""
-        if len(candles) < 2:
-            return False
-        prev, curr = candles[-2], candles[-1]
-        prev_body = abs(prev.close - prev.open)
-        curr_body = abs(curr.close - curr.open)
-        return (prev.close < prev.open and curr.close > curr.open and
-                curr_body < prev_body and curr.open > prev.close and curr.close < prev.open)
-    
-    def _is_bearish_harami(self, candles: List[Candle]) -> bool:
-        """Detect bearish harami: large bullish followed by small bearish inside."""
-        if len(candles) < 2:
-            return False
-        prev, curr = candles[-2], candles[-1]
-        prev_body = abs(prev.close - prev.open)
-        curr_body = abs(curr.close - curr.open)
-        return (prev.close > prev.open and curr.close < curr.open and
-                curr_body < prev_body and curr.open < prev.close and curr.close > prev.open)
-    
-    def _is_rising_three_methods(self, candles: List[Candle]) -> bool:
-        """Detect rising three methods continuation pattern."""
-        if len(candles) < 5:
-            return False
-        # First candle bullish and large
-        if candles[0].close <= candles[0].open:
-            return False
-        # Next three candles small and lower
-        for i in range(1, 4):
-            if candles[i].close > candles[i].open or candles[i].low < candles[i-1].low:
-                return False
-        # Last candle bullish and breaks above first
-        return candles[4].close > candles[4].open and candles[4].close > candles[0].close
-    
-    def _is_falling_three_methods(self, candles: List[Candle]) -> bool:
-        """Detect falling three methods continuation pattern."""
-        if len(candles) < 5:
-            return False
-        # First candle bearish and large
-        if candles[0].close >= candles[0].open:
-            return False
-        # Next three candles small and higher
-        for i in range(1, 4):
-            if candles[i].close < candles[i].open or candles[i].high > candles[i-1].high:
-                return False
-        # Last candle bearish and breaks below first
-        return candles[4].close < candles[4].open and candles[4].close < candles[0].close
-    
-    def _is_double_top(self, candles: List[Candle]) -> bool:
-        """Detect double top pattern."""
-        if len(candles) < 5:
-            return False
-        highs = [c.high for c in candles[-5:]]
-        return abs(highs[1] - highs[3]) < highs[1] * 0.02 and highs[2] < highs[1]
-    
-    def _is_double_bottom(self, candles: List[Candle]) -> bool:
-        """Detect double bottom pattern."""
-        if len(candles) < 5:
-            return False
-        lows = [c.low for c in candles[-5:]]
-        return abs(lows[1] - lows[3]) < lows[1] * 0.02 and lows[2] > lows[1]
-    
-    def _is_triangle(self, candles: List[Candle]) -> bool:
-        """Detect triangle pattern."""
-        if len(candles) < 8:
-            return False
-        highs = [c.high for c in candles[-8:]]
-        lows = [c.low for c in candles[-8:]]
-        return (max(highs) - min(lows)) < 10 and np.std(highs) > np.std(lows) * 0.3
-    
-    def _is_flag_pattern(self, candles: List[Candle]) -> bool:
-        """Detect flag pattern."""
-        if len(candles) < 6:
-            return False
-        closes = [c.close for c in candles[-6:]]
-        return np.std(closes[-4:]) < np.std(closes[:2])
-    
-    def _is_head_and_shoulders(self, candles: List[Candle]) -> bool:
-        """Detect Head and Shoulders pattern - reversal pattern."""
-        if len(candles) < 5:
-            return False
-        
-        # Look for left shoulder, head, right shoulder
-        for i in range(1, len(candles) - 3):
-            left_shoulder = candles[i]
-            head = candles[i + 1]
-            right_shoulder = candles[i + 2]
-            
-            # Head should be higher than shoulders
-            if (head.high > left_shoulder.high and 
-                head.high > right_shoulder.high and
-                left_shoulder.high > left_shoulder.low * 0.95 and
-                right_shoulder.high > right_shoulder.low * 0.95):
-                return True
-        
-        return False
-    
-    def _is_inverse_head_and_shoulders(self, candles: List[Candle]) -> bool:
-        """Detect Inverse Head and Shoulders - bullish reversal."""
-        if len(candles) < 5:
-            return False
-        
-        # Look for inverted pattern
-        for i in range(1, len(candles) - 3):
-            left_shoulder = candles[i]
-            head = candles[i + 1]
-            right_shoulder = candles[i + 2]
-            
-            # Head should be lower than shoulders (inverted)
-            if (head.low < left_shoulder.low and 
-                head.low < right_shoulder.low and
-                left_shoulder.low < left_shoulder.high * 1.05 and
-                right_shoulder.low < right_shoulder.high * 1.05):
-                return True
-        
-        return False
-    
-    
-    def _analyze_historical_patterns(self, candles: List[Candle]) -> int:
+    def _analyze_historical_patterns(self, ctx: IndicatorContext) -> int:
         """Analyze historical price movements and candle patterns for prediction."""
+        candles = ctx.candles
         if len(candles) < 5:
             return 0
         
         score = 0
+        opens, closes, highs, lows = candles.open, candles.close, candles.high, candles.low
+        bullish = closes > opens
         
         # 1. Recent candle strength (bullish vs bearish)
-        bullish_count = sum(1 for c in candles[-5:] if c.close > c.open)
+        bullish_count = int(np.count_nonzero(bullish[-5:]))
         bearish_count = 5 - bullish_count
         
         if bullish_count > bearish_count:
@@ -643,12 +567,7 @@ class CandlestickAnalyzer:
         
         # 2. Momentum - acceleration of uptrend or downtrend
         if len(candles) >= 8:
-            recent_changes = []
-            for i in range(len(candles)-7, len(candles)):
-                change = (candles[i].close - candles[i-1].close) / candles[i-1].close
-                recent_changes.append(change)
-            
-            momentum = sum(recent_changes)
+            momentum = ctx.momentum7
             if momentum > 0.02:  # Strong bullish momentum
                 score += 10
             elif momentum > 0:  # Weak bullish momentum
@@ -660,55 +579,51 @@ class CandlestickAnalyzer:
         
         # 3. Support and Resistance bounce
         if len(candles) >= 10:
-            recent_lows = min(c.low for c in candles[-10:-5])
-            recent_highs = max(c.high for c in candles[-10:-5])
-            current_price = candles[-1].close
+            recent_lows = lows[-10:-5].min()
+            recent_highs = highs[-10:-5].max()
+            current_price = closes[-1]
             
             # Bouncing off support (bullish)
-            if candles[-2].low < recent_lows * 1.01 and current_price > candles[-2].close:
+            if lows[-2] < recent_lows * 1.01 and current_price > closes[-2]:
                 score += 12
             
             # Breaking resistance (bullish)
-            if candles[-1].high > recent_highs * 0.99:
+            if highs[-1] > recent_highs * 0.99:
                 score += 8
         
         # 4. Volume surge analysis
         if len(candles) >= 5:
-            vol_trend = [candles[i].volume for i in range(len(candles)-5, len(candles))]
-            avg_vol = np.mean(vol_trend)
-            current_vol = candles[-1].volume
+            avg_vol = ctx.volume_mean5
+            current_vol = candles.volume[-1]
             
             if current_vol > avg_vol * 1.5:
                 # High volume with bullish candle = strength
-                if candles[-1].close > candles[-1].open:
+                if bullish[-1]:
                     score += 8
                 else:
                     score -= 8
         
         # 5. Volatility compression (breakout signal)
         if len(candles) >= 8:
-            past_volatility = max([abs(c.close - c.open) for c in candles[-8:-4]])
-            current_volatility = abs(candles[-1].close - candles[-1].open)
+            past_volatility = ctx.volatility["past"]
+            current_volatility = ctx.volatility["current"]
             
             if past_volatility > current_volatility * 2:  # Low volatility period
-                if candles[-1].close > np.mean([c.close for c in candles[-5:-1]]):
+                if closes[-1] > np.mean(closes[-5:-1]):
                     score += 5  # Potential breakout up
             elif current_volatility > past_volatility * 1.5:
-                if candles[-1].close > candles[-1].open:
+                if bullish[-1]:
                     score += 6  # Breakout with bullish candle
                 else:
                     score -= 6  # Breakout with bearish candle
         
         # 6. Consecutive pattern strength
-        consecutive_bullish = 0
-        consecutive_bearish = 0
-        for i in range(len(candles)-1, max(0, len(candles)-6), -1):
-            if candles[i].close > candles[i].open:
-                consecutive_bullish += 1
-                consecutive_bearish = 0
-            else:
-                consecutive_bearish += 1
-                consecutive_bullish = 0
+        # Length of the run that starts at the oldest of the last five candles
+        window = bullish[max(1, len(candles) - 5):]
+        same = window == window[0]
+        run = len(window) if same.all() else int(np.argmin(same))
+        consecutive_bullish = run if window[0] else 0
+        consecutive_bearish = 0 if window[0] else run
         
         if consecutive_bullish >= 3:
             score += consecutive_bullish * 2  # Up to 10 points
@@ -718,18 +633,14 @@ class CandlestickAnalyzer:
         # Cap the score contribution
         return max(min(score, 20), -20)
     
-    def _analyze_trend(self, candles: List[Candle]) -> Dict:
+    def _analyze_trend(self, ctx: IndicatorContext) -> Dict:
         """Analyze primary and secondary trends."""
-        if len(candles) < 3:
+        if len(ctx.candles) < 3:
             return {"trend": "UNKNOWN", "strength": 0}
         
-        recent_close = candles[-1].close
-        recent_ma20 = np.mean([c.close for c in candles[-20:]])
-        recent_ma50 = np.mean([c.close for c in candles[-50:]] if len(candles) >= 50 else [c.close for c in candles])
-        
-        # Higher highs and lows = uptrend
-        recent_5_highs = [c.high for c in candles[-5:]]
-        recent_5_lows = [c.low for c in candles[-5:]]
+        recent_close = float(ctx.candles.close[-1])
+        recent_ma20 = ctx.sma20
+        recent_ma50 = ctx.sma50
         
         trend_strength = 0
         if recent_close > recent_ma20 > recent_ma50:
@@ -756,38 +667,13 @@ class CandlestickAnalyzer:
             "currentPrice": round(recent_close, 2)
         }
     
-    def _find_key_levels(self, candles: List[Candle]) -> Dict:
-        """Find support and resistance levels."""
-        if not candles:
-            return {"support": [], "resistance": []}
-        
-        recent = candles[-20:]
-        highs = [c.high for c in recent]
-        lows = [c.low for c in recent]
-        
-        # Find local highs and lows
-        resistances = []
-        supports = []
-        
-        for i in range(1, len(recent) - 1):
-            if highs[i] > highs[i-1] and highs[i] >= highs[i+1]:
-                resistances.append(round(highs[i], 2))
-            if lows[i] < lows[i-1] and lows[i] <= lows[i+1]:
-                supports.append(round(lows[i], 2))
-        
-        return {
-            "support": sorted(set(supports), reverse=True)[:3],
-            "resistance": sorted(set(resistances), reverse=True)[:3],
-            "lastHigh": round(max(highs), 2),
-            "lastLow": round(min(lows), 2)
-        }
-    
-    def _make_prediction(self, candles: List[Candle], patterns: List[str], trend_analysis: Dict) -> Tuple[str, int]:
+    def _make_prediction(self, ctx: IndicatorContext, patterns: List[str], trend_analysis: Dict) -> Tuple[str, int]:
         """Make UP/DOWN prediction with data-driven confidence scoring."""
+        candles = ctx.candles
         score = 50  # Start neutral
         
         # HISTORICAL PATTERN ANALYSIS - Analyze past candle movements
-        historical_score = self._analyze_historical_patterns(candles)
+        historical_score = self._analyze_historical_patterns(ctx)
         
         # Trend analysis (35 points) - Enhanced with better weighting
         trend = trend_analysis.get("trend", "UNKNOWN")
@@ -830,51 +716,40 @@ class CandlestickAnalyzer:
         
         score += min(max(pattern_score, -35), 35)  # Cap at ±35 points
         
+        closes = candles.close
+        last_bullish = closes[-1] > candles.open[-1]
+        
         # Volume analysis (15 points) - Increased from 10
         if len(candles) >= 3:
-            recent_vol = np.mean([c.volume for c in candles[-3:]])
-            prev_vol = np.mean([c.volume for c in candles[-6:-3]]) if len(candles) >= 6 else recent_vol
-            vol_ratio = recent_vol / (prev_vol + 0.0001)
+            vol_ratio = ctx.volume_ratio
             
             if vol_ratio > 1.3:  # Significant volume increase
-                if candles[-1].close > candles[-1].open:
+                if last_bullish:
                     score += 10
                 else:
                     score -= 10
             elif vol_ratio > 1.1:
-                if candles[-1].close > candles[-1].open:
+                if last_bullish:
                     score += 5
                 else:
                     score -= 5
         
         # RSI-like calculation (20 points) - Increased from 15
-        gains = 0
-        losses = 0
-        if len(candles) >= 14:
-            for i in range(len(candles)-14, len(candles)):
-                change = candles[i].close - candles[i-1].close if i > 0 else 0
-                if change > 0:
-                    gains += change
-                else:
-                    losses += abs(change)
-            
-            if gains + losses > 0:
-                rs = gains / (losses + 0.0001)
-                rsi = 100 - (100 / (1 + rs))
-                
-                # Better RSI thresholds
-                if rsi > 70:
-                    score += 12  # Increased from 10
-                elif rsi > 60:
-                    score += 6
-                elif rsi < 30:
-                    score -= 12
-                elif rsi < 40:
-                    score -= 6
+        rsi = ctx.rsi14
+        if rsi is not None:
+            # Better RSI thresholds
+            if rsi > 70:
+                score += 12  # Increased from 10
+            elif rsi > 60:
+                score += 6
+            elif rsi < 30:
+                score -= 12
+            elif rsi < 40:
+                score -= 6
         
         # Support/Resistance proximity (10 points)
-        current_price = candles[-1].close
-        key_levels = self._find_key_levels(candles)
+        current_price = closes[-1]
+        key_levels = ctx.key_levels
         
         support_levels = key_levels.get("support", [])
         resistance_levels = key_levels.get("resistance", [])
@@ -887,16 +762,12 @@ class CandlestickAnalyzer:
         
         # Candle body strength (10 points) - New factor
         recent_3 = candles[-3:]
-        for candle in recent_3:
-            body_size = abs(candle.close - candle.open)
-            wick_size = candle.high - candle.low
-            if wick_size > 0:
-                body_ratio = body_size / wick_size
-                if body_ratio > 0.7:  # Strong candle body
-                    if candle.close > candle.open:
-                        score += 2
-                    else:
-                        score -= 2
+        body_size = recent_3.body
+        wick_size = recent_3.range
+        body_ratio = np.divide(body_size, wick_size, out=np.zeros_like(body_size), where=wick_size > 0)
+        strong = body_ratio > 0.7  # Strong candle body
+        strong_bullish = int(np.count_nonzero(strong & recent_3.bullish))
+        score += 2 * strong_bullish - 2 * (int(np.count_nonzero(strong)) - strong_bullish)
         
         # Make final prediction
         final_score = max(0, min(100, score))  # Clamp between 0-100
@@ -915,23 +786,23 @@ class CandlestickAnalyzer:
         
         return prediction, strength
     
-    def _calculate_levels(self, candles: List[Candle], prediction: str) -> Tuple[str, str]:
+    def _calculate_levels(self, candles: CandleSeries, prediction: str) -> Tuple[str, str]:
         """Calculate stop loss and take profit levels."""
-        if not candles:
+        if len(candles) == 0:
             return "N/A", "N/A"
         
         recent = candles[-5:]
-        current_price = candles[-1].close
+        current_price = float(candles.close[-1])
         
         if prediction == "UP":
             # Stop loss below recent low
-            sl = min([c.low for c in recent]) - 0.5
+            sl = float(recent.low.min()) - 0.5
             # Take profit at 2x risk
             risk = current_price - sl
             tp = current_price + (risk * 2)
         else:  # DOWN
             # Stop loss above recent high
-            sl = max([c.high for c in recent]) + 0.5
+            sl = float(recent.high.max()) + 0.5
             # Take profit at 2x risk
             risk = sl - current_price
             tp = current_price - (risk * 2)
@@ -952,7 +823,7 @@ class CandlestickAnalyzer:
         except:
             return "1:2.0"
     
-    def _detect_timeframe(self, candles: List[Candle]) -> str:
+    def _detect_timeframe(self, candles: CandleSeries) -> str:
         """Detect or infer timeframe from candle count."""
         count = len(candles)
         if count < 10:
@@ -964,7 +835,7 @@ class CandlestickAnalyzer:
         else:
             return "Daily"
     
-    def _generate_analysis_text(self, candles: List[Candle], patterns: List[str], 
+    def _generate_analysis_text(self, candles: CandleSeries, patterns: List[str], 
                                 trend_analysis: Dict, prediction: str) -> str:
         """Generate detailed analysis text."""
         analysis = f"""
@@ -997,10 +868,10 @@ class CandlestickAnalyzer:
         """
         return analysis.strip()
     
-    def _generate_trading_setup(self, candles: List[Candle], prediction: str, 
+    def _generate_trading_setup(self, candles: CandleSeries, prediction: str, 
                                 sl: str, tp: str) -> str:
         """Generate detailed trading setup instructions."""
-        current = candles[-1].close
+        current = candles.close[-1]
         setup = f"""
         TRADING SETUP INSTRUCTIONS:
         
@@ -1026,42 +897,6 @@ class CandlestickAnalyzer:
         """
         return setup.strip()
     
-    def _initialize_patterns(self) -> Dict:
-        """Initialize pattern database with enhanced historical performance metrics."""
-        return {
-            # Bullish Reversal Patterns (Enhanced)
-            "Hammer": {"reliability": 0.75, "bias": "bullish", "reversal_strength": 0.8},
-            "Inverted Hammer": {"reliability": 0.68, "bias": "bullish", "reversal_strength": 0.7},
-            "Bullish Engulfing": {"reliability": 0.78, "bias": "bullish", "reversal_strength": 0.85},
-            "Morning Star": {"reliability": 0.72, "bias": "bullish", "reversal_strength": 0.8},
-            "Bullish Harami": {"reliability": 0.65, "bias": "bullish", "reversal_strength": 0.6},
-            "Three White Soldiers": {"reliability": 0.73, "bias": "bullish", "reversal_strength": 0.85},
-            "Piercing Line": {"reliability": 0.70, "bias": "bullish", "reversal_strength": 0.75},
-            "Unique Three River": {"reliability": 0.68, "bias": "bullish", "reversal_strength": 0.72},
-            
-            # Bearish Reversal Patterns (Enhanced)
-            "Hanging Man": {"reliability": 0.73, "bias": "bearish", "reversal_strength": 0.8},
-            "Bearish Engulfing": {"reliability": 0.78, "bias": "bearish", "reversal_strength": 0.85},
-            "Evening Star": {"reliability": 0.72, "bias": "bearish", "reversal_strength": 0.8},
-            "Three Black Crows": {"reliability": 0.73, "bias": "bearish", "reversal_strength": 0.85},
-            "Bearish Harami": {"reliability": 0.65, "bias": "bearish", "reversal_strength": 0.6},
-            "Dark Cloud Cover": {"reliability": 0.70, "bias": "bearish", "reversal_strength": 0.75},
-            "Thrusting Line": {"reliability": 0.68, "bias": "bearish", "reversal_strength": 0.72},
-            
-            # Neutral/Continuation Patterns (Enhanced)
-            "Doji": {"reliability": 0.62, "bias": "neutral", "continuation_strength": 0.55},
-            "Spinning Top": {"reliability": 0.58, "bias": "neutral", "continuation_strength": 0.5},
-            "Long Legged Doji": {"reliability": 0.65, "bias": "neutral", "continuation_strength": 0.6},
-            "Dragonfly Doji": {"reliability": 0.68, "bias": "bullish", "reversal_strength": 0.75},
-            "Gravestone Doji": {"reliability": 0.68, "bias": "bearish", "reversal_strength": 0.75},
-            
-            # Continuation Patterns
-            "Rising Three Methods": {"reliability": 0.70, "bias": "bullish", "continuation_strength": 0.8},
-            "Falling Three Methods": {"reliability": 0.70, "bias": "bearish", "continuation_strength": 0.8},
-            "Side-by-Side White Lines": {"reliability": 0.60, "bias": "bullish", "continuation_strength": 0.65},
-            "Side-by-Side Dark Lines": {"reliability": 0.60, "bias": "bearish", "continuation_strength": 0.65},
-        }
-    
     def _create_error_response(self, error: str) -> Dict:
         """Create error response."""
         return {
@@ -0,0 +1,205 @@
+"""
+Synthetic candlestick chart corpus with ground-truth OHLC.
+
+Charts are rendered from a seeded random walk at a given resolution, candle
+count, colour theme and noise level. Each chart keeps the OHLC it was drawn
+from, both in prices and on the 0-100 image-height scale the extractors
+report, so extraction accuracy can be scored exactly.
+"""
+import itertools
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterator, List, NamedTuple, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from candle_series import Candle
+
+Color = Tuple[int, int, int]
+
+
+class Theme(NamedTuple):
+    """RGB colours of a chart style. Hollow bullish candles are drawn as outlines."""
+    background: Color
+    bull: Color
+    bear: Color
+    grid: Color
+    text: Color
+    hollow_bull: bool = False
+
+
+THEMES: Dict[str, Theme] = {
+    "light": Theme((255, 255, 255), (0, 160, 0), (200, 0, 0), (230, 230, 230), (60, 60, 60)),
+    "dark": Theme((20, 22, 30), (38, 200, 190), (230, 60, 160), (45, 48, 60), (180, 180, 180)),
+    "mono": Theme((255, 255, 255), (0, 0, 0), (0, 0, 0), (235, 235, 235), (0, 0, 0), hollow_bull=True),
+}
+
+# Width of the price label strip on the right of every chart
+AXIS_WIDTH = 64
+
+
+@dataclass(frozen=True)
+class ChartSpec:
+    candles: int = 60
+    width: int = 1200
+    height: int = 700
+    theme: str = "light"
+    # Standard deviation of Gaussian pixel noise, 0 for clean renders
+    noise: float = 0.0
+    seed: int = 0
+
+    def __post_init__(self):
+        if self.theme not in THEMES:
+            raise ValueError(f"Unknown theme {self.theme!r}, expected one of {tuple(THEMES)}")
+
+    @property
+    def name(self) -> str:
+        return f"{self.candles}c-{self.width}x{self.height}-{self.theme}-n{self.noise:g}"
+
+    def as_dict(self) -> Dict:
+        return asdict(self)
+
+
+class SyntheticChart(NamedTuple):
+    spec: ChartSpec
+    image: np.ndarray  # RGB uint8
+    ohlc: np.ndarray  # (candles, 4) prices
+    truth: np.ndarray  # (candles, 4) on the 0-100 image-height scale
+
+    @property
+    def bullish(self) -> np.ndarray:
+        return self.ohlc[:, 3] >= self.ohlc[:, 0]
+
+
+def random_walk(candles: int, rng: np.random.Generator, start: float = 100.0) -> np.ndarray:
+    """(candles, 4) OHLC array of a random walk where each candle opens at the previous close."""
+    closes = start + np.cumsum(rng.normal(0, 1, candles))
+    opens = np.r_[start, closes[:-1]]
+    highs = np.maximum(opens, closes) + np.abs(rng.normal(0, 0.8, candles))
+    lows = np.minimum(opens, closes) - np.abs(rng.normal(0, 0.8, candles))
+    return np.column_stack([opens, highs, lows, closes])
+
+
+def render_chart(spec: ChartSpec) -> SyntheticChart:
+    """Render spec into an RGB image together with the OHLC it shows."""
+    rng = np.random.default_rng(spec.seed)
+    theme = THEMES[spec.theme]
+    ohlc = random_walk(spec.candles, rng)
+    image = np.full((spec.height, spec.width, 3), theme.background, dtype=np.uint8)
+
+    plot_width = spec.width - AXIS_WIDTH
+    margin = spec.height * 0.06
+    top_price, bottom_price = ohlc[:, 1].max(), ohlc[:, 2].min()
+
+    def to_y(price: np.ndarray) -> np.ndarray:
+        span = (top_price - price) / (top_price - bottom_price)
+        return np.rint(margin + span * (spec.height - 2 * margin)).astype(np.int64)
+
+    # Grid lines and price labels behind the candles
+    for price in np.linspace(bottom_price, top_price, 6):
+        y = int(to_y(price))
+        cv2.line(image, (0, y), (plot_width, y), theme.grid, 1)
+        cv2.putText(image, f"{price:.2f}", (plot_width + 6, y + 4), cv2.FONT_HERSHEY_SIMPLEX,
+                    0.4, theme.text, 1, cv2.LINE_AA)
+    cv2.line(image, (plot_width, 0), (plot_width, spec.height), theme.text, 1)
+
+    pixels = to_y(ohlc)
+    step = plot_width / (spec.candles + 2)
+    half_body = max(1, int(step * 0.3))
+    for i, (open_y, high_y, low_y, close_y) in enumerate(pixels.tolist()):
+        x = int((i + 1.5) * step)
+        bullish = ohlc[i, 3] >= ohlc[i, 0]
+        color = theme.bull if bullish else theme.bear
+        body_top, body_bottom = min(open_y, close_y), max(open_y, close_y)
+        cv2.line(image, (x, high_y), (x, low_y), color, 1)
+        if bullish and theme.hollow_bull:
+            cv2.rectangle(image, (x - half_body, body_top), (x + half_body, body_bottom), theme.background, -1)
+            cv2.rectangle(image, (x - half_body, body_top), (x + half_body, body_bottom), color, 1)
+        else:
+            cv2.rectangle(image, (x - half_body, body_top), (x + half_body, body_bottom), color, -1)
+
+    if spec.noise > 0:
+        noise = rng.normal(0, spec.noise, image.shape)
+        image = np.clip(image + noise, 0, 255).astype(np.uint8)
+
+    truth = 100 - pixels / spec.height * 100
+    return SyntheticChart(spec, image, ohlc, truth)
+
+
+def corpus(resolutions: Sequence[Tuple[int, int]] = ((800, 500), (1600, 900), (3200, 1800)),
+           candle_counts: Sequence[int] = (30, 120),
+           themes: Sequence[str] = tuple(THEMES),
+           noise_levels: Sequence[float] = (0.0, 12.0),
+           seeds: Sequence[int] = (0,)) -> Iterator[ChartSpec]:
+    """Every combination of the given chart parameters, skipping charts too narrow for their candles."""
+    for (width, height), candles, theme, noise, seed in itertools.product(
+            resolutions, candle_counts, themes, noise_levels, seeds):
+        # Below about 5px per candle bodies and gaps cannot both be drawn
+        if (width - AXIS_WIDTH) / (candles + 2) < 5:
+            continue
+        yield ChartSpec(candles, width, height, theme, noise, seed)
+
+
+def _as_array(candles: List[Candle]) -> np.ndarray:
+    return np.array([(c.open, c.high, c.low, c.close) for c in candles], dtype=np.float64).reshape(-1, 4)
+
+
+def score_extraction(chart: SyntheticChart, candles: List[Candle], tolerance: float = 2.0) -> Dict:
+    """
+    Score extracted candles against the chart's ground truth. Candles are
+    aligned in order, allowing missed and spurious candles, by their high and
+    low on the 0-100 scale. A pair within tolerance of both counts as matched.
+    """
+    truth = chart.truth
+    found = _as_array(candles)
+    drawn, extracted = len(truth), len(found)
+    pairs = _align(truth[:, 1:3], found[:, 1:3], tolerance) if extracted else []
+
+    matched = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+    result = {
+        "drawn": drawn,
+        "found": extracted,
+        "matched": len(matched),
+        "recall": len(matched) / drawn if drawn else 0.0,
+        "precision": len(matched) / extracted if extracted else 0.0,
+        "highLowError": None,
+        "bodyError": None,
+        "directionAccuracy": None,
+    }
+    if len(matched):
+        expected, actual = truth[matched[:, 0]], found[matched[:, 1]]
+        result["highLowError"] = float(np.abs(expected[:, 1:3] - actual[:, 1:3]).mean())
+        result["bodyError"] = float(np.abs(np.sort(expected[:, [0, 3]], axis=1)
+                                           - np.sort(actual[:, [0, 3]], axis=1)).mean())
+        result["directionAccuracy"] = float(np.mean(
+            (expected[:, 3] >= expected[:, 0]) == (actual[:, 3] >= actual[:, 0])
+        ))
+    return result
+
+
+def _align(expected: np.ndarray, actual: np.ndarray, tolerance: float) -> List[Tuple[int, int]]:
+    """
+    Order-preserving alignment of two (n, 2) high/low sequences maximizing the
+    number of pairs within tolerance. Returns matched (expected, actual) indices.
+    """
+    distance = np.abs(expected[:, None, :] - actual[None, :, :]).max(axis=2)
+    close = distance <= tolerance
+    n, m = close.shape
+    # Longest common subsequence over the "close enough" relation
+    table = np.zeros((n + 1, m + 1), dtype=np.int32)
+    for i in range(1, n + 1):
+        row, previous, hits = table[i], table[i - 1], close[i - 1]
+        for j in range(1, m + 1):
+            row[j] = previous[j - 1] + 1 if hits[j - 1] else max(previous[j], row[j - 1])
+
+    pairs = []
+    i, j = n, m
+    while i and j:
+        if close[i - 1, j - 1] and table[i, j] == table[i - 1, j - 1] + 1:
+            pairs.append((i - 1, j - 1))
+            i, j = i - 1, j - 1
+        elif table[i - 1, j] >= table[i, j - 1]:
+            i -= 1
+        else:
+            j -= 1
+    return pairs[::-1]
@@ -0,0 +1,191 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Dict, List, MutableSequence, Tuple
+
+from candle_series import CandleSeries
+
+HIGH = 1
+LOW = -1
+
+
+def _window_extremes(values: np.ndarray, order: int, fill: float, reducer) -> tuple:
+    """Reduce the `order` values on each side of every element."""
+    n = len(values)
+    pad = np.full(order, fill)
+    windows = sliding_window_view(np.concatenate([pad, values, pad]), order)
+    return reducer(windows[:n], axis=1), reducer(windows[order + 1:order + 1 + n], axis=1)
+
+
+# (position, price, kind) of one swing
+Swing = Tuple[int, float, int]
+
+
+def zigzag_step(swings: MutableSequence[Swing], candidate: Swing, threshold: float):
+    """
+    Feed the next candidate extremum, in position order, to alternating swings.
+    Shared by SwingIndex and incremental swing tracking so both agree exactly.
+    """
+    _, price, kind = candidate
+    if swings and swings[-1][2] == kind:
+        # Same kind twice in a row: keep the more extreme swing
+        if (price - swings[-1][1]) * kind > 0:
+            swings[-1] = candidate
+        return
+    if swings and abs(price - swings[-1][1]) < threshold:
+        return
+    swings.append(candidate)
+
+
+class SwingIndex:
+    """
+    Alternating swing highs and lows (zigzag) of a candle series.
+    Local extrema are found with one vectorized window pass; consecutive swings
+    of the same kind collapse into the more extreme one and reversals smaller
+    than min_move of the series range are ignored. Built once per series and
+    shared by every chart-pattern detector.
+    """
+
+    __slots__ = ("positions", "prices", "kinds")
+
+    def __init__(self, positions: np.ndarray, prices: np.ndarray, kinds: np.ndarray):
+        self.positions = positions
+        self.prices = prices
+        self.kinds = kinds
+
+    @classmethod
+    def build(cls, candles: CandleSeries, order: int = 2, min_move: float = 0.02) -> "SwingIndex":
+        n = len(candles)
+        if n < 2 * order + 1:
+            return cls(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int8))
+
+        highs, lows = candles.high, candles.low
+        left_max, right_max = _window_extremes(highs, order, -np.inf, np.max)
+        left_min, right_min = _window_extremes(lows, order, np.inf, np.min)
+
+        # Strict on the left, inclusive on the right so plateaus report their first bar.
+        # The last `order` bars are not confirmed yet and are never swings.
+        confirmed = np.arange(n) < n - order
+        is_high = (highs > left_max) & (highs >= right_max) & confirmed
+        is_low = (lows < left_min) & (lows <= right_min) & confirmed
+
+        high_pos = np.flatnonzero(is_high)
+        low_pos = np.flatnonzero(is_low)
+        positions = np.concatenate([high_pos, low_pos])
+        prices = np.concatenate([highs[high_pos], lows[low_pos]])
+        kinds = np.concatenate([np.full(len(high_pos), HIGH, dtype=np.int8),
+                                np.full(len(low_pos), LOW, dtype=np.int8)])
+        # Outside bars can be both; order their low and high by candle direction
+        tiebreak = np.where(candles.bullish[positions], kinds, -kinds)
+        order_idx = np.lexsort((tiebreak, positions))
+
+        threshold = min_move * float(highs.max() - lows.min())
+        return cls(*cls._zigzag(positions[order_idx], prices[order_idx], kinds[order_idx], threshold))
+
+    @staticmethod
+    def _zigzag(positions: np.ndarray, prices: np.ndarray, kinds: np.ndarray, threshold: float) -> tuple:
+        """Collapse candidate extrema into strictly alternating swings."""
+        swings: List[Swing] = []
+        for candidate in zip(positions.tolist(), prices.tolist(), kinds.tolist()):
+            zigzag_step(swings, candidate, threshold)
+        if not swings:
+            return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int8)
+        out_pos, out_price, out_kind = zip(*swings)
+        return (np.array(out_pos, dtype=np.int64), np.array(out_price, dtype=np.float64),
+                np.array(out_kind, dtype=np.int8))
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+
+def _windows(swings: SwingIndex, size: int):
+    """Sliding windows of consecutive swing prices and kinds."""
+    if len(swings) < size:
+        return None, None
+    return sliding_window_view(swings.prices, size), sliding_window_view(swings.kinds, size)
+
+
+def _head_and_shoulders(swings: SwingIndex, kind: int, tolerance: float = 0.3) -> np.ndarray:
+    """
+    Five alternating swings shoulder-neck-head-neck-shoulder. kind=HIGH finds the
+    regular top formation, kind=LOW the inverse one. Returns the window ends.
+    """
+    prices, kinds = _windows(swings, 5)
+    if prices is None:
+        return np.empty(0, dtype=np.int64)
+    # Flip lows so a single set of comparisons covers both formations
+    p = prices * kind
+    left, neck1, head, neck2, right = p.T
+    height = head - (neck1 + neck2) / 2
+    match = ((kinds[:, 0] == kind) & (head > left) & (head > right) &
+             (np.minimum(left, right) > np.maximum(neck1, neck2)) &
+             (np.abs(left - right) <= tolerance * height) & (height > 0))
+    return np.flatnonzero(match) + 4
+
+
+def _double_extreme(swings: SwingIndex, kind: int, tolerance: float = 0.1) -> np.ndarray:
+    """Two swings of the same kind at the same level around an opposite swing."""
+    prices, kinds = _windows(swings, 3)
+    if prices is None:
+        return np.empty(0, dtype=np.int64)
+    p = prices * kind
+    first, middle, second = p.T
+    depth = np.minimum(first, second) - middle
+    match = (kinds[:, 0] == kind) & (depth > 0) & (np.abs(first - second) <= tolerance * depth)
+    return np.flatnonzero(match) + 2
+
+
+def _triangle(swings: SwingIndex) -> np.ndarray:
+    """Two lower-or-equal highs and two higher-or-equal lows with a narrowing range."""
+    prices, kinds = _windows(swings, 4)
+    if prices is None:
+        return np.empty(0, dtype=np.int64)
+    # Rearrange every window as (high1, low1, high2, low2)
+    starts_high = kinds[:, 0] == HIGH
+    h1 = np.where(starts_high, prices[:, 0], prices[:, 1])
+    l1 = np.where(starts_high, prices[:, 1], prices[:, 0])
+    h2 = np.where(starts_high, prices[:, 2], prices[:, 3])
+    l2 = np.where(starts_high, prices[:, 3], prices[:, 2])
+    match = (h2 <= h1) & (l2 >= l1) & ((h2 - l2) < (h1 - l1) * 0.9)
+    return np.flatnonzero(match) + 3
+
+
+def _flag(swings: SwingIndex, pole_ratio: float = 2.0) -> np.ndarray:
+    """A strong pole leg followed by a tight consolidation of four swings."""
+    prices, _ = _windows(swings, 5)
+    if prices is None:
+        return np.empty(0, dtype=np.int64)
+    pole = np.abs(prices[:, 1] - prices[:, 0])
+    consolidation = prices[:, 1:].max(axis=1) - prices[:, 1:].min(axis=1)
+    match = pole >= pole_ratio * consolidation
+    return np.flatnonzero(match) + 4
+
+
+def find_chart_patterns(swings: SwingIndex) -> Dict[str, np.ndarray]:
+    """
+    Every chart pattern occurrence, as positions into the swing index of the
+    swing that completes it.
+    """
+    return {
+        "Head & Shoulders": _head_and_shoulders(swings, HIGH),
+        "Inverse Head & Shoulders": _head_and_shoulders(swings, LOW),
+        "Double Top": _double_extreme(swings, HIGH),
+        "Double Bottom": _double_extreme(swings, LOW),
+        "Triangle Pattern": _triangle(swings),
+        "Flag Pattern": _flag(swings),
+    }
+
+
+def active_chart_patterns(swings: SwingIndex, found: Dict[str, np.ndarray], recent: int = 2) -> List[str]:
+    """Chart patterns completed within the last `recent` swings."""
+    last = len(swings) - recent
+    return [name for name, ends in found.items() if len(ends) and ends[-1] >= last]
+
+
+def chart_pattern_occurrences(swings: SwingIndex, found: Dict[str, np.ndarray],
+                              candles: CandleSeries) -> List[Dict]:
+    """Chart pattern occurrences keyed by the candle index that completes them."""
+    return [
+        {"pattern": name, "index": int(candles.index[swings.positions[end]])}
+        for name, ends in found.items()
+        for end in ends.tolist()
+    ]
@@ -0,0 +1,140 @@
+import threading
+import cv2
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from candle_series import Candle
+from column_extractor import candles_from_runs, column_runs
+from preprocessing import PlotRegion, ink_mask
+
+# Pixels below these HSV levels carry no usable hue
+MIN_SATURATION = 60
+MIN_VALUE = 50
+
+
+class Palette(NamedTuple):
+    """
+    Candle colours as OpenCV hue ranges (0-180). A palette without hue
+    ranges is achromatic: light bodies are bullish and dark bodies bearish.
+    """
+    name: str
+    bull_hues: Tuple[Tuple[int, int], ...]
+    bear_hues: Tuple[Tuple[int, int], ...]
+
+    @property
+    def chromatic(self) -> bool:
+        return bool(self.bull_hues)
+
+
+PALETTES: Dict[str, Palette] = {
+    "green_red": Palette("green_red", ((35, 80),), ((0, 10), (170, 180))),
+    "teal_pink": Palette("teal_pink", ((80, 100),), ((140, 170),)),
+    "white_black": Palette("white_black", (), ()),
+}
+
+# Chart style fingerprint -> palette name, shared by every analysis
+_palette_cache: Dict[tuple, str] = {}
+_palette_lock = threading.Lock()
+_PALETTE_CACHE_SIZE = 256
+
+_BRIDGE = np.ones((1, 3), np.uint8)
+
+
+def _hue_mask(hue: np.ndarray, chroma: np.ndarray, ranges: Tuple[Tuple[int, int], ...]) -> np.ndarray:
+    """0/255 mask of coloured pixels whose hue falls in any of the ranges."""
+    mask = np.zeros_like(hue)
+    for low, high in ranges:
+        mask |= cv2.inRange(hue, low, high)
+    return mask & chroma
+
+
+def _chroma_mask(hsv: np.ndarray) -> np.ndarray:
+    return cv2.inRange(hsv, (0, MIN_SATURATION, MIN_VALUE), (180, 255, 255))
+
+
+def classify_pixels(hsv: np.ndarray, palette: Palette) -> Tuple[np.ndarray, np.ndarray]:
+    """Bullish and bearish 0/255 masks of an HSV frame for a chromatic palette."""
+    hue = np.ascontiguousarray(hsv[..., 0])
+    chroma = _chroma_mask(hsv)
+    return _hue_mask(hue, chroma, palette.bull_hues), _hue_mask(hue, chroma, palette.bear_hues)
+
+
+def _style_fingerprint(sample: np.ndarray, chroma: np.ndarray) -> tuple:
+    """Background brightness plus the two dominant candle hues, coarsely binned."""
+    background = int(np.median(sample[..., 2])) // 64
+    hues = sample[..., 0][chroma > 0]
+    if len(hues) == 0:
+        return background, ()
+    histogram = np.bincount(hues // 10, minlength=19)
+    return background, tuple(sorted(np.argsort(histogram)[-2:].tolist()))
+
+
+def detect_palette(hsv: np.ndarray, min_coverage: float = 0.5) -> Palette:
+    """
+    Pick the palette that explains most coloured pixels of a chart, or the
+    achromatic one when candles carry little colour. Decisions are cached by
+    a coarse style fingerprint, so charts from the same platform and theme
+    skip the scoring.
+    """
+    sample = np.ascontiguousarray(hsv[::4, ::4])
+    chroma = _chroma_mask(sample)
+    fingerprint = _style_fingerprint(sample, chroma)
+    with _palette_lock:
+        cached = _palette_cache.get(fingerprint)
+    if cached is not None:
+        return PALETTES[cached]
+
+    best, best_coverage = PALETTES["white_black"], 0.0
+    coloured = np.count_nonzero(chroma)
+    ink = np.count_nonzero(ink_mask(np.ascontiguousarray(sample[..., 2])))
+    # Mostly grey ink means an achromatic theme, whatever stray colour there is
+    if coloured >= 0.2 * max(ink, 1):
+        for palette in PALETTES.values():
+            if not palette.chromatic:
+                continue
+            bull, bear = classify_pixels(sample, palette)
+            coverage = (np.count_nonzero(bull) + np.count_nonzero(bear)) / coloured
+            if coverage > best_coverage:
+                best, best_coverage = palette, coverage
+        if best_coverage < min_coverage:
+            best = PALETTES["white_black"]
+
+    with _palette_lock:
+        if len(_palette_cache) >= _PALETTE_CACHE_SIZE:
+            _palette_cache.pop(next(iter(_palette_cache)))
+        _palette_cache[fingerprint] = best.name
+    return best
+
+
+def extract_color_candles(rgb: np.ndarray, region: PlotRegion,
+                          palette: Optional[Palette] = None) -> List[Candle]:
+    """
+    Extract candles with their real direction from a colour chart. Pixels are
+    classified bullish or bearish in one vectorized HSV pass, the candle mask
+    is reduced column by column into bodies and wicks, and each candle takes
+    the direction of the majority of its pixels. Achromatic charts use the
+    brightness inside the body instead.
+    """
+    hsv = cv2.cvtColor(rgb, cv2.COLOR_RGB2HSV)
+    palette = palette or detect_palette(hsv)
+
+    if palette.chromatic:
+        bull, bear = classify_pixels(hsv, palette)
+        # Bridge grid lines drawn across candles, which carry no colour
+        runs = column_runs(cv2.morphologyEx(bull | bear, cv2.MORPH_CLOSE, _BRIDGE))
+        if runs is None:
+            return []
+        bull_count = runs.reduce(cv2.reduce(bull, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel())
+        bear_count = runs.reduce(cv2.reduce(bear, 0, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel())
+        bullish = bull_count >= bear_count
+    else:
+        value = np.ascontiguousarray(hsv[..., 2])
+        runs = column_runs(ink_mask(value).view(np.uint8) * 255)
+        if runs is None:
+            return []
+        # Light (or hollow on a light background) bodies are bullish
+        centre_x = (runs.starts + runs.ends - 1) // 2
+        centre_y = (runs.body_top + runs.body_bottom) // 2
+        bullish = value[centre_y, centre_x] >= 128
+
+    return candles_from_runs(runs, region, bullish)
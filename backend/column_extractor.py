@@ -0,0 +1,125 @@
+import cv2
+import numpy as np
+from typing import List, NamedTuple, Optional
+
+from candle_series import Candle
+from preprocessing import PlotRegion
+
+
+class ColumnRuns(NamedTuple):
+    """
+    Runs of inked columns in a binary chart mask, one entry per candle.
+    edges interleaves run starts and (exclusive) ends for np.ufunc.reduceat;
+    extents are rows in the working frame.
+    """
+    edges: np.ndarray
+    high_y: np.ndarray
+    low_y: np.ndarray
+    body_top: np.ndarray
+    body_bottom: np.ndarray
+
+    @property
+    def starts(self) -> np.ndarray:
+        return self.edges[::2]
+
+    @property
+    def ends(self) -> np.ndarray:
+        return self.edges[1::2]
+
+    def reduce(self, per_column: np.ndarray, ufunc=np.add) -> np.ndarray:
+        """Reduce a per-column array over every run."""
+        return ufunc.reduceat(np.append(per_column, 0), self.edges)[::2]
+
+
+def _run_edges(filled: np.ndarray) -> np.ndarray:
+    """Start and end (exclusive) of every run of True, interleaved."""
+    padded = np.concatenate([[False], filled, [False]])
+    return np.flatnonzero(np.diff(padded.astype(np.int8)))
+
+
+def column_runs(binary: np.ndarray) -> Optional[ColumnRuns]:
+    """
+    Reduce a binary (0/255) chart mask to candles in one pass over its columns.
+    Each column is reduced to the vertical extent of its ink, runs of inked
+    columns become candles, the outermost extent of a run is the wick and the
+    extent shared by most of its columns is the body. None if nothing is inked.
+    """
+    height, width = binary.shape
+    # Work on columns as contiguous rows
+    columns = cv2.transpose(binary)
+    # Horizontal lines spanning the chart would join every candle into one run
+    row_ink = cv2.reduce(binary, 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel() // 255
+    lines = np.flatnonzero(row_ink >= width // 2)
+    if len(lines):
+        columns[:, lines] = 0
+
+    inked = columns != 0
+    filled = inked.any(axis=1)
+    edges = _run_edges(filled)
+    if len(edges) == 0:
+        return None
+
+    # Per-column extents; empty columns get sentinels the reductions ignore.
+    # argmax on contiguous boolean rows stops at the first hit.
+    tops = np.where(filled, inked.argmax(axis=1), height)
+    flipped = cv2.flip(columns, 1) != 0
+    bottoms = np.where(filled, height - 1 - flipped.argmax(axis=1), -1)
+
+    # reduceat over interleaved starts and ends, keeping the candle segments only.
+    # A trailing sentinel column keeps an end equal to width a valid index.
+    tops = np.append(tops, height)
+    bottoms = np.append(bottoms, -1)
+    high_y = np.minimum.reduceat(tops, edges)[::2]
+    low_y = np.maximum.reduceat(bottoms, edges)[::2]
+    # Wick columns reach past the body, so the body is the tightest extent
+    body_top = np.maximum.reduceat(np.where(tops == height, -1, tops), edges)[::2]
+    body_bottom = np.minimum.reduceat(np.where(bottoms == -1, height, bottoms), edges)[::2]
+    body_bottom = np.maximum(body_bottom, body_top)
+    return ColumnRuns(edges, high_y, low_y, body_top, body_bottom)
+
+
+def candles_from_runs(runs: Optional[ColumnRuns], region: PlotRegion,
+                      bullish: Optional[np.ndarray] = None) -> List[Candle]:
+    """
+    Convert column runs to candles in full-resolution price space. bullish
+    gives the direction of every run; without it open is the top of the body
+    and close the bottom, like the other extractors.
+    """
+    if runs is None:
+        return []
+    widths = runs.ends - runs.starts
+    x, y, w, h = region.to_full(runs.starts, runs.high_y, widths, runs.low_y - runs.high_y + 1)
+    _, body_y, _, body_h = region.to_full(runs.starts, runs.body_top, widths,
+                                          runs.body_bottom - runs.body_top + 1)
+
+    image_height = region.full_height
+    image_width = region.full_width
+    keep = (w >= 1) & (h >= 2) & (w <= image_width * 0.3) & (h <= image_height * 0.9)
+
+    # Higher on chart = higher price
+    high_price = 100 - (y / image_height) * 100
+    low_price = 100 - ((y + h) / image_height) * 100
+    body_high = 100 - (body_y / image_height) * 100
+    body_low = 100 - ((body_y + body_h) / image_height) * 100
+    if bullish is None:
+        opens, closes = body_high, body_low
+    else:
+        opens = np.where(bullish, body_low, body_high)
+        closes = np.where(bullish, body_high, body_low)
+    volume = w * h
+
+    return [
+        Candle(open=o, high=hi, low=lo, close=c, volume=float(v), index=i)
+        for i, (o, hi, lo, c, v) in enumerate(zip(opens[keep].tolist(), high_price[keep].tolist(),
+                                                  low_price[keep].tolist(), closes[keep].tolist(),
+                                                  volume[keep].tolist()))
+    ]
+
+
+def extract_column_candles(binary: np.ndarray, region: PlotRegion) -> List[Candle]:
+    """
+    Extract candles from a binary (0/255) chart mask in one pass over its
+    columns. Coordinates are mapped back to the full-resolution image through
+    region.
+    """
+    return candles_from_runs(column_runs(binary), region)
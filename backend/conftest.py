@@ -0,0 +1,10 @@
+"""Fixtures shared by the backend tests."""
+import pytest
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """The main API module, importing it with the job queue in memory instead of jobs.db."""
+    monkeypatch.setenv("JOB_DB_PATH", ":memory:")
+    import main
+    return main
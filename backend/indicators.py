@@ -0,0 +1,164 @@
+import time
+import functools
+import numpy as np
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from candle_series import CandleSeries
+from chart_patterns import SwingIndex, find_chart_patterns
+from pattern_engine import scan_candlestick_patterns
+
+
+class StageTimer:
+    """
+    Collects wall-clock time per pipeline stage in milliseconds.
+    Stages may nest, a nested stage's time is excluded from the enclosing one.
+    Events such as extraction fallbacks are counted alongside.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, float] = {}
+        self.events: Dict[str, int] = {}
+        # Seconds spent in nested stages, one entry per open stage
+        self._nested: List[float] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            nested = self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+            self.stages[name] = self.stages.get(name, 0.0) + (elapsed - nested) * 1000
+
+    def record(self, event: str):
+        self.events[event] = self.events.get(event, 0) + 1
+
+    def as_dict(self) -> Dict[str, float]:
+        return {name: round(ms, 3) for name, ms in self.stages.items()}
+
+
+def _indicator(fn):
+    """Compute an indicator on first access, then serve it from the context."""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def getter(self: "IndicatorContext"):
+        try:
+            return self._values[name]
+        except KeyError:
+            pass
+        start = time.perf_counter()
+        value = fn(self)
+        self.compute_ms[name] = round((time.perf_counter() - start) * 1000, 3)
+        self._values[name] = value
+        return value
+
+    return property(getter)
+
+
+def find_key_levels(candles: CandleSeries) -> Dict:
+    """Find support and resistance levels among the last 20 candles."""
+    if len(candles) == 0:
+        return {"support": [], "resistance": []}
+
+    recent = candles[-20:]
+    highs = recent.high
+    lows = recent.low
+
+    # Find local highs and lows
+    is_resistance = (highs[1:-1] > highs[:-2]) & (highs[1:-1] >= highs[2:])
+    is_support = (lows[1:-1] < lows[:-2]) & (lows[1:-1] <= lows[2:])
+    resistances = [round(h, 2) for h in highs[1:-1][is_resistance].tolist()]
+    supports = [round(l, 2) for l in lows[1:-1][is_support].tolist()]
+
+    return {
+        "support": sorted(set(supports), reverse=True)[:3],
+        "resistance": sorted(set(resistances), reverse=True)[:3],
+        "lastHigh": round(float(highs.max()), 2),
+        "lastLow": round(float(lows.min()), 2)
+    }
+
+
+class IndicatorContext:
+    """
+    Indicators for one analysis, each computed lazily and at most once.
+    Every scoring stage reads from the same context instead of recomputing
+    moving averages, RSI, volume ratios or key levels on its own.
+    compute_ms records how long each indicator took the one time it ran.
+    """
+
+    def __init__(self, candles: CandleSeries):
+        self.candles = candles
+        self.compute_ms: Dict[str, float] = {}
+        self._values: Dict[str, object] = {}
+
+    @_indicator
+    def sma20(self) -> float:
+        return np.mean(self.candles.close[-20:])
+
+    @_indicator
+    def sma50(self) -> float:
+        # Falls back to every candle on shorter series
+        return np.mean(self.candles.close[-50:])
+
+    @_indicator
+    def rsi14(self) -> Optional[float]:
+        """RSI over the last 14 closes, None if undefined."""
+        closes = self.candles.close
+        if len(closes) < 14:
+            return None
+        changes = np.diff(closes[max(0, len(closes) - 15):])
+        gains = changes[changes > 0].sum()
+        losses = -changes[changes <= 0].sum()
+        if gains + losses <= 0:
+            return None
+        rs = gains / (losses + 0.0001)
+        return 100 - (100 / (1 + rs))
+
+    @_indicator
+    def volume_ratio(self) -> float:
+        """Mean volume of the last 3 candles relative to the 3 before."""
+        volume = self.candles.volume
+        recent_vol = np.mean(volume[-3:])
+        prev_vol = np.mean(volume[-6:-3]) if len(volume) >= 6 else recent_vol
+        return recent_vol / (prev_vol + 0.0001)
+
+    @_indicator
+    def volume_mean5(self) -> float:
+        return np.mean(self.candles.volume[-5:])
+
+    @_indicator
+    def momentum7(self) -> float:
+        """Sum of the last 7 close-to-close returns."""
+        window = self.candles.close[-8:]
+        return np.sum((window[1:] - window[:-1]) / window[:-1])
+
+    @_indicator
+    def volatility(self) -> Dict[str, float]:
+        """Largest body of candles -8..-5 against the latest body."""
+        body = self.candles.body
+        return {"past": body[-8:-4].max(), "current": body[-1]}
+
+    @_indicator
+    def key_levels(self) -> Dict:
+        return find_key_levels(self.candles)
+
+    @_indicator
+    def pattern_masks(self) -> Dict[str, np.ndarray]:
+        return scan_candlestick_patterns(self.candles)
+
+    @_indicator
+    def swings(self) -> SwingIndex:
+        return SwingIndex.build(self.candles)
+
+    @_indicator
+    def chart_patterns(self) -> Dict[str, np.ndarray]:
+        return find_chart_patterns(self.swings)
+
+    def computed(self) -> List[str]:
+        return list(self._values)
@@ -0,0 +1,349 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional, Set
+
+from analysis_executor import ExecutorBusyError
+
+logger = logging.getLogger(__name__)
+
+# Item states. Queued items wait for a runner slot, running items are being
+# analyzed, done and failed items are final.
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+ITEM_STATES = (QUEUED, RUNNING, DONE, FAILED)
+
+
+class JobItem(NamedTuple):
+    """One chart of a new job. Items with an error are stored as failed and never run."""
+    filename: str
+    payload: bytes
+    reduce: int = 1
+    error: Optional[str] = None
+
+
+class ClaimedItem(NamedTuple):
+    """A running item. Its upload is loaded separately with JobStore.payload."""
+    job_id: str
+    index: int
+    filename: str
+    reduce: int
+    seed: Optional[int]
+    attempts: int
+
+
+class JobStore:
+    """
+    Durable queue of analysis jobs in a local SQLite file. A job is a list of
+    uploaded charts; each chart is an item with its own state, attempt count
+    and result, so progress and partial results survive restarts. Uploads
+    are kept until their item is final. Safe to share between threads;
+    every call does disk I/O, so call it off the event loop.
+
+    A job is filled in as its uploads are read: open_job, then add_item for
+    each chart, then seal_job with the item count. Items are runnable as
+    soon as they are added.
+    """
+
+    def __init__(self, path: str = "jobs.db", ttl_seconds: float = 86400):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY, created REAL, seed INTEGER, total INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                job_id TEXT, idx INTEGER, filename TEXT, state TEXT, attempts INTEGER DEFAULT 0,
+                not_before REAL DEFAULT 0, reduce INTEGER DEFAULT 1, payload BLOB,
+                result TEXT, error TEXT, created REAL,
+                PRIMARY KEY (job_id, idx)
+            );
+            CREATE INDEX IF NOT EXISTS items_by_state ON items (state, not_before, created);
+        """)
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> "JobStore":
+        """Build a store from JOB_* environment variables."""
+        return cls(
+            path=os.getenv("JOB_DB_PATH", "jobs.db"),
+            ttl_seconds=float(os.getenv("JOB_TTL", "86400")),
+        )
+
+    def open_job(self, seed: Optional[int] = None) -> str:
+        """Start a new job without items. Returns the job id."""
+        job_id = uuid.uuid4().hex
+        with self._lock, self._db:
+            # The total stays unset until seal_job, so the job cannot look complete before that
+            self._db.execute("INSERT INTO jobs VALUES (?, ?, ?, NULL)", (job_id, time.time(), seed))
+        return job_id
+
+    def add_item(self, job_id: str, index: int, item: JobItem):
+        """Queue one chart of an open job, or record it as failed if it has an error."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO items (job_id, idx, filename, state, reduce, payload, error, created) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, index, item.filename, FAILED if item.error else QUEUED, item.reduce,
+                 None if item.error else bytes(item.payload), item.error, time.time()),
+            )
+
+    def seal_job(self, job_id: str, total: int):
+        """Record that every item of a job was added."""
+        with self._lock, self._db:
+            self._db.execute("UPDATE jobs SET total = ? WHERE id = ?", (total, job_id))
+
+    def delete_job(self, job_id: str):
+        """Delete a job and its items, e.g. one whose submission failed."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def create(self, items: List[JobItem], seed: Optional[int] = None) -> str:
+        """Store a complete job at once. Returns the job id."""
+        job_id = self.open_job(seed)
+        for index, item in enumerate(items):
+            self.add_item(job_id, index, item)
+        self.seal_job(job_id, len(items))
+        return job_id
+
+    def claim(self, limit: int) -> List[ClaimedItem]:
+        """Mark up to limit queued items as running, oldest jobs first, and return them without their uploads."""
+        if limit <= 0:
+            return []
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT items.job_id, idx, filename, reduce, jobs.seed, attempts "
+                "FROM items JOIN jobs ON jobs.id = items.job_id "
+                "WHERE state = ? AND not_before <= ? ORDER BY items.created, idx LIMIT ?",
+                (QUEUED, time.time(), limit),
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE items SET state = ? WHERE job_id = ? AND idx = ?",
+                [(RUNNING, row[0], row[1]) for row in rows],
+            )
+        return [ClaimedItem(*row) for row in rows]
+
+    def payload(self, job_id: str, index: int) -> Optional[bytes]:
+        """The upload of an item that is not final yet."""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT payload FROM items WHERE job_id = ? AND idx = ?", (job_id, index)
+            ).fetchone()
+        return row[0] if row else None
+
+    def finish(self, job_id: str, index: int, result: Optional[Dict] = None, error: Optional[str] = None,
+               attempted: bool = True):
+        """Record the final result or error of an item and drop its upload."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE items SET state = ?, result = ?, error = ?, payload = NULL, attempts = attempts + ? "
+                "WHERE job_id = ? AND idx = ?",
+                (FAILED if error else DONE, json.dumps(result) if result is not None else None, error,
+                 int(attempted), job_id, index),
+            )
+
+    def requeue(self, job_id: str, index: int, delay: float = 0, error: Optional[str] = None,
+                attempted: bool = True):
+        """Put a running item back in the queue, runnable after delay seconds."""
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE items SET state = ?, not_before = ?, error = ?, attempts = attempts + ? "
+                "WHERE job_id = ? AND idx = ?",
+                (QUEUED, time.time() + delay, error, int(attempted), job_id, index),
+            )
+
+    def recover(self) -> int:
+        """Queue again the items a previous process left running. Returns how many."""
+        with self._lock, self._db:
+            return self._db.execute("UPDATE items SET state = ? WHERE state = ?", (QUEUED, RUNNING)).rowcount
+
+    def purge(self) -> int:
+        """Delete jobs older than the TTL. Returns how many."""
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM items WHERE job_id IN (SELECT id FROM jobs WHERE created < ?)", (cutoff,))
+            return self._db.execute("DELETE FROM jobs WHERE created < ?", (cutoff,)).rowcount
+
+    def queued(self) -> int:
+        """Items waiting to run, over all jobs."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM items WHERE state = ?", (QUEUED,)).fetchone()[0]
+
+    def get(self, job_id: str, offset: int = 0, limit: int = 50) -> Optional[Dict]:
+        """
+        Progress of a job and one page of its items in input order, or None.
+        Final items carry their analysis or error, the others only their state.
+        """
+        with self._lock:
+            job = self._db.execute("SELECT created, total FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if job is None:
+                return None
+            counts = dict(self._db.execute(
+                "SELECT state, COUNT(*) FROM items WHERE job_id = ? GROUP BY state", (job_id,)
+            ).fetchall())
+            rows = self._db.execute(
+                "SELECT idx, filename, state, attempts, result, error FROM items "
+                "WHERE job_id = ? ORDER BY idx LIMIT ? OFFSET ?", (job_id, limit, offset)
+            ).fetchall()
+
+        created, total = job
+        progress = {state: counts.get(state, 0) for state in ITEM_STATES}
+        finished = progress[DONE] + progress[FAILED]
+        sealed = total is not None
+        if not sealed:
+            total = sum(progress.values())
+        if sealed and finished == total:
+            status = "completed"
+        else:
+            status = "running" if finished or progress[RUNNING] else "queued"
+
+        items = []
+        for index, filename, state, attempts, result, error in rows:
+            item = {"index": index, "filename": filename, "status": state, "attempts": attempts}
+            if result is not None:
+                item["analysis"] = json.loads(result)
+            if error is not None:
+                item["error"] = error
+            items.append(item)
+        return {
+            "jobId": job_id,
+            "status": status,
+            "created": created,
+            "total": total,
+            "progress": progress,
+            "offset": offset,
+            "limit": limit,
+            "nextOffset": offset + len(rows) if offset + len(rows) < total else None,
+            "items": items,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+# Analyzes one upload: (contents, filename, seed, reduce) -> result
+AnalyzeFn = Callable[[bytes, str, Optional[int], int], Awaitable[Dict]]
+
+
+class JobRunner:
+    """
+    Works through the queued items of a JobStore on the event loop, at most
+    `concurrency` at a time, by awaiting analyze. Invalid images and failed
+    analyses are final. Other errors are retried up to max_attempts with a
+    growing delay, and items refused by a busy executor wait and run again
+    without using up an attempt. Store calls run in threads, so the disk
+    I/O never blocks the loop, and expired jobs are purged every
+    purge_interval seconds.
+    """
+
+    def __init__(self, store: JobStore, analyze: AnalyzeFn, concurrency: int = 2, max_attempts: int = 3,
+                 retry_delay: float = 2.0, poll_interval: float = 1.0, purge_interval: float = 600.0):
+        self.store = store
+        self.analyze = analyze
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._tasks: Set[asyncio.Task] = set()
+        self._wake: Optional[asyncio.Event] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    @classmethod
+    def from_env(cls, store: JobStore, analyze: AnalyzeFn, default_concurrency: int) -> "JobRunner":
+        """Build a runner from JOB_* environment variables."""
+        return cls(
+            store, analyze,
+            concurrency=int(os.getenv("JOB_CONCURRENCY", str(default_concurrency))),
+            max_attempts=int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+            retry_delay=float(os.getenv("JOB_RETRY_DELAY", "2")),
+        )
+
+    async def start(self):
+        """Recover interrupted items and start dispatching. Call from the event loop."""
+        recovered = await asyncio.to_thread(self.store.recover)
+        if recovered:
+            logger.info(f"Job queue: requeued {recovered} interrupted items")
+        self._wake = asyncio.Event()
+        self._loop_task = asyncio.create_task(self._dispatch())
+
+    def notify(self):
+        """Wake the dispatcher, e.g. after new items were queued."""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def stop(self):
+        """Stop dispatching. Items in progress are queued again for the next start."""
+        tasks = [task for task in (self._loop_task, *self._tasks) if task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop_task = None
+
+    def stats(self) -> Dict:
+        """Runner occupancy. Queries the store, call it off the event loop."""
+        return {"running": len(self._tasks), "queued": self.store.queued(), "concurrency": self.concurrency}
+
+    async def _dispatch(self):
+        while True:
+            self._wake.clear()
+            try:
+                if time.monotonic() >= self._next_purge:
+                    self._next_purge = time.monotonic() + self.purge_interval
+                    purged = await asyncio.to_thread(self.store.purge)
+                    if purged:
+                        logger.info(f"Job queue: purged {purged} expired jobs")
+                claimed = await asyncio.to_thread(self.store.claim, self.concurrency - len(self._tasks))
+                for item in claimed:
+                    task = asyncio.create_task(self._process(item))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._finished)
+            except sqlite3.Error as e:
+                logger.error(f"Job queue unavailable: {str(e)}")
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _finished(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        self.notify()
+
+    async def _process(self, item: ClaimedItem):
+        store = self.store
+        try:
+            payload = await asyncio.to_thread(store.payload, item.job_id, item.index)
+            if payload is None:
+                # The job was purged while the item waited
+                return
+            result = await self.analyze(payload, item.filename, item.seed, item.reduce)
+        except asyncio.CancelledError:
+            await asyncio.to_thread(store.requeue, item.job_id, item.index, attempted=False)
+            raise
+        except ExecutorBusyError as e:
+            await asyncio.to_thread(store.requeue, item.job_id, item.index, delay=e.retry_after, attempted=False)
+        except ValueError as e:
+            # The upload itself is invalid, another attempt cannot succeed
+            await asyncio.to_thread(store.finish, item.job_id, item.index, error=str(e))
+        except Exception as e:
+            attempts = item.attempts + 1
+            if attempts >= self.max_attempts:
+                logger.error(f"Job {item.job_id} item {item.index} failed after {attempts} attempts: {str(e)}")
+                await asyncio.to_thread(store.finish, item.job_id, item.index, error=str(e))
+            else:
+                logger.warning(f"Job {item.job_id} item {item.index} attempt {attempts} failed, retrying: {str(e)}")
+                await asyncio.to_thread(store.requeue, item.job_id, item.index,
+                                        delay=self.retry_delay * attempts, error=str(e))
+        else:
+            error = None if result.get("success", True) else result.get("error", "Analysis failed")
+            await asyncio.to_thread(store.finish, item.job_id, item.index, result=result, error=error)
@@ -1,14 +1,27 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, UploadFile, HTTPException, Header, Query, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-import uvicorn
-from PIL import Image
-import io
-import numpy as np
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+import asyncio
+import hmac
+import json
+import os
+import time
 from candlestick_analyzer import CandlestickAnalyzer
+from analysis_executor import AnalysisExecutor, ExecutorBusyError
+from result_cache import ResultCache
+from jobs import JobItem, JobRunner, JobStore
+from preprocessing import decode_color, decode_grayscale
+from metrics import (ENABLED as METRICS_ENABLED, InFlightMiddleware, analyses_rejected, observe_analysis,
+                     registry, upload_read_seconds)
+from profiling import PROFILE_MODES, RateLimiter, load_profile, profile_call
+from series_input import UnsupportedFormatError, detect_format, parse_series, series_from_json
+from scanner import DEFAULT_LOOKBACK, scan
+from streaming import StreamingAnalyzer
+from uploads import BodySizeLimitMiddleware, MAX_JOB_BYTES, MAX_UPLOAD_BYTES, MULTIPART_OVERHEAD, read_upload
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 import logging
+import numpy as np
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -40,8 +53,77 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Cut off oversized and stalled request bodies before they are parsed
+app.add_middleware(
+    BodySizeLimitMiddleware,
+    path_limits={
+        "/analyze": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+        "/analyze-ohlcv": MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD,
+        "/jobs": MAX_JOB_BYTES,
+    },
+)
+
+app.add_middleware(InFlightMiddleware, paths=["/analyze", "/analyze-ohlcv", "/batch-analyze"])
+
 # Initialize analyzer
-analyzer = CandlestickAnalyzer()
+analyzer = CandlestickAnalyzer(
+    deterministic=os.getenv("ANALYZER_DETERMINISTIC", "false").lower() == "true",
+    extractor=os.getenv("ANALYZER_EXTRACTOR", "contour"),
+    calibrate=os.getenv("ANALYZER_CALIBRATE", "false").lower() == "true",
+)
+
+# Content-addressed cache of analysis results
+result_cache = ResultCache.from_env()
+
+# Executor that keeps decoding and analysis off the event loop
+executor = AnalysisExecutor.from_env()
+
+# In pool mode analysis runs in pre-forked worker processes fed through shared memory
+worker_pool = None
+if executor.mode == "pool":
+    # multiprocessing and shared memory are only loaded when they are used
+    from worker_pool import WorkerPool
+    worker_pool = WorkerPool(analyzer.config, executor.max_workers)
+
+# Maximum charts of one batch decoded and analyzed at the same time
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", str(executor.max_workers)))
+
+# Durable queue of batch jobs, worked through in the background
+job_store = JobStore.from_env()
+
+# Multi-symbol scans over a local OHLCV store, one at a time
+SCAN_STORE_DIR = os.getenv("SCAN_STORE_DIR", "")
+SCAN_STATE_PATH = os.getenv("SCAN_STATE_PATH", "scan_state.json")
+SCAN_WORKERS = int(os.getenv("SCAN_WORKERS", "0")) or None
+SCAN_LOOKBACK = int(os.getenv("SCAN_LOOKBACK", str(DEFAULT_LOOKBACK)))
+scan_lock = asyncio.Lock()
+
+# Per-request profiling, only available with an admin token configured
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+profile_limiter = RateLimiter(int(os.getenv("PROFILE_RATE_LIMIT", "6")), per=60)
+
+# Executor occupancy is read when /metrics is scraped
+registry.gauge("analysis_in_flight", "Analyses running or queued on the executor",
+               function=lambda: executor.stats()["inFlight"])
+registry.gauge("analysis_queue_depth", "Analyses waiting for a free executor worker",
+               function=lambda: executor.stats()["queued"])
+registry.gauge("job_items_queued", "Job items waiting to be analyzed",
+               function=lambda: job_store.queued())
+
+@app.on_event("startup")
+async def start_workers():
+    if worker_pool is not None:
+        worker_pool.start()
+    await job_runner.start()
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    await job_runner.stop()
+    job_store.close()
+    executor.shutdown(wait=False)
+    if worker_pool is not None:
+        worker_pool.shutdown(wait=False)
 
 class AnalysisResponse(BaseModel):
     prediction: str  # "UP" or "DOWN"
@@ -63,47 +145,125 @@ async def root():
         "version": "1.0.0"
     }
 
+def _decode_contents(contents: bytes, reduce: int, version: str) -> Tuple[np.ndarray, Dict, str]:
+    """Decode an upload and hash its pixels into a cache key. Runs on the analysis executor."""
+    # Decode straight to a single-channel frame unless the extractor reads colours,
+    # shrunk while decoding when the image is over the pixel budget
+    decode = decode_color if analyzer.needs_color else decode_grayscale
+    start = time.perf_counter()
+    image, preprocess = decode(contents, reduce)
+    preprocess["decodeMs"] = round((time.perf_counter() - start) * 1000, 3)
+    return image, preprocess, ResultCache.make_key(image, version)
+
+def _analyze_image(image: np.ndarray, seed: int) -> Dict:
+    """Analyze a decoded upload. Runs on the analysis executor."""
+    run_analysis = worker_pool.analyze if worker_pool is not None else analyzer.analyze
+    return run_analysis(image, seed=seed)
+
+async def _analyze_contents(contents: bytes, filename: str, seed: Optional[int] = None, reduce: int = 1) -> Dict:
+    """
+    Decode and analyze an upload on the executor. The request is admitted
+    once for both steps, so a busy executor rejects it before the decode
+    rather than after. The result cache is read and written here in the API
+    process, so with ANALYSIS_EXECUTOR=process hits are still shared between
+    workers.
+    """
+    async with executor.admission():
+        version = analyzer.config_version if seed is None else f"{analyzer.config_version}:seed={seed}"
+        image, preprocess, key = await executor.run(_decode_contents, contents, reduce, version)
+        cached = await asyncio.to_thread(result_cache.get, key)
+        if cached is not None:
+            logger.info(f"Cache hit for {filename}")
+            return {**cached, "preprocess": preprocess, "cached": True}
+
+        logger.info(f"Processing image: {filename}, Shape: {image.shape}, Size: {len(contents)} bytes, "
+                    f"Decoded: {preprocess['decodedBytes']} bytes")
+
+        # Without an explicit seed, derive one from the pixels so results are cacheable
+        if seed is None:
+            seed = ResultCache.seed_for(key)
+        result = await executor.run(_analyze_image, image, seed)
+        if result.get("success"):
+            await asyncio.to_thread(result_cache.put, key, result)
+        return {**result, "preprocess": preprocess, "cached": False}
+
+def _analyze_series_contents(contents: bytes, fmt: str) -> Dict:
+    """Parse and analyze OHLCV data. Runs on the analysis executor."""
+    start = time.perf_counter()
+    series = parse_series(contents, fmt)
+    parse_ms = round((time.perf_counter() - start) * 1000, 3)
+    logger.info(f"Processing {len(series)} candles from {fmt}, Size: {len(contents)} bytes")
+    result = analyzer.analyze_series(series)
+    return {**result, "input": {"format": fmt, "candles": len(series), "parseMs": parse_ms}, "cached": False}
+
+def _profile_contents(contents: bytes, filename: str, seed: Optional[int], reduce: int, mode: str) -> Dict:
+    """
+    Decode and analyze an upload under a profiler. Runs in-process on the
+    executor and skips the result cache, so the work being profiled happens.
+    """
+    def run() -> Dict:
+        decode = decode_color if analyzer.needs_color else decode_grayscale
+        image, preprocess = decode(contents, reduce)
+        return {**analyzer.analyze(image, seed=seed), "preprocess": preprocess}
+    
+    result, report = profile_call(run, mode=mode, directory=PROFILE_DIR or None)
+    logger.info(f"Profiled {filename} with {mode}: {report['durationMs']}ms")
+    return {**result, "cached": False, "profile": report}
+
+async def _analyze_job_item(contents: bytes, filename: str, seed: Optional[int], reduce: int) -> Dict:
+    """Analyze one queued job item."""
+    result = await _analyze_contents(contents, filename, seed, reduce)
+    _record_metrics(result)
+    return result
+
+job_runner = JobRunner.from_env(job_store, _analyze_job_item, default_concurrency=executor.max_workers)
+
+def _authorize_profiling(token: Optional[str]):
+    """Only admins may profile, and only when a token is configured."""
+    if not PROFILE_ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Profiling is disabled")
+    if not token or not hmac.compare_digest(token.encode(), PROFILE_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+def _record_metrics(result: Dict):
+    # Cached results carry the timings of the analysis that produced them
+    if not result.get("cached"):
+        observe_analysis(result, analyzer.config.extractor)
+
+def _busy_exception(e: ExecutorBusyError) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 @app.post("/analyze")
-async def analyze_chart(file: UploadFile = File(...)):
+async def analyze_chart(file: UploadFile = File(...),
+                        seed: Optional[int] = Query(None, description="Seed for reproducible extraction jitter"),
+                        profile: Optional[str] = Query(None, description="Profile the analysis: cprofile or sample"),
+                        x_admin_token: Optional[str] = Header(None)):
     """
     Upload a candlestick chart image for analysis.
     Returns comprehensive technical analysis with patterns, predictions, and trading setup.
     """
+    if profile is not None:
+        _authorize_profiling(x_admin_token)
+        if profile not in PROFILE_MODES:
+            raise HTTPException(status_code=400, detail=f"profile must be one of {', '.join(PROFILE_MODES)}")
+        if not profile_limiter.acquire():
+            raise HTTPException(status_code=429, detail="Profiling rate limit exceeded",
+                                headers={"Retry-After": str(profile_limiter.retry_after())})
     try:
         # Validate file
         if not file.filename:
             raise ValueError("No file provided")
         
-        # Check file size (max 10MB)
-        contents = await file.read()
-        if len(contents) > 10 * 1024 * 1024:
-            raise ValueError("File size exceeds 10MB limit")
-        
-        if len(contents) == 0:
-            raise ValueError("File is empty")
-        
-        # Read and validate image
-        try:
-            image = Image.open(io.BytesIO(contents))
-        except Exception as e:
-            logger.error(f"Failed to open image: {str(e)}")
-            raise ValueError(f"Invalid image file: {str(e)}")
-        
-        # Convert to numpy array
-        img_array = np.array(image)
-        
-        # Convert to RGB if needed
-        if len(img_array.shape) == 2:
-            # Grayscale image
-            img_array = np.stack([img_array] * 3, axis=-1)
-        elif img_array.shape[2] == 4:
-            # RGBA image
-            img_array = img_array[:, :, :3]
-        
-        logger.info(f"Processing image: {file.filename}, Shape: {img_array.shape}, Size: {len(contents)} bytes")
+        # Read in chunks, enforcing the size limit and checking the image header as it arrives
+        with upload_read_seconds.time():
+            contents, header = await read_upload(file)
         
-        # Analyze chart
-        result = analyzer.analyze(img_array)
+        # Decode and analyze chart on the executor
+        if profile is not None:
+            result = await executor.run(_profile_contents, contents, file.filename, seed, header.reduce, profile)
+        else:
+            result = await _analyze_contents(contents, file.filename, seed, header.reduce)
+            _record_metrics(result)
         
         logger.info(f"Analysis complete for {file.filename}: {result.get('prediction', 'UNKNOWN')}")
         
@@ -112,38 +272,250 @@ async def analyze_chart(file: UploadFile = File(...)):
     except ValueError as e:
         logger.error(f"Validation error: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorBusyError as e:
+        analyses_rejected.inc()
+        logger.warning(f"Rejecting {file.filename}: analysis queue full")
+        raise _busy_exception(e)
     except Exception as e:
         logger.error(f"Error analyzing chart: {str(e)}", exc_info=True)
         raise HTTPException(status_code=400, detail=f"Error analyzing image: {str(e)}")
 
+@app.post("/analyze-ohlcv")
+async def analyze_ohlcv(request: Request,
+                        fmt: Optional[str] = Query(None, alias="format",
+                                                   description="json, csv or parquet, inferred when omitted")):
+    """
+    Analyze OHLCV data directly instead of a chart image: a JSON body, or a
+    JSON, CSV or Parquet file as the raw body or the multipart field "file".
+    Image extraction is skipped, so prices and levels are the data's own.
+    """
+    try:
+        content_type = request.headers.get("content-type", "")
+        if content_type.startswith("multipart/form-data"):
+            form = await request.form()
+            file = form.get("file")
+            if file is None or isinstance(file, str):
+                raise ValueError("No file provided")
+            contents = await file.read()
+            fmt = fmt or detect_format(file.content_type, file.filename)
+        else:
+            contents = await request.body()
+            fmt = fmt or detect_format(content_type)
+        if not contents:
+            raise ValueError("No OHLCV data provided")
+        
+        result = await executor.run(_analyze_series_contents, contents, fmt)
+        _record_metrics(result)
+        
+        logger.info(f"Series analysis complete: {result.get('prediction', 'UNKNOWN')}")
+        return JSONResponse(content=result)
+    
+    except UnsupportedFormatError as e:
+        raise HTTPException(status_code=415, detail=str(e))
+    except ValueError as e:
+        logger.error(f"Validation error: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExecutorBusyError as e:
+        analyses_rejected.inc()
+        logger.warning("Rejecting OHLCV analysis: analysis queue full")
+        raise _busy_exception(e)
+
+async def _iter_batch_results(files: List[UploadFile], seed: Optional[int] = None) -> AsyncIterator[Dict]:
+    """
+    Analyze uploads concurrently and yield each result as soon as it finishes.
+    Uploads are only read once a concurrency slot is free, so at most
+    BATCH_CONCURRENCY charts are held in memory at a time.
+    """
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+    
+    async def analyze_item(index: int, file: UploadFile) -> Dict:
+        async with semaphore:
+            try:
+                with upload_read_seconds.time():
+                    contents, header = await read_upload(file)
+                result = await _analyze_contents(contents, file.filename, seed, header.reduce)
+                _record_metrics(result)
+                return {"index": index, "filename": file.filename, "analysis": result}
+            except ExecutorBusyError as e:
+                analyses_rejected.inc()
+                return {"index": index, "filename": file.filename, "error": str(e), "retryAfter": e.retry_after}
+            except Exception as e:
+                return {"index": index, "filename": file.filename, "error": str(e)}
+    
+    tasks = [asyncio.create_task(analyze_item(i, f)) for i, f in enumerate(files)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # Client went away mid-stream: stop queued work
+        for task in tasks:
+            task.cancel()
+
+async def _ndjson_stream(files: List[UploadFile], seed: Optional[int]) -> AsyncIterator[str]:
+    async for item in _iter_batch_results(files, seed):
+        yield json.dumps(item) + "\n"
+
+async def _sse_stream(files: List[UploadFile], seed: Optional[int]) -> AsyncIterator[str]:
+    async for item in _iter_batch_results(files, seed):
+        yield f"event: result\ndata: {json.dumps(item)}\n\n"
+    yield f"event: done\ndata: {json.dumps({'count': len(files)})}\n\n"
+
 @app.post("/batch-analyze")
-async def batch_analyze(files: List[UploadFile] = File(...)):
+async def batch_analyze(files: List[UploadFile] = File(...),
+                        stream: Optional[str] = Query(None, description="Stream results as 'ndjson' or 'sse'"),
+                        seed: Optional[int] = Query(None, description="Seed for reproducible extraction jitter")):
     """
     Analyze multiple chart images in batch.
+    Charts are analyzed concurrently. With stream=ndjson or stream=sse each
+    result is sent as soon as it finishes, tagged with its input index.
     """
-    results = []
+    if stream == "ndjson":
+        return StreamingResponse(_ndjson_stream(files, seed), media_type="application/x-ndjson")
+    if stream == "sse":
+        return StreamingResponse(_sse_stream(files, seed), media_type="text/event-stream",
+                                 headers={"Cache-Control": "no-cache"})
+    if stream is not None:
+        raise HTTPException(status_code=400, detail="stream must be 'ndjson' or 'sse'")
     
-    for file in files:
-        try:
-            contents = await file.read()
-            image = Image.open(io.BytesIO(contents))
-            img_array = np.array(image)
-            result = analyzer.analyze(img_array)
-            results.append({
-                "filename": file.filename,
-                "analysis": result
-            })
-        except Exception as e:
-            results.append({
-                "filename": file.filename,
-                "error": str(e)
-            })
+    results = [item async for item in _iter_batch_results(files, seed)]
+    results.sort(key=lambda item: item["index"])
     
     return JSONResponse(content=results)
 
+@app.post("/jobs", status_code=202)
+async def create_job(files: List[UploadFile] = File(...),
+                     seed: Optional[int] = Query(None, description="Seed for reproducible extraction jitter")):
+    """
+    Queue a batch of chart images for analysis and return a job id at once.
+    Charts are stored durably and analyzed in the background, so the results
+    do not depend on this connection staying open. Poll GET /jobs/{id}.
+    """
+    job_id = await asyncio.to_thread(job_store.open_job, seed)
+    try:
+        # Each chart is stored as soon as it is read, only one is held in memory
+        for index, file in enumerate(files):
+            try:
+                contents, header = await read_upload(file)
+                item = JobItem(file.filename, contents, header.reduce)
+            except ValueError as e:
+                # Recorded as a failed item, the rest of the job still runs
+                item = JobItem(file.filename, b"", error=str(e))
+            await asyncio.to_thread(job_store.add_item, job_id, index, item)
+            job_runner.notify()
+        await asyncio.to_thread(job_store.seal_job, job_id, len(files))
+    except BaseException:
+        await asyncio.shield(asyncio.to_thread(job_store.delete_job, job_id))
+        raise
+    
+    logger.info(f"Queued job {job_id} with {len(files)} charts")
+    return {"jobId": job_id, "status": "queued", "total": len(files), "statusUrl": f"/jobs/{job_id}"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str,
+                  offset: int = Query(0, ge=0, description="Index of the first item to return"),
+                  limit: int = Query(50, ge=1, le=500, description="Items per page")):
+    """Progress of a job and one page of its items, with the analysis or error of finished ones."""
+    job = await asyncio.to_thread(job_store.get, job_id, offset, limit)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.post("/scan")
+async def run_scan(top: int = Query(50, ge=0, description="Rows in the ranked table, 0 for all"),
+                   pattern: List[str] = Query([], description="Only symbols showing one of these patterns"),
+                   min_strength: int = Query(0, ge=0, le=100)):
+    """
+    Scan every symbol of the OHLCV store and rank them by prediction strength.
+    Only symbols whose data changed since the last scan are analyzed again.
+    """
+    if not SCAN_STORE_DIR:
+        raise HTTPException(status_code=404, detail="Scanner is disabled, set SCAN_STORE_DIR")
+    if scan_lock.locked():
+        raise HTTPException(status_code=409, detail="A scan is already running")
+    async with scan_lock:
+        # The scan runs its own process pool, keep the event loop free meanwhile
+        report = await asyncio.to_thread(scan, SCAN_STORE_DIR, SCAN_STATE_PATH, SCAN_WORKERS, SCAN_LOOKBACK,
+                                         pattern, min_strength, top or None)
+    logger.info(f"Scanned {report['analyzed']} of {report['symbols']} symbols, "
+                f"{report['symbolsPerSecond']} symbols/s")
+    return report
+
+def _stream_candles(payload) -> list:
+    """Candles of one stream message: a candle object or array, a list of them, or {"candles": [...]}."""
+    if isinstance(payload, dict) and "candles" in payload:
+        payload = payload["candles"]
+    if isinstance(payload, dict) or (isinstance(payload, list) and payload
+                                     and not isinstance(payload[0], (dict, list))):
+        payload = [payload]
+    return list(series_from_json(payload))
+
+@app.websocket("/ws/stream")
+async def stream_analysis(websocket: WebSocket):
+    """
+    Live analysis of one candle stream. Send candles as JSON, one per message
+    or several at once (e.g. history first), and receive the prediction after
+    the last candle of each message. Each update works on bounded state
+    however long the stream is. Several candles are analyzed on the executor
+    and refused like HTTP requests when it is full.
+    """
+    await websocket.accept()
+    stream = StreamingAnalyzer(analyzer)
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                candles = _stream_candles(json.loads(message))
+            except ValueError as e:
+                # json.JSONDecodeError is a ValueError too
+                await websocket.send_json({"error": str(e), "bars": stream.bars})
+                continue
+            if len(candles) == 1:
+                # One bar takes well under a millisecond, cheaper than a thread hop
+                result = stream.update(candles[0])
+            else:
+                # The stream state lives here, so history runs on an executor thread of this process
+                try:
+                    result = await executor.run_local(stream.extend, candles)
+                except ExecutorBusyError as e:
+                    analyses_rejected.inc()
+                    await websocket.send_json({"error": str(e), "retryAfter": e.retry_after, "bars": stream.bars})
+                    continue
+            await websocket.send_json(result)
+    except WebSocketDisconnect:
+        logger.info(f"Stream closed after {stream.bars} candles")
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "service": "Stock Analysis Bot"}
+    health = {"status": "healthy", "service": "Stock Analysis Bot", "executor": executor.stats()}
+    if worker_pool is not None:
+        health["workerPool"] = worker_pool.stats()
+    health["jobs"] = await asyncio.to_thread(job_runner.stats)
+    return health
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return result_cache.stats()
+
+@app.get("/profiles/{profile_id}")
+async def get_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Download a saved profile: .pstats for cprofile runs, .collapsed stacks for sampled runs."""
+    _authorize_profiling(x_admin_token)
+    found = load_profile(PROFILE_DIR, profile_id) if PROFILE_DIR else None
+    if found is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    name, data = found
+    media_type = "text/plain" if name.endswith(".collapsed") else "application/octet-stream"
+    return Response(content=data, media_type=media_type,
+                    headers={"Content-Disposition": f'attachment; filename="{name}"'})
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Process metrics in the Prometheus text format."""
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    # The job queue gauge reads SQLite
+    return await asyncio.to_thread(registry.render)
 
 if __name__ == "__main__":
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,268 @@
+import bisect
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Label values of one series, in the order of the metric's label names
+LabelValues = Tuple[str, ...]
+
+# With metrics disabled every update returns at its first line
+ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+# Latency buckets in seconds, from sub-millisecond stages to slow uploads
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[label]) for label in self.labels)
+
+
+class Counter(_Metric):
+    """Monotonic counter with optional labels. Thread-safe."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = self._key(labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down. A gauge built with function reads its value
+    when rendered, so keeping it current costs nothing on the request path.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 function: Optional[Callable[[], float]] = None):
+        super().__init__(name, documentation, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._function = function
+
+    def inc(self, amount: float = 1, **labels: str):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        if not ENABLED:
+            return
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track_inprogress(self, **labels: str):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        if self._function is not None:
+            return [(self.name, (), float(self._function()))]
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in cumulative buckets, with sum and count. Thread-safe."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: count per bucket (the last one is +Inf), then the sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        if not ENABLED:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        """Observe the wall-clock seconds spent in the block."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels: str) -> int:
+        with self._lock:
+            counts, _ = self._values.get(self._key(labels), ([0], [0.0]))
+            return sum(counts)
+
+    def samples(self) -> List[Tuple[str, LabelValues, float]]:
+        samples = []
+        with self._lock:
+            values = sorted((key, list(counts), total[0]) for key, (counts, total) in self._values.items())
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                samples.append((f"{self.name}_bucket", key + (_format_bound(bound),), cumulative))
+            samples.append((f"{self.name}_sum", key, total))
+            samples.append((f"{self.name}_count", key, cumulative))
+        return samples
+
+
+class Registry:
+    """Metrics of the process, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+              function: Optional[Callable[[], float]] = None) -> Gauge:
+        return self.register(Gauge(name, documentation, labels, function))
+
+    def histogram(self, name: str, documentation: str, labels: Tuple[str, ...] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            names = metric.labels + ("le",) if metric.kind == "histogram" else metric.labels
+            for name, key, value in metric.samples():
+                lines.append(f"{name}{_format_labels(names[:len(key)], key)} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_bound(bound: float) -> str:
+    return "+Inf" if bound == float("inf") else _format_value(bound)
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(
+        f'{name}="{value.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for name, value in zip(names, values)
+    )
+    return "{" + pairs + "}"
+
+
+def _format_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class InFlightMiddleware:
+    """Tracks requests in progress per path until their response is fully sent, streams included."""
+
+    def __init__(self, app, paths: Sequence[str]):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if not ENABLED or scope["type"] != "http" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        with requests_in_flight.track_inprogress(path=scope["path"]):
+            await self.app(scope, receive, send)
+
+
+# Shared by the API process and everything it calls
+registry = Registry()
+
+images_rejected = registry.counter(
+    "images_rejected_total", "Uploads refused from their image header, by reason", ("reason",)
+)
+images_downscaled = registry.counter(
+    "images_downscaled_total", "Uploads decoded at reduced size to fit the pixel budget, by factor", ("factor",)
+)
+requests_in_flight = registry.gauge(
+    "http_requests_in_flight", "Requests being received, analyzed or streamed, by path", ("path",)
+)
+upload_read_seconds = registry.histogram(
+    "upload_read_seconds", "Time to receive and validate one uploaded image"
+)
+stage_seconds = registry.histogram(
+    "analysis_stage_seconds", "Time per analysis stage: decode, preprocess, extract, patterns, prediction, ...",
+    ("stage",)
+)
+extractions = registry.counter(
+    "extractions_total", "Analyses by the extraction method that produced their candles", ("method",)
+)
+extraction_fallbacks = registry.counter(
+    "extraction_fallbacks_total", "Analyses whose configured extractor fell back to another method", ("to",)
+)
+analyses_rejected = registry.counter(
+    "analyses_rejected_total", "Analyses refused because the executor queue was full"
+)
+
+
+def observe_analysis(result: Dict, extractor: str):
+    """Record stage timings and the extraction method of a fresh (not cached) analysis result."""
+    if not ENABLED:
+        return
+    decode_ms = result.get("preprocess", {}).get("decodeMs")
+    if decode_ms is not None:
+        stage_seconds.observe(decode_ms / 1000, stage="decode")
+    for stage, ms in result.get("stageTimings", {}).items():
+        # Indicator timings are a nested breakdown, not a stage
+        if isinstance(ms, (int, float)):
+            stage_seconds.observe(ms / 1000, stage=stage)
+    method = result.get("extractionMethod")
+    if method:
+        extractions.inc(method=method)
+        if method != extractor:
+            extraction_fallbacks.inc(to=method)
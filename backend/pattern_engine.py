@@ -0,0 +1,120 @@
+import numpy as np
+from typing import Dict, List
+
+from candle_series import CandleSeries
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """numerator / denominator, 0 where the denominator is 0."""
+    return np.divide(numerator, denominator, out=np.zeros_like(numerator), where=denominator != 0)
+
+
+def scan_candlestick_patterns(candles: CandleSeries) -> Dict[str, np.ndarray]:
+    """
+    Evaluate every candlestick pattern over the whole series in one pass.
+    Returns a boolean mask per pattern, in reporting order, that is True at the
+    index of the candle completing the pattern.
+    """
+    n = len(candles)
+    o, h, l, c = candles.open, candles.high, candles.low, candles.close
+    body = candles.body
+    upper = candles.upper_wick
+    lower = candles.lower_wick
+    rng = candles.range
+    bull = c > o
+    bear = c < o
+    body_ratio = _ratio(body, rng)
+    has_body = body != 0
+    has_range = rng != 0
+
+    def empty() -> np.ndarray:
+        return np.zeros(n, dtype=bool)
+
+    # Single-candle patterns
+    hammer_shape = has_body & (lower > body * 2.5) & (upper < body * 0.5)
+    doji = has_range & (body_ratio < 0.1)
+    spinning_top = has_body & (body < 1) & (upper > body * 1.5) & (lower > body * 1.5)
+    long_legged = doji & (upper > rng * 0.3) & (lower > rng * 0.3)
+    dragonfly = doji & (lower > rng * 0.5) & (upper < rng * 0.1)
+    gravestone = doji & (upper > rng * 0.5) & (lower < rng * 0.1)
+
+    # Two-candle patterns, aligned on the second candle
+    bullish_engulfing, bearish_engulfing = empty(), empty()
+    piercing_line, dark_cloud_cover = empty(), empty()
+    bullish_harami, bearish_harami = empty(), empty()
+    if n >= 2:
+        po, pc, pb = o[:-1], c[:-1], body[:-1]
+        co, cc, cb = o[1:], c[1:], body[1:]
+        bullish_engulfing[1:] = (cc > po) & (co < pc) & (cc > pc) & (co < po) & (cb > pb)
+        bearish_engulfing[1:] = (cc < po) & (co > pc) & (cc < pc) & (co > po) & (cb > pb)
+        piercing_line[1:] = (pc < po) & (cc > co) & (cc > pc) & (co < pc)
+        dark_cloud_cover[1:] = (pc > po) & (cc < co) & (cc < pc) & (co > pc)
+        bullish_harami[1:] = (pc < po) & (cc > co) & (cb < pb) & (co > pc) & (cc < po)
+        bearish_harami[1:] = (pc > po) & (cc < co) & (cb < pb) & (co < pc) & (cc > po)
+
+    # Three-candle patterns, aligned on the third candle
+    morning_star, evening_star = empty(), empty()
+    three_white_soldiers, three_black_crows = empty(), empty()
+    if n >= 3:
+        morning_star[2:] = bear[:-2] & bear[1:-1] & bull[2:] & (c[2:] > c[:-2])
+        evening_star[2:] = bull[:-2] & bull[1:-1] & bear[2:] & (c[2:] < c[:-2])
+
+        # The first soldier must also close above the candle before it, when there is one
+        rising = np.ones(n, dtype=bool)
+        rising[1:] = c[1:] > c[:-1]
+        falling = np.ones(n, dtype=bool)
+        falling[1:] = c[1:] < c[:-1]
+        three_white_soldiers[2:] = bull[:-2] & bull[1:-1] & bull[2:] & rising[:-2] & rising[1:-1] & rising[2:]
+        three_black_crows[2:] = bear[:-2] & bear[1:-1] & bear[2:] & falling[:-2] & falling[1:-1] & falling[2:]
+
+    # Five-candle continuation patterns, aligned on the fifth candle
+    rising_three, falling_three = empty(), empty()
+    if n >= 5:
+        pullback = empty()
+        pullback[1:] = (c[1:] <= o[1:]) & (l[1:] >= l[:-1])
+        rally = empty()
+        rally[1:] = (c[1:] >= o[1:]) & (h[1:] <= h[:-1])
+        rising_three[4:] = (bull[:-4] & pullback[1:-3] & pullback[2:-2] & pullback[3:-1] &
+                            bull[4:] & (c[4:] > c[:-4]))
+        falling_three[4:] = (bear[:-4] & rally[1:-3] & rally[2:-2] & rally[3:-1] &
+                             bear[4:] & (c[4:] < c[:-4]))
+
+    return {
+        # Bullish patterns
+        "Bullish Engulfing": bullish_engulfing,
+        "Hammer": hammer_shape,
+        "Morning Star": morning_star,
+        "Three White Soldiers": three_white_soldiers,
+        "Piercing Line": piercing_line,
+        "Bullish Harami": bullish_harami,
+        "Dragonfly Doji": dragonfly,
+        # Bearish patterns
+        "Bearish Engulfing": bearish_engulfing,
+        "Hanging Man": hammer_shape & bear,
+        "Evening Star": evening_star,
+        "Three Black Crows": three_black_crows,
+        "Dark Cloud Cover": dark_cloud_cover,
+        "Bearish Harami": bearish_harami,
+        "Gravestone Doji": gravestone,
+        # Continuation patterns
+        "Doji (Indecision)": doji,
+        "Spinning Top": spinning_top,
+        "Long Legged Doji": long_legged,
+        "Rising Three Methods": rising_three,
+        "Falling Three Methods": falling_three,
+    }
+
+
+def latest_patterns(masks: Dict[str, np.ndarray]) -> List[str]:
+    """Patterns completed by the most recent candle."""
+    return [name for name, mask in masks.items() if len(mask) and mask[-1]]
+
+
+def pattern_occurrences(masks: Dict[str, np.ndarray], candles: CandleSeries) -> List[Dict]:
+    """Every pattern occurrence in the series, ordered by candle index."""
+    occurrences = []
+    for name, mask in masks.items():
+        for position in np.flatnonzero(mask).tolist():
+            occurrences.append({"pattern": name, "index": int(candles.index[position])})
+    occurrences.sort(key=lambda item: item["index"])
+    return occurrences
@@ -0,0 +1,268 @@
+import io
+import logging
+import math
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+# OpenCV decode flags per reduction factor. JPEGs are scaled inside libjpeg's
+# DCT, so the full-size frame is never materialized.
+_REDUCED_FLAGS = {
+    (1, False): cv2.IMREAD_GRAYSCALE, (1, True): cv2.IMREAD_COLOR,
+    (2, False): cv2.IMREAD_REDUCED_GRAYSCALE_2, (2, True): cv2.IMREAD_REDUCED_COLOR_2,
+    (4, False): cv2.IMREAD_REDUCED_GRAYSCALE_4, (4, True): cv2.IMREAD_REDUCED_COLOR_4,
+    (8, False): cv2.IMREAD_REDUCED_GRAYSCALE_8, (8, True): cv2.IMREAD_REDUCED_COLOR_8,
+}
+DECODE_REDUCTIONS = (1, 2, 4, 8)
+
+
+def _decode_pil(contents: bytes, color: bool, reduce: int) -> np.ndarray:
+    with Image.open(io.BytesIO(contents)) as pil_image:
+        mode = "RGB" if color else "L"
+        if reduce > 1:
+            width, height = pil_image.size
+            # draft() picks a JPEG DCT scale, other formats are reduced after loading
+            pil_image.draft(mode, (width // reduce, height // reduce))
+            factor = reduce * pil_image.size[0] // width
+            if factor > 1:
+                pil_image = pil_image.reduce(factor)
+        return np.asarray(pil_image.convert(mode))
+
+
+def _decode(contents: bytes, color: bool, reduce: int = 1) -> Tuple[np.ndarray, Dict]:
+    if reduce not in DECODE_REDUCTIONS:
+        raise ValueError(f"Unsupported decode reduction {reduce}, expected one of {DECODE_REDUCTIONS}")
+    buffer = np.frombuffer(contents, dtype=np.uint8)
+    image = cv2.imdecode(buffer, _REDUCED_FLAGS[reduce, color])
+    decoder = "opencv"
+
+    if image is None:
+        # Formats OpenCV cannot decode go through PIL
+        try:
+            image = _decode_pil(contents, color, reduce)
+        except Exception as e:
+            logger.error(f"Failed to open image: {str(e)}")
+            raise ValueError(f"Invalid image file: {str(e)}")
+        decoder = "pil"
+    elif color:
+        # The analyzer works in RGB, OpenCV decodes to BGR
+        cv2.cvtColor(image, cv2.COLOR_BGR2RGB, dst=image)
+
+    stats = {
+        "decoder": decoder,
+        "shape": list(image.shape),
+        "reduced": reduce,
+        "encodedBytes": len(contents),
+        "decodedBytes": int(image.nbytes),
+    }
+    return image, stats
+
+
+def decode_grayscale(contents: bytes, reduce: int = 1) -> Tuple[np.ndarray, Dict]:
+    """
+    Decode an uploaded image straight into a single-channel uint8 frame.
+    The upload bytes are wrapped without copying and decoded once, with no
+    intermediate 3-channel array. reduce (1, 2, 4 or 8) shrinks each side
+    while decoding. Returns the frame and decode stats.
+    """
+    return _decode(contents, color=False, reduce=reduce)
+
+
+def decode_color(contents: bytes, reduce: int = 1) -> Tuple[np.ndarray, Dict]:
+    """
+    Decode an uploaded image into an RGB uint8 frame, converted in place.
+    Used by extractors that read candle colours.
+    """
+    return _decode(contents, color=True, reduce=reduce)
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    """Single-channel view of an image, converting only when it has colour channels."""
+    if image.ndim == 2:
+        return image
+    if image.shape[2] == 4:
+        return cv2.cvtColor(image, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(image, cv2.COLOR_RGB2GRAY)
+
+
+@dataclass(frozen=True)
+class PlotRegion:
+    """
+    Where the working frame used for extraction sits in the full-resolution
+    image: crop bounds, downscale factor and the full frame size.
+    """
+    top: int
+    bottom: int
+    left: int
+    right: int
+    scale: float
+    full_height: int
+    full_width: int
+
+    @classmethod
+    def whole(cls, gray: np.ndarray) -> "PlotRegion":
+        height, width = gray.shape[:2]
+        return cls(0, height, 0, width, 1.0, height, width)
+
+    def apply(self, image: np.ndarray) -> np.ndarray:
+        """Crop and downsample a full-resolution image (any channel count) to the working frame."""
+        plot = image[self.top:self.bottom, self.left:self.right]
+        if self.scale == 1.0:
+            return plot
+        # Averaged down, 1px wicks would fade into the background. Widening
+        # strokes horizontally first, enough to cover one whole output pixel,
+        # keeps them at full contrast without thickening horizontal grid lines.
+        kernel = np.ones((1, 2 * math.ceil(1 / self.scale) - 1), np.uint8)
+        widen = cv2.MORPH_ERODE if np.median(plot[::4, ::4]) >= 128 else cv2.MORPH_DILATE
+        return cv2.resize(cv2.morphologyEx(plot, widen, kernel), self.size, interpolation=cv2.INTER_AREA)
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        """(width, height) of the working frame."""
+        return (max(1, round((self.right - self.left) * self.scale)),
+                max(1, round((self.bottom - self.top) * self.scale)))
+
+    def to_full(self, x: int, y: int, w: int, h: int) -> Tuple[float, float, float, float]:
+        """Map a bounding box in the working frame back to full-resolution pixels."""
+        if self.scale == 1.0:
+            return x + self.left, y + self.top, w, h
+        return (x / self.scale + self.left, y / self.scale + self.top,
+                w / self.scale, h / self.scale)
+
+
+def ink_mask(gray: np.ndarray, threshold: int = 40, step: int = 1) -> np.ndarray:
+    """
+    Pixels that differ clearly from the background (the median grey level).
+    With step > 1 the mask is max-pooled to 1/step size, so one pixel lines
+    survive the reduction.
+    """
+    background = int(np.median(gray[::4, ::4]))
+    diff = cv2.absdiff(gray, np.full_like(gray, background))
+    if step > 1:
+        diff = cv2.dilate(diff, np.ones((step, step), np.uint8))[::step, ::step]
+    return diff > threshold
+
+
+def _bounds(profile: np.ndarray) -> Optional[Tuple[int, int]]:
+    """First and one-past-last non-empty position of a projection profile."""
+    hits = np.flatnonzero(profile)
+    if len(hits) == 0:
+        return None
+    return int(hits[0]), int(hits[-1]) + 1
+
+
+def _line_positions(mask: np.ndarray, axis: int, min_length: float) -> np.ndarray:
+    """
+    Rows (axis=1) or columns (axis=0) of a 0/1 mask holding a straight run
+    of at least min_length of the frame, found by opening with a line kernel.
+    """
+    if axis == 1:
+        kernel = np.ones((1, max(1, int(mask.shape[1] * min_length))), np.uint8)
+    else:
+        kernel = np.ones((max(1, int(mask.shape[0] * min_length)), 1), np.uint8)
+    lines = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    return np.flatnonzero(lines.any(axis=axis))
+
+
+def _inside_lines(lines: np.ndarray, size: int) -> Tuple[int, int]:
+    """Span inside the outermost lines within the first and last quarter of size."""
+    start, end = 0, size
+    positions = set(lines.tolist())
+    if len(lines) and lines[0] < size // 4:
+        start = int(lines[0])
+        while start in positions:
+            start += 1
+    if len(lines) and lines[-1] >= size - size // 4:
+        end = int(lines[-1]) + 1
+        while end - 1 in positions and end - 1 > start:
+            end -= 1
+    return start, max(start + 1, end)
+
+
+def find_plot_area(gray: np.ndarray, min_line: float = 0.5, pad: int = 8,
+                   step: int = 4) -> Tuple[int, int, int, int]:
+    """
+    Locate the plot area with projection profiles. Straight lines spanning
+    at least min_line of the frame are axis, frame or grid lines; everything
+    outside the outermost of them near each edge is label, legend or toolbar
+    margin. Inside, the area is trimmed to the bounding box of the remaining
+    ink, keeping pad pixels around it so the morphology has room at the
+    border. Profiles are taken on a 1/step size ink mask.
+    Returns (top, bottom, left, right).
+    """
+    height, width = gray.shape
+    mask = ink_mask(gray, step=step).view(np.uint8)
+    rows = _line_positions(mask, 1, min_line)
+    cols = _line_positions(mask, 0, min_line)
+    mask_h, mask_w = mask.shape
+
+    # Outermost axis lines near each edge bound the plot, the lines themselves excluded
+    top, bottom = _inside_lines(rows, mask_h)
+    left, right = _inside_lines(cols, mask_w)
+
+    # Trim empty margins inside the axes, ignoring grid lines across the area
+    content = mask[top:bottom, left:right]
+    row_fill = content.mean(axis=1)
+    col_fill = content.mean(axis=0)
+    row_span = _bounds((row_fill > 0) & (row_fill < 0.9))
+    col_span = _bounds((col_fill > 0) & (col_fill < 0.9))
+    if row_span is None or col_span is None:
+        return 0, height, 0, width
+    return (max(0, (top + row_span[0]) * step - pad), min(height, (top + row_span[1]) * step + pad),
+            max(0, (left + col_span[0]) * step - pad), min(width, (left + col_span[1]) * step + pad))
+
+
+def estimate_candle_spacing(gray: np.ndarray) -> Optional[Tuple[float, float]]:
+    """
+    Median widths in pixels of the runs of inked columns and of the gaps
+    between them, which for a candlestick plot are the body width and the
+    spacing between candles. None when fewer than two runs are drawn.
+    """
+    ink = ink_mask(gray)
+    height, width = ink.shape
+    # Grid lines would ink every column or split the gaps, drop them first
+    ink[np.count_nonzero(ink, axis=1) >= width // 2, :] = False
+    ink[:, np.count_nonzero(ink, axis=0) >= height // 2] = False
+    inked = np.concatenate([[False], ink.any(axis=0), [False]])
+    edges = np.flatnonzero(np.diff(inked.astype(np.int8)))
+    starts, ends = edges[::2], edges[1::2]
+    if len(starts) < 2:
+        return None
+    return float(np.median(ends - starts)), float(np.median(starts[1:] - ends[:-1]))
+
+
+def prepare_plot(gray: np.ndarray, target_candle_width: int = 8, min_gap: int = 8,
+                 min_scale: float = 0.25, min_side: int = 200) -> Tuple[np.ndarray, PlotRegion]:
+    """
+    Crop a chart to its plot area and downsample it so candles are about
+    target_candle_width pixels wide, so the heavy morphology only runs on
+    the pixels it needs. Gaps between candles are kept at least min_gap
+    pixels wide so closing does not merge neighbours. Returns the working
+    frame and the PlotRegion that maps it back to full resolution.
+    """
+    height, width = gray.shape
+    top, bottom, left, right = find_plot_area(gray)
+    plot = gray[top:bottom, left:right]
+
+    scale = 1.0
+    spacing = estimate_candle_spacing(plot)
+    if spacing:
+        candle_width, gap = spacing
+        scale = max(min_scale, target_candle_width / candle_width, min_gap / gap,
+                    min_side / max(1, min(plot.shape)))
+    # Mild reductions are not worth the resampling
+    if scale > 0.75:
+        scale = 1.0
+
+    if scale < 1.0:
+        # Use the factor actually applied after rounding the width
+        scale = max(1, round((right - left) * scale)) / (right - left)
+
+    region = PlotRegion(top, bottom, left, right, scale, height, width)
+    return region.apply(gray), region
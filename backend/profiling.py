@@ -0,0 +1,145 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+PROFILE_MODES = ("cprofile", "sample")
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` events per `per` seconds, in bursts of up to `rate`. Thread-safe."""
+
+    def __init__(self, rate: int, per: float = 60.0):
+        self.rate = rate
+        self.per = per
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> bool:
+        """Take a token if one is available."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.per)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def retry_after(self) -> int:
+        """Seconds until the next token."""
+        with self._lock:
+            return max(1, int((1 - self._tokens) * self.per / max(self.rate, 1)) + 1)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler:
+    """
+    Samples the Python stack of one thread at a fixed interval from a
+    background thread, counting identical stacks in the collapsed format
+    flame graph tools read ("outer;inner;leaf count"). Frames above the
+    profiled call are left out.
+    """
+
+    def __init__(self, thread_id: int, interval: float = 0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._root = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self, root_frame):
+        self._root = root_frame
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None and frame is not self._root:
+                names.append(_frame_name(frame))
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+                self.samples += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+def profile_call(fn: Callable[..., Any], *args: Any, mode: str = "cprofile", interval: float = 0.001,
+                 top: int = 30, directory: Optional[str] = None) -> Tuple[Any, Dict]:
+    """
+    Run fn(*args) under a profiler on the calling thread. Returns its result
+    and a profile report: a pstats listing for "cprofile", collapsed stacks
+    for "sample". With directory set the full profile is also saved there as
+    <id>.pstats (pstats.Stats, snakeviz, ...) or <id>.collapsed
+    (flamegraph.pl, speedscope, ...).
+    """
+    if mode not in PROFILE_MODES:
+        raise ValueError(f"Unknown profile mode '{mode}', expected one of {', '.join(PROFILE_MODES)}")
+
+    start = time.perf_counter()
+    if mode == "cprofile":
+        profiler = cProfile.Profile()
+        result = profiler.runcall(fn, *args)
+        elapsed = time.perf_counter() - start
+        listing = io.StringIO()
+        stats = pstats.Stats(profiler, stream=listing)
+        stats.sort_stats("cumulative").print_stats(top)
+        report = {"mode": mode, "durationMs": round(elapsed * 1000, 3), "pstats": listing.getvalue()}
+    else:
+        sampler = StackSampler(threading.get_ident(), interval)
+        sampler.start(sys._getframe())
+        try:
+            result = fn(*args)
+        finally:
+            sampler.stop()
+        elapsed = time.perf_counter() - start
+        report = {"mode": mode, "durationMs": round(elapsed * 1000, 3), "samples": sampler.samples,
+                  "intervalMs": interval * 1000, "collapsed": sampler.collapsed()}
+
+    if directory:
+        report["id"] = uuid.uuid4().hex[:12]
+        os.makedirs(directory, exist_ok=True)
+        if mode == "cprofile":
+            path = os.path.join(directory, f"{report['id']}.pstats")
+            stats.dump_stats(path)
+        else:
+            path = os.path.join(directory, f"{report['id']}.collapsed")
+            with open(path, "w") as f:
+                f.write(report["collapsed"])
+        logger.info(f"Saved {mode} profile to {path}")
+    return result, report
+
+
+def load_profile(directory: str, profile_id: str) -> Optional[Tuple[str, bytes]]:
+    """(file name, contents) of a saved profile, or None. profile_id must be a saved id."""
+    if not profile_id.isalnum():
+        return None
+    for suffix in (".pstats", ".collapsed"):
+        path = os.path.join(directory, profile_id + suffix)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                return profile_id + suffix, f.read()
+    return None
@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class ResultCache:
+    """
+    Content-addressed cache of analysis results.
+    Keys hash the decoded pixels together with the analyzer config version, so
+    the same chart re-encoded or re-uploaded maps to the same entry. Entries live
+    in an in-process LRU bounded by size and TTL, optionally backed by a SQLite
+    file that survives restarts, bounded to max_disk_rows and purged of
+    expired rows every purge_interval seconds. Disk reads and writes hold
+    their own lock, so memory hits never wait on them. Safe to share between
+    threads.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 3600,
+                 disk_path: Optional[str] = None, max_disk_rows: int = 100000,
+                 purge_interval: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.disk_path = disk_path
+        self.max_disk_rows = max_disk_rows
+        self.purge_interval = purge_interval
+        self._entries: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "diskHits": 0, "misses": 0, "stores": 0, "evictions": 0, "diskEvictions": 0}
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        # Rows written and time of the last disk purge
+        self._unpurged = 0
+        self._purged_at = 0.0
+
+        if disk_path:
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, created REAL, payload TEXT)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_by_created ON results (created)")
+            self._purge_disk()
+
+    @classmethod
+    def from_env(cls) -> "ResultCache":
+        """Build a cache from RESULT_CACHE_* environment variables."""
+        return cls(
+            max_entries=int(os.getenv("RESULT_CACHE_SIZE", "1024")),
+            ttl_seconds=float(os.getenv("RESULT_CACHE_TTL", "3600")),
+            disk_path=os.getenv("RESULT_CACHE_PATH") or None,
+            max_disk_rows=int(os.getenv("RESULT_CACHE_DISK_ROWS", "100000")),
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @staticmethod
+    def make_key(image: np.ndarray, version: str) -> str:
+        """Hash decoded pixels, shape and dtype together with the analyzer version."""
+        digest = hashlib.sha256()
+        digest.update(version.encode())
+        digest.update(str(image.shape).encode())
+        digest.update(str(image.dtype).encode())
+        digest.update(np.ascontiguousarray(image).data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def seed_for(key: str) -> int:
+        """
+        Derive an RNG seed from a cache key so the extraction jitter is a pure
+        function of the pixels and a cached result equals a fresh one.
+        """
+        return int(key[:16], 16)
+
+    def get(self, key: str) -> Optional[Dict]:
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, result = entry
+                if now - created <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._counters["hits"] += 1
+                    return result
+                del self._entries[key]
+
+        row = None
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT created, payload FROM results WHERE key = ?", (key,)
+                ).fetchone()
+
+        with self._lock:
+            if row and now - row[0] <= self.ttl_seconds:
+                result = json.loads(row[1])
+                self._store_memory(key, row[0], result)
+                self._counters["diskHits"] += 1
+                return result
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, key: str, result: Dict):
+        if not self.enabled:
+            return
+
+        now = time.time()
+        with self._lock:
+            self._store_memory(key, now, result)
+            self._counters["stores"] += 1
+        if self._db is None:
+            return
+
+        payload = json.dumps(result)
+        with self._db_lock:
+            try:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, created, payload) VALUES (?, ?, ?)",
+                    (key, now, payload),
+                )
+                self._db.commit()
+                self._unpurged += 1
+                # A tenth of the row cap may be written between purges
+                if (self._unpurged > self.max_disk_rows // 10
+                        or time.monotonic() - self._purged_at > self.purge_interval):
+                    self._purge_disk()
+            except sqlite3.Error as e:
+                logger.warning(f"Failed to persist cached result: {str(e)}")
+
+    def _purge_disk(self):
+        """Delete expired rows, then the oldest beyond max_disk_rows. Called with _db_lock held."""
+        expired = self._db.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl_seconds,))
+        evicted = self._db.execute(
+            "DELETE FROM results WHERE key IN "
+            "(SELECT key FROM results ORDER BY created DESC LIMIT -1 OFFSET ?)", (self.max_disk_rows,)
+        )
+        self._db.commit()
+        self._unpurged = 0
+        self._purged_at = time.monotonic()
+        if evicted.rowcount > 0:
+            with self._lock:
+                self._counters["diskEvictions"] += evicted.rowcount
+        if expired.rowcount > 0 or evicted.rowcount > 0:
+            logger.info(f"Result cache purged {expired.rowcount} expired and {evicted.rowcount} excess rows")
+
+    def _store_memory(self, key: str, created: float, result: Dict):
+        self._entries[key] = (created, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._counters["evictions"] += 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["diskHits"] + self._counters["misses"]
+            hits = self._counters["hits"] + self._counters["diskHits"]
+            return {
+                **self._counters,
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "ttlSeconds": self.ttl_seconds,
+                "disk": self.disk_path is not None,
+                "maxDiskRows": self.max_disk_rows,
+                "hitRate": round(hits / lookups, 4) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM results")
+                self._db.commit()
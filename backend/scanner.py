@@ -0,0 +1,246 @@
+"""
+Multi-symbol pattern scanner over a local OHLCV store.
+
+The store is a directory with one file per symbol, named after it:
+<SYMBOL>.npy, a (bars, 4|5) float array of open, high, low, close and
+optionally volume (or a structured array with those field names), memory-
+mapped so only the analyzed tail is read; or <SYMBOL>.parquet with open,
+high, low, close and optional volume columns, named as series_input
+accepts them, of which only the row groups holding the tail are read
+(needs pyarrow).
+
+Each symbol's last `lookback` bars are analyzed with
+CandlestickAnalyzer.analyze_series in a process pool, and symbols are
+ranked by prediction strength. A state file remembers every symbol's file
+signature, bar count and result, so later runs only analyze symbols that
+gained bars and reuse the rest.
+
+    python scanner.py /data/ohlcv --state scan_state.json --top 25
+    python scanner.py /data/ohlcv --pattern Hammer --pattern "Bullish Engulfing" --output ranked.json
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from candle_series import CandleSeries
+from candlestick_analyzer import ANALYZER_VERSION, CandlestickAnalyzer
+from series_input import PRICE_COLUMNS, column_key, series_from_columns
+
+logger = logging.getLogger(__name__)
+
+STORE_FORMATS = (".npy", ".parquet")
+# Bars analyzed per symbol, enough for SMA50 and the swing and pattern windows
+DEFAULT_LOOKBACK = 250
+
+# Per-process analyzer of a scan worker, set by _init_worker
+_worker_analyzer: Optional[CandlestickAnalyzer] = None
+
+
+class SymbolFile(NamedTuple):
+    symbol: str
+    path: str
+    # Size and modification time, a changed signature means new bars may have arrived
+    signature: Tuple[int, int]
+
+
+def list_store(directory: str) -> List[SymbolFile]:
+    """Symbol files of a store directory, sorted by symbol."""
+    files = []
+    for name in sorted(os.listdir(directory)):
+        symbol, extension = os.path.splitext(name)
+        if extension.lower() not in STORE_FORMATS:
+            continue
+        path = os.path.join(directory, name)
+        stat = os.stat(path)
+        files.append(SymbolFile(symbol, path, (stat.st_size, stat.st_mtime_ns)))
+    return files
+
+
+def load_tail(path: str, lookback: int) -> Tuple[CandleSeries, int]:
+    """The last lookback bars of a symbol file and its total bar count."""
+    if path.lower().endswith(".npy"):
+        array = np.load(path, mmap_mode="r")
+        bars = len(array)
+        tail = array[max(0, bars - lookback):]
+        if array.dtype.names:
+            columns = {name: np.array(tail[name]) for name in array.dtype.names}
+        elif tail.ndim == 2 and tail.shape[1] in (4, 5):
+            columns = dict(zip(PRICE_COLUMNS + ("volume",), np.array(tail, dtype=np.float64).T))
+        else:
+            raise ValueError(f"Expected a (bars, 4|5) array or named OHLCV fields, got shape {array.shape}")
+        return series_from_columns(columns), bars
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet stores need pyarrow (pip install pyarrow)")
+    parquet = pq.ParquetFile(path)
+    metadata = parquet.metadata
+    bars = metadata.num_rows
+    wanted = set(PRICE_COLUMNS + ("volume",))
+    names = [name for name in parquet.schema_arrow.names if column_key(name) in wanted]
+    # Only the trailing row groups that hold the last lookback rows are read
+    groups, rows = [], 0
+    for group in reversed(range(metadata.num_row_groups)):
+        if rows >= lookback:
+            break
+        groups.append(group)
+        rows += metadata.row_group(group).num_rows
+    table = parquet.read_row_groups(groups[::-1], columns=names).slice(max(0, rows - lookback))
+    return series_from_columns({name: table.column(name).to_numpy() for name in names}), bars
+
+
+def _init_worker():
+    global _worker_analyzer
+    _worker_analyzer = CandlestickAnalyzer(deterministic=True)
+
+
+def scan_symbol(path: str, lookback: int) -> Dict:
+    """Analyze one symbol file. Runs in a scan worker."""
+    analyzer = _worker_analyzer or CandlestickAnalyzer(deterministic=True)
+    try:
+        series, bars = load_tail(path, lookback)
+    except (OSError, ValueError) as e:
+        return {"error": str(e)}
+    result = analyzer.analyze_series(series)
+    if not result.get("success"):
+        return {"bars": bars, "error": result.get("error", "Analysis failed")}
+    return {
+        "bars": bars,
+        "prediction": result["prediction"],
+        "strength": result["strength"],
+        "patterns": result["patterns"],
+        "currentPrice": result["currentPrice"],
+        "stopLoss": result["stopLoss"],
+        "takeProfit": result["takeProfit"],
+    }
+
+
+class ScanState:
+    """Per-symbol file signature, bar count and last result, kept in a JSON file between runs."""
+
+    def __init__(self, path: Optional[str], version: str):
+        self.path = path
+        self.version = version
+        self.symbols: Dict[str, Dict] = {}
+        if path and os.path.exists(path):
+            with open(path) as f:
+                saved = json.load(f)
+            # Results of another analyzer version or lookback are not reused
+            if saved.get("version") == version:
+                self.symbols = saved["symbols"]
+            else:
+                logger.info(f"Scan state {path} is from {saved.get('version')}, rescanning every symbol")
+
+    def unchanged(self, file: SymbolFile) -> bool:
+        entry = self.symbols.get(file.symbol)
+        return entry is not None and tuple(entry["signature"]) == file.signature
+
+    def save(self):
+        if not self.path:
+            return
+        temporary = f"{self.path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump({"version": self.version, "symbols": self.symbols}, f)
+        os.replace(temporary, self.path)
+
+
+def rank(symbols: Dict[str, Dict], patterns: Sequence[str] = (), min_strength: int = 0,
+         top: Optional[int] = None) -> List[Dict]:
+    """Analyzed symbols by descending strength, optionally only those showing one of patterns."""
+    rows = [
+        {"symbol": symbol, **entry["result"]}
+        for symbol, entry in symbols.items()
+        if "error" not in entry["result"] and entry["result"]["strength"] >= min_strength
+        and (not patterns or set(patterns) & set(entry["result"]["patterns"]))
+    ]
+    rows.sort(key=lambda row: (-row["strength"], row["symbol"]))
+    return rows[:top] if top else rows
+
+
+def scan(directory: str, state_path: Optional[str] = None, workers: Optional[int] = None,
+         lookback: int = DEFAULT_LOOKBACK, patterns: Sequence[str] = (), min_strength: int = 0,
+         top: Optional[int] = None) -> Dict:
+    """
+    Scan a store, analyzing only symbols whose file changed since the state
+    was saved, and return the ranked table with run statistics.
+    """
+    start = time.perf_counter()
+    files = list_store(directory)
+    state = ScanState(state_path, f"{ANALYZER_VERSION}:lookback={lookback}")
+    changed = [file for file in files if not state.unchanged(file)]
+
+    workers = workers or os.cpu_count() or 1
+    if len(changed) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                 initializer=_init_worker) as pool:
+            chunksize = max(1, len(changed) // (workers * 8))
+            results = list(pool.map(scan_symbol, [file.path for file in changed],
+                                    [lookback] * len(changed), chunksize=chunksize))
+    else:
+        results = [scan_symbol(file.path, lookback) for file in changed]
+
+    new_bars = 0
+    for file, result in zip(changed, results):
+        previous = state.symbols.get(file.symbol, {}).get("result", {}).get("bars", 0)
+        new_bars += max(0, result.get("bars", 0) - previous)
+        state.symbols[file.symbol] = {"signature": list(file.signature), "result": result}
+    # Symbols whose file was removed drop out of the ranking
+    present = {file.symbol for file in files}
+    state.symbols = {symbol: entry for symbol, entry in state.symbols.items() if symbol in present}
+    state.save()
+
+    elapsed = time.perf_counter() - start
+    errors = {file.symbol: result["error"] for file, result in zip(changed, results) if "error" in result}
+    for symbol, error in errors.items():
+        logger.warning(f"Could not scan {symbol}: {error}")
+    return {
+        "symbols": len(files),
+        "analyzed": len(changed),
+        "unchanged": len(files) - len(changed),
+        "newBars": new_bars,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "symbolsPerSecond": round(len(changed) / elapsed, 1) if elapsed > 0 else None,
+        "ranked": rank(state.symbols, patterns, min_strength, top),
+    }
+
+
+def _print_report(report: Dict):
+    print(f"{'symbol':<12} {'prediction':<10} {'strength':>8} {'price':>12}  patterns")
+    for row in report["ranked"]:
+        print(f"{row['symbol']:<12} {row['prediction']:<10} {row['strength']:>8} {row['currentPrice']:>12.4f}  "
+              f"{', '.join(row['patterns'])}")
+    print(f"\nAnalyzed {report['analyzed']} of {report['symbols']} symbols ({report['unchanged']} unchanged, "
+          f"{report['newBars']} new bars, {len(report['errors'])} errors) in {report['seconds']:.2f}s, "
+          f"{report['symbolsPerSecond']} symbols/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("store", help="directory of <SYMBOL>.npy or <SYMBOL>.parquet files")
+    parser.add_argument("--state", help="JSON state file, enables incremental runs")
+    parser.add_argument("--workers", type=int, help="scan processes, defaults to one per core")
+    parser.add_argument("--lookback", type=int, default=DEFAULT_LOOKBACK, help="bars analyzed per symbol")
+    parser.add_argument("--pattern", action="append", default=[], help="only symbols showing this pattern")
+    parser.add_argument("--min-strength", type=int, default=0)
+    parser.add_argument("--top", type=int, default=50, help="rows in the ranked table, 0 for all")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger("candlestick_analyzer").setLevel(logging.ERROR)
+
+    report = scan(args.store, args.state, args.workers, args.lookback, args.pattern, args.min_strength,
+                  args.top or None)
+    _print_report(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {args.output}")
@@ -0,0 +1,147 @@
+"""
+Parsing of OHLCV data given directly instead of as a chart image.
+
+JSON takes either columns ({"open": [...], "high": [...], ...}, optionally
+wrapped in {"candles": ...}) or rows, as objects ({"open": 1, ...}) or
+arrays ([open, high, low, close, volume]). CSV and Parquet take one row per
+candle with open, high, low, close and an optional volume column; names are
+matched case-insensitively and other columns such as dates are ignored.
+Parquet needs the optional pyarrow package.
+"""
+import csv
+import io
+import json
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from candle_series import CandleSeries
+
+SERIES_FORMATS = ("json", "csv", "parquet")
+PRICE_COLUMNS = ("open", "high", "low", "close")
+# Short names accepted for each column
+_ALIASES = {"o": "open", "h": "high", "l": "low", "c": "close", "v": "volume", "vol": "volume"}
+
+
+class UnsupportedFormatError(ValueError):
+    """The input format is unknown, or its parser is not installed."""
+
+
+def column_key(name) -> str:
+    """The OHLCV field a column name stands for, matched case-insensitively, or the name itself."""
+    key = str(name).strip().lower()
+    return _ALIASES.get(key, key)
+
+
+def detect_format(content_type: Optional[str] = None, filename: Optional[str] = None) -> str:
+    """Input format from a file extension or a content type."""
+    if filename and "." in filename:
+        extension = filename.rsplit(".", 1)[1].lower()
+        if extension in ("parquet", "pq"):
+            return "parquet"
+        if extension in ("csv", "json"):
+            return extension
+    content_type = (content_type or "").split(";")[0].strip().lower()
+    if content_type.endswith("json"):
+        return "json"
+    if content_type in ("text/csv", "application/csv", "text/plain"):
+        return "csv"
+    if "parquet" in content_type:
+        return "parquet"
+    raise UnsupportedFormatError(
+        f"Cannot tell the format of {filename or content_type or 'the input'}, "
+        f"expected one of {', '.join(SERIES_FORMATS)}"
+    )
+
+
+def parse_series(contents: bytes, fmt: str) -> CandleSeries:
+    """Parse OHLCV contents in the given format. Raises ValueError on malformed input."""
+    if fmt == "json":
+        try:
+            payload = json.loads(contents)
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise ValueError(f"Invalid JSON: {str(e)}")
+        return series_from_json(payload)
+    if fmt == "csv":
+        return series_from_csv(contents)
+    if fmt == "parquet":
+        return series_from_parquet(contents)
+    raise UnsupportedFormatError(f"Unknown format '{fmt}', expected one of {', '.join(SERIES_FORMATS)}")
+
+
+def series_from_json(payload) -> CandleSeries:
+    if isinstance(payload, dict) and "candles" in payload:
+        payload = payload["candles"]
+    if isinstance(payload, dict):
+        return series_from_columns(payload)
+    if not isinstance(payload, list) or not payload:
+        raise ValueError("Expected OHLCV columns or a non-empty list of candles")
+    if all(isinstance(row, dict) for row in payload):
+        names = {name for row in payload for name in row}
+        return series_from_columns({name: [row.get(name) for row in payload] for name in names})
+    if all(isinstance(row, (list, tuple)) and len(row) in (4, 5) for row in payload):
+        width = len(payload[0])
+        if any(len(row) != width for row in payload):
+            raise ValueError("Candle arrays must all have the same length")
+        columns = list(zip(*payload))
+        return series_from_columns(dict(zip(PRICE_COLUMNS + ("volume",), columns)))
+    raise ValueError("Candles must be all objects or all [open, high, low, close(, volume)] arrays")
+
+
+def series_from_csv(contents: bytes) -> CandleSeries:
+    try:
+        text = contents.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ValueError("CSV input must be UTF-8 text")
+    rows = [row for row in csv.reader(io.StringIO(text)) if row]
+    if len(rows) < 2:
+        raise ValueError("CSV input needs a header row and at least one candle")
+    header, rows = rows[0], rows[1:]
+    if any(len(row) != len(header) for row in rows):
+        raise ValueError("CSV rows must have as many fields as the header")
+    return series_from_columns({name: [row[i] for row in rows] for i, name in enumerate(header)})
+
+
+def series_from_parquet(contents: bytes) -> CandleSeries:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise UnsupportedFormatError("Parquet input needs pyarrow (pip install pyarrow)")
+    try:
+        table = pq.read_table(pa.BufferReader(contents))
+    except (pa.ArrowInvalid, OSError) as e:
+        raise ValueError(f"Invalid Parquet file: {str(e)}")
+    # Only the OHLCV columns are converted, dates and other columns are skipped
+    wanted = set(PRICE_COLUMNS + ("volume",))
+    return series_from_columns({name: table.column(name).to_numpy() for name in table.column_names
+                                if column_key(name) in wanted})
+
+
+def series_from_columns(columns: Dict[str, Sequence]) -> CandleSeries:
+    """Build a checked CandleSeries from named columns, matching names case-insensitively."""
+    named: Dict[str, Sequence] = {}
+    for name, values in columns.items():
+        named.setdefault(column_key(name), values)
+
+    missing = [name for name in PRICE_COLUMNS if name not in named]
+    if missing:
+        raise ValueError(f"Missing OHLCV columns: {', '.join(missing)}")
+    arrays: List[np.ndarray] = []
+    for name in PRICE_COLUMNS + ("volume",):
+        if name not in named:
+            continue
+        try:
+            array = np.asarray(named[name], dtype=np.float64)
+        except (TypeError, ValueError):
+            raise ValueError(f"Column '{name}' must hold numbers")
+        if array.ndim != 1:
+            raise ValueError(f"Column '{name}' must be one-dimensional")
+        if not np.isfinite(array).all():
+            raise ValueError(f"Column '{name}' has missing or non-finite values")
+        arrays.append(array)
+
+    series = CandleSeries(*arrays)
+    if np.any(series.high < series.low):
+        raise ValueError(f"High is below low in candle {int(np.argmax(series.high < series.low))}")
+    return series
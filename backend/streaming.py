@@ -0,0 +1,216 @@
+import math
+from collections import deque
+from typing import Deque, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from candle_series import Candle, CandleSeries
+from candlestick_analyzer import CandlestickAnalyzer
+from chart_patterns import HIGH, LOW, Swing, SwingIndex, active_chart_patterns, find_chart_patterns, zigzag_step
+from indicators import IndicatorContext
+from pattern_engine import latest_patterns, scan_candlestick_patterns
+
+# Bars every prediction input looks back over at most: SMA50. RSI14 needs 15,
+# key levels 20, momentum and volatility 8, the candlestick patterns 5.
+WINDOW = 50
+# Candles the longest candlestick pattern spans, plus the one before it
+PATTERN_WINDOW = 6
+# Swings the chart patterns completed by the last two swings can span
+SWING_WINDOW = 6
+# Swings kept as the starting point for replaying the zigzag
+SWING_HISTORY = 24
+# Hard bound on the candidates kept for a replay, in case the swings stall
+MAX_CANDIDATES = 1024
+
+
+class BarWindow:
+    """
+    The last `size` bars in chronological order. Each bar is written twice
+    into a buffer of 2 * size, so the window is always one contiguous slice
+    and reading it as a CandleSeries copies nothing.
+    """
+
+    def __init__(self, size: int = WINDOW):
+        self.size = size
+        self.count = 0
+        self._data = np.zeros((5, 2 * size))
+
+    def append(self, candle: Sequence[float]):
+        slot = self.count % self.size
+        self._data[:, slot] = candle
+        self._data[:, slot + self.size] = candle
+        self.count += 1
+
+    def series(self) -> CandleSeries:
+        n = min(self.count, self.size)
+        start = self.count % self.size if self.count >= self.size else 0
+        o, h, l, c, v = self._data[:, start:start + n]
+        return CandleSeries(o, h, l, c, v, index=np.arange(self.count - n, self.count))
+
+
+class SwingTracker:
+    """
+    Incremental SwingIndex.build. Each bar confirms at most one candidate
+    extremum `order` bars back, which is fed to the zigzag in O(1).
+
+    The zigzag threshold is a share of the range of every bar so far, so a
+    bar that extends the range changes it. Only the last `history` swings
+    are kept, and the candidates since the oldest of them. When the
+    threshold changes, the zigzag is replayed from that oldest swing rather
+    than from the first bar, so the work and memory per stream stay bounded.
+    Swings further back are assumed not to change, and the last `keep`
+    swings, which the active chart patterns look at, are usually the ones a
+    batch SwingIndex.build over the whole history finds.
+    """
+
+    def __init__(self, order: int = 2, min_move: float = 0.02, keep: int = SWING_WINDOW,
+                 history: int = SWING_HISTORY, max_candidates: int = MAX_CANDIDATES):
+        self.order = order
+        self.min_move = min_move
+        self.keep = keep
+        self.bars = 0
+        self._candidates: Deque[Swing] = deque(maxlen=max_candidates)
+        self._swings: Deque[Swing] = deque(maxlen=max(history, keep))
+        self._high = -math.inf
+        self._low = math.inf
+        self._threshold = 0.0
+        # Bumped whenever index() would return something else
+        self.version = 0
+
+    def update(self, window: CandleSeries):
+        """Account for the latest bar of window, which must hold at least order * 2 + 1 bars when available."""
+        self.bars += 1
+        self._high = max(self._high, float(window.high[-1]))
+        self._low = min(self._low, float(window.low[-1]))
+
+        before = self._recent()
+        new = self._confirm(window)
+        threshold = self.min_move * (self._high - self._low)
+        if threshold != self._threshold:
+            self._threshold = threshold
+            new = self._replay_from_anchor()
+        for candidate in new:
+            zigzag_step(self._swings, candidate, threshold)
+        self._prune()
+        if self.bars == 2 * self.order + 1 or self._recent() != before:
+            self.version += 1
+
+    def _recent(self) -> List[Swing]:
+        return list(self._swings)[-self.keep:]
+
+    def _replay_from_anchor(self) -> List[Swing]:
+        """Reset the swings to the oldest kept one and return the candidates after it."""
+        if not self._swings:
+            return list(self._candidates)
+        anchor = self._swings[0]
+        self._swings.clear()
+        self._swings.append(anchor)
+        candidates = list(self._candidates)
+        return candidates[1:] if candidates and candidates[0] == anchor else candidates
+
+    def _prune(self):
+        """Drop candidates before the oldest kept swing, a replay starts there."""
+        if not self._swings:
+            return
+        anchor = self._swings[0]
+        while self._candidates and self._candidates[0] != anchor and self._candidates[0][0] <= anchor[0]:
+            self._candidates.popleft()
+
+    def _confirm(self, window: CandleSeries) -> List[Swing]:
+        """Candidates at the bar `order` back from the latest, ordered as SwingIndex orders them."""
+        position = self.bars - 1 - self.order
+        if position < 0:
+            return []
+        # The candidate bar and up to `order` bars on each side, the right side is always full
+        at = len(window) - 1 - self.order
+        left = slice(max(0, at - self.order), at)
+        right = slice(at + 1, at + 1 + self.order)
+        high, low = float(window.high[at]), float(window.low[at])
+
+        found = []
+        if high > window.high[left].max(initial=-math.inf) and high >= window.high[right].max():
+            found.append((position, high, HIGH))
+        if low < window.low[left].min(initial=math.inf) and low <= window.low[right].min():
+            found.append((position, low, LOW))
+        # Outside bars are both; a bullish one reaches its low first
+        if len(found) == 2 and window.close[at] > window.open[at]:
+            found.reverse()
+        self._candidates.extend(found)
+        return found
+
+    def index(self) -> SwingIndex:
+        """The most recent swings, as SwingIndex.build would end them."""
+        if self.bars < 2 * self.order + 1 or not self._swings:
+            return SwingIndex(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int8))
+        positions, prices, kinds = zip(*self._recent())
+        return SwingIndex(np.array(positions, dtype=np.int64), np.array(prices, dtype=np.float64),
+                          np.array(kinds, dtype=np.int8))
+
+
+class StreamingAnalyzer:
+    """
+    Stateful analysis of a live candle stream, one bar at a time.
+
+    Instead of recomputing every indicator over the whole history, it keeps
+    the last WINDOW bars and bounded incremental swing state. The trend and
+    prediction stages of CandlestickAnalyzer run unchanged on that window,
+    so each update gives the prediction a batch analysis of every bar so far
+    would, with time and memory bounded however long the stream runs. The
+    one exception is a trend so steep that no pullback reaches the zigzag
+    threshold, whose last swings can lie before SwingTracker's window. One
+    instance serves one stream and is not thread-safe.
+    """
+
+    def __init__(self, analyzer: Optional[CandlestickAnalyzer] = None, window: int = WINDOW):
+        self.analyzer = analyzer or CandlestickAnalyzer()
+        self.window = BarWindow(max(window, WINDOW))
+        self.swings = SwingTracker()
+        # Chart patterns only change with the swings, most bars reuse them
+        self._chart_patterns: List[str] = []
+        self._swing_version = -1
+
+    @property
+    def bars(self) -> int:
+        return self.window.count
+
+    def update(self, candle: Candle) -> Dict:
+        """Add the next bar and return the updated prediction."""
+        self.window.append((candle.open, candle.high, candle.low, candle.close, candle.volume))
+        recent = self.window.series()
+        self.swings.update(recent)
+
+        if self.bars < 3:
+            return {"bars": self.bars, "success": False, "error": "At least 3 candles are needed"}
+
+        # Same order as _identify_patterns: candlestick patterns, then chart patterns
+        if self.swings.version != self._swing_version:
+            swings = self.swings.index()
+            self._chart_patterns = active_chart_patterns(swings, find_chart_patterns(swings))
+            self._swing_version = self.swings.version
+        patterns = latest_patterns(scan_candlestick_patterns(recent[-PATTERN_WINDOW:]))
+        patterns.extend(self._chart_patterns)
+        patterns = patterns or ["No Clear Pattern"]
+
+        ctx = IndicatorContext(recent)
+        trend = self.analyzer._analyze_trend(ctx)
+        prediction, strength = self.analyzer._make_prediction(ctx, patterns, trend)
+        stop_loss, take_profit = self.analyzer._calculate_levels(recent, prediction)
+        return {
+            "bars": self.bars,
+            "prediction": prediction,
+            "strength": strength,
+            "patterns": patterns,
+            "trend": trend,
+            "keyLevels": ctx.key_levels,
+            "stopLoss": stop_loss,
+            "takeProfit": take_profit,
+            "currentPrice": float(recent.close[-1]),
+            "success": True,
+        }
+
+    def extend(self, candles: Sequence[Candle]) -> Optional[Dict]:
+        """Add several bars in order and return the prediction after the last one."""
+        result = None
+        for candle in candles:
+            result = self.update(candle)
+        return result
@@ -0,0 +1,144 @@
+"""
+Checks admission control in analysis_executor.py and the 503 /analyze
+answers with once the executor is full.
+
+    python -m pytest test_analysis_executor.py
+"""
+import asyncio
+import threading
+
+import cv2
+import httpx
+import pytest
+
+from analysis_executor import AnalysisExecutor, ExecutorBusyError
+from chart_corpus import ChartSpec, render_chart
+from metrics import analyses_rejected
+from result_cache import ResultCache
+
+
+@pytest.fixture(scope="module")
+def png() -> bytes:
+    chart = render_chart(ChartSpec(candles=30, width=800, height=500))
+    return cv2.imencode(".png", cv2.cvtColor(chart.image, cv2.COLOR_RGB2BGR))[1].tobytes()
+
+
+async def _until(condition, timeout: float = 5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not reached")
+
+
+def _post(client: httpx.AsyncClient, png: bytes):
+    return client.post("/analyze", files={"file": ("chart.png", png, "image/png")})
+
+
+def test_admission_holds_one_slot_for_every_run():
+    async def scenario():
+        executor = AnalysisExecutor(max_workers=1, max_queue=0)
+        entered, release = asyncio.Event(), asyncio.Event()
+
+        async def request():
+            async with executor.admission():
+                assert await executor.run(sum, [1, 2]) == 3
+                entered.set()
+                await release.wait()
+                # Not rejected, although the executor is full
+                async with executor.admission():
+                    assert await executor.run_local(len, "abc") == 3
+                assert await asyncio.create_task(executor.run(max, [4, 5])) == 5
+                assert executor.stats()["inFlight"] == 1
+
+        holder = asyncio.create_task(request())
+        await entered.wait()
+        with pytest.raises(ExecutorBusyError):
+            await executor.run(sum, [1])
+        with pytest.raises(ExecutorBusyError):
+            async with executor.admission():
+                pass
+        release.set()
+        await holder
+        assert executor.stats()["inFlight"] == 0
+        executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_full_executor_answers_503_with_retry_after(api, monkeypatch, png):
+    monkeypatch.setattr(api, "executor", AnalysisExecutor(max_workers=1, max_queue=1, retry_after=7))
+    monkeypatch.setattr(api, "result_cache", ResultCache(max_entries=0))
+    release = threading.Event()
+    analyze_image = api._analyze_image
+
+    def blocked_analysis(image, seed):
+        release.wait(5)
+        return analyze_image(image, seed)
+
+    monkeypatch.setattr(api, "_analyze_image", blocked_analysis)
+    rejected = analyses_rejected.value()
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # One analysis running and one queued behind it fill the executor
+            held = [asyncio.create_task(_post(client, png)) for _ in range(2)]
+            await _until(lambda: api.executor.stats()["inFlight"] == 2)
+            busy = await _post(client, png)
+            release.set()
+            return busy, await asyncio.gather(*held)
+
+    busy, held = asyncio.run(scenario())
+    assert busy.status_code == 503
+    assert busy.headers["Retry-After"] == "7"
+    assert analyses_rejected.value() == rejected + 1
+    assert [response.status_code for response in held] == [200, 200]
+    api.executor.shutdown()
+
+
+class SlowCache(ResultCache):
+    """A disabled cache whose lookups wait until released."""
+
+    def __init__(self):
+        super().__init__(max_entries=0)
+        self.looking_up = threading.Event()
+        self.release = threading.Event()
+
+    def get(self, key):
+        self.looking_up.set()
+        self.release.wait(5)
+        return None
+
+
+def test_admitted_request_is_not_rejected_between_decode_and_analysis(api, monkeypatch, png):
+    monkeypatch.setattr(api, "executor", AnalysisExecutor(max_workers=1, max_queue=0))
+    cache = SlowCache()
+    monkeypatch.setattr(api, "result_cache", cache)
+    decodes = []
+    decode_contents = api._decode_contents
+
+    def counted_decode(*args):
+        decodes.append(1)
+        return decode_contents(*args)
+
+    monkeypatch.setattr(api, "_decode_contents", counted_decode)
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=api.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            first = asyncio.create_task(_post(client, png))
+            # Decoded and off the executor, reading the cache: its slot is still held
+            await _until(cache.looking_up.is_set)
+            assert api.executor.stats()["inFlight"] == 1
+            second = await _post(client, png)
+            cache.release.set()
+            return await first, second
+
+    first, second = asyncio.run(scenario())
+    assert first.status_code == 200
+    assert first.json()["success"] is True
+    # The latecomer is turned away before it decodes anything
+    assert second.status_code == 503
+    assert len(decodes) == 1
+    api.executor.shutdown()
@@ -0,0 +1,102 @@
+"""
+Checks of /batch-analyze?stream=ndjson|sse: results arrive as they finish,
+tagged with their input index, and a bad upload only fails its own item.
+
+    python -m pytest test_batch_streaming.py
+"""
+import json
+import threading
+
+import cv2
+import pytest
+from fastapi.testclient import TestClient
+
+from analysis_executor import AnalysisExecutor
+from chart_corpus import ChartSpec, render_chart
+from result_cache import ResultCache
+
+# The first chart is held back until another item has finished
+WIDTHS = (800, 900)
+
+
+def _png(width: int, seed: int) -> bytes:
+    chart = render_chart(ChartSpec(candles=30, width=width, height=500, seed=seed))
+    return cv2.imencode(".png", cv2.cvtColor(chart.image, cv2.COLOR_RGB2BGR))[1].tobytes()
+
+
+@pytest.fixture
+def batch(api, monkeypatch):
+    """Three uploads, the middle one not an image, with the first analysis finishing last."""
+    monkeypatch.setattr(api, "executor", AnalysisExecutor(max_workers=4))
+    monkeypatch.setattr(api, "BATCH_CONCURRENCY", 4)
+    monkeypatch.setattr(api, "result_cache", ResultCache(max_entries=0))
+    another_finished = threading.Event()
+    analyze_image, record_metrics = api._analyze_image, api._record_metrics
+
+    def held_back(image, seed):
+        if image.shape[1] == WIDTHS[0]:
+            assert another_finished.wait(5)
+        return analyze_image(image, seed)
+
+    def recorded(result):
+        record_metrics(result)
+        another_finished.set()
+
+    monkeypatch.setattr(api, "_analyze_image", held_back)
+    monkeypatch.setattr(api, "_record_metrics", recorded)
+    yield [
+        ("files", ("first.png", _png(WIDTHS[0], 0), "image/png")),
+        ("files", ("broken.png", b"not an image at all", "image/png")),
+        ("files", ("third.png", _png(WIDTHS[1], 1), "image/png")),
+    ]
+    api.executor.shutdown()
+
+
+def _check_items(items):
+    assert sorted(item["index"] for item in items) == [0, 1, 2]
+    # Sent as they finish, not in input order
+    assert items[-1]["index"] == 0
+    by_index = {item["index"]: item for item in items}
+    assert [by_index[i]["filename"] for i in range(3)] == ["first.png", "broken.png", "third.png"]
+
+    broken = by_index[1]
+    assert "analysis" not in broken and "retryAfter" not in broken
+    assert broken["error"].startswith("Invalid image file")
+    for i in (0, 2):
+        assert "error" not in by_index[i]
+        assert by_index[i]["analysis"]["success"] is True
+
+
+def test_ndjson_stream_sends_one_line_per_item(api, batch):
+    response = TestClient(api.app).post("/batch-analyze?stream=ndjson", files=batch)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert response.text.endswith("\n")
+    _check_items([json.loads(line) for line in response.text.splitlines()])
+
+
+def test_sse_stream_frames_each_item_then_done(api, batch):
+    response = TestClient(api.app).post("/batch-analyze?stream=sse", files=batch)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["cache-control"] == "no-cache"
+
+    assert response.text.endswith("\n\n")
+    events = [event.split("\n") for event in response.text[:-2].split("\n\n")]
+    assert all(len(lines) == 2 and lines[1].startswith("data: ") for lines in events)
+    assert [lines[0] for lines in events] == ["event: result"] * 3 + ["event: done"]
+    payloads = [json.loads(lines[1][len("data: "):]) for lines in events]
+    assert payloads[-1] == {"count": 3}
+    _check_items(payloads[:-1])
+
+
+def test_unbuffered_batch_is_sorted_by_index(api, batch):
+    response = TestClient(api.app).post("/batch-analyze", files=batch)
+    assert response.status_code == 200
+    assert [item["index"] for item in response.json()] == [0, 1, 2]
+
+
+def test_unknown_stream_format_is_refused(api):
+    response = TestClient(api.app).post("/batch-analyze?stream=xml",
+                                        files=[("files", ("a.png", _png(WIDTHS[0], 0), "image/png"))])
+    assert response.status_code == 400
@@ -0,0 +1,185 @@
+"""
+Checks of the price scale fits and the layout cache in calibration.py, with
+tick labels supplied by a stand-in OCR backend.
+
+    python -m pytest test_calibration.py
+"""
+from typing import List, Tuple
+
+import numpy as np
+import pytest
+
+import calibration
+from calibration import AxisCalibrator, PriceScale, _label_strip, fit_price_scale, layout_fingerprint
+from candle_series import Candle
+from candlestick_analyzer import CandlestickAnalyzer
+from chart_corpus import AXIS_WIDTH, ChartSpec, SyntheticChart, render_chart
+from preprocessing import to_grayscale
+
+ROWS = np.arange(20, 500, 80, dtype=np.float64)
+
+
+class TickReader:
+    """An OCR backend that reports the labels render_chart drew, and counts its calls."""
+
+    def __init__(self, chart: SyntheticChart):
+        ohlc, height = chart.ohlc, chart.spec.height
+        top, bottom = ohlc[:, 1].max(), ohlc[:, 2].min()
+        margin = height * 0.06
+        self.labels = [
+            (float(np.rint(margin + (top - price) / (top - bottom) * (height - 2 * margin))), f"{price:.2f}")
+            for price in np.linspace(bottom, top, 6)
+        ]
+        self.calls = 0
+
+    def __call__(self, strip: np.ndarray) -> List[Tuple[float, str]]:
+        self.calls += 1
+        return self.labels
+
+
+def _chart(seed: int = 0) -> SyntheticChart:
+    return render_chart(ChartSpec(candles=30, width=800, height=500, seed=seed))
+
+
+def test_linear_axis_is_fitted():
+    scale = fit_price_scale([(y, 250.0 - 0.25 * y) for y in ROWS])
+    assert scale.log is False and scale.source == "ocr"
+    assert scale.slope == pytest.approx(-0.25)
+    assert scale.intercept == pytest.approx(250.0)
+    assert scale.price(np.array([100.0])) == pytest.approx([225.0])
+
+
+def test_log_axis_is_fitted():
+    scale = fit_price_scale([(y, float(np.exp(6.0 - 0.005 * y))) for y in ROWS])
+    assert scale.log is True
+    assert scale.slope == pytest.approx(-0.005)
+    assert scale.intercept == pytest.approx(6.0)
+    # The linear fit misses the curve by far more than the 1% allowed, so log wins
+    assert fit_price_scale([(y, float(np.exp(6.0 - 0.005 * y))) for y in ROWS], max_error=0.5).log is True
+
+
+def test_misread_tick_is_dropped_as_outlier():
+    points = [(y, 250.0 - 0.25 * y) for y in ROWS]
+    # A dropped decimal point: 22.5 read as 225
+    points[3] = (points[3][0], points[3][1] * 10)
+    scale = fit_price_scale(points)
+    assert scale is not None and scale.log is False
+    assert scale.slope == pytest.approx(-0.25)
+    assert scale.intercept == pytest.approx(250.0)
+
+
+@pytest.mark.parametrize("points", [
+    [],
+    [(100.0, 50.0)],
+    # Every label on one row
+    [(100.0, 50.0), (100.0, 60.0), (100.0, 70.0)],
+    # Prices falling up the axis
+    [(y, 100.0 + 0.25 * y) for y in ROWS],
+    # Ticks that no straight line or log curve fits within 1%
+    [(y, 100.0 + (-1) ** i * 20 - 0.01 * y) for i, y in enumerate(ROWS)],
+])
+def test_unusable_ticks_give_no_scale(points):
+    assert fit_price_scale(points) is None
+
+
+def test_rescale_maps_the_normalized_scale_onto_prices():
+    scale = PriceScale(slope=-0.5, intercept=300.0)
+    candle = Candle(open=50.0, high=100.0, low=0.0, close=25.0)
+    scale.rescale([candle], image_height=400)
+    # 100 is the top row and 0 the bottom row of a 400px image
+    assert (candle.open, candle.high, candle.low, candle.close) == (200.0, 300.0, 100.0, 150.0)
+
+
+def test_calibration_recovers_the_drawn_prices():
+    chart = _chart()
+    reader = TickReader(chart)
+    scale = AxisCalibrator(ocr=reader).calibrate(to_grayscale(chart.image))
+    assert scale is not None and scale.source == "ocr"
+    rows = np.array([row for row, _ in reader.labels])
+    prices = np.array([float(text) for _, text in reader.labels])
+    assert scale.price(rows) == pytest.approx(prices, rel=1e-3)
+
+
+def test_layout_fingerprint_only_matches_identical_label_pixels():
+    gray = to_grayscale(_chart().image)
+    side, strip = _label_strip(gray)
+    assert side == "right" and strip.shape[1] < AXIS_WIDTH
+    key = layout_fingerprint(side, strip, gray.shape)
+    assert layout_fingerprint(side, strip.copy(), gray.shape) == key
+
+    # Same layout and tick rows, one label pixel different
+    altered = strip.copy()
+    ys, xs = np.nonzero(altered < 128)
+    altered[ys[0], xs[0]] = 255
+    assert layout_fingerprint(side, altered, gray.shape) != key
+    # Same labels in an image of another size
+    assert layout_fingerprint(side, strip, (gray.shape[0], gray.shape[1] + 1)) != key
+
+
+def test_calibrator_caches_per_axis_image():
+    chart = _chart()
+    reader = TickReader(chart)
+    calibrator = AxisCalibrator(ocr=reader)
+    gray = to_grayscale(chart.image)
+    first = calibrator.calibrate(gray)
+
+    # The same axis under different candles is served from the cache
+    redrawn = gray.copy()
+    redrawn[200:300, 300:400] = 255
+    cached = calibrator.calibrate(redrawn)
+    assert (reader.calls, calibrator.ocr_runs) == (1, 1)
+    assert cached.source == "cache"
+    assert (cached.slope, cached.intercept, cached.log) == (first.slope, first.intercept, first.log)
+
+    # Another price range draws other labels and is read again
+    other = _chart(seed=1)
+    calibrator._ocr = TickReader(other)
+    assert calibrator.calibrate(to_grayscale(other.image)).source == "ocr"
+    assert calibrator.ocr_runs == 2
+
+
+def test_failed_reads_are_cached_too():
+    chart = _chart()
+    calls = []
+    calibrator = AxisCalibrator(ocr=lambda strip: calls.append(1) or [(10.0, "n/a")])
+    gray = to_grayscale(chart.image)
+    assert calibrator.calibrate(gray) is None
+    assert calibrator.calibrate(gray) is None
+    assert len(calls) == 1
+
+
+class CountingCalibrator:
+    """Stands in for default_calibrator, returning a fixed scale and counting the charts it is asked to read."""
+
+    def __init__(self, scale: PriceScale):
+        self.scale = scale
+        self.calls = 0
+
+    def calibrate(self, gray: np.ndarray) -> PriceScale:
+        self.calls += 1
+        return self.scale
+
+
+def test_analyzer_reports_prices_on_the_axis_scale(monkeypatch):
+    chart = _chart()
+    scale = AxisCalibrator(ocr=TickReader(chart)).calibrate(to_grayscale(chart.image))
+    stub = CountingCalibrator(scale)
+    monkeypatch.setattr(calibration, "default_calibrator", stub)
+    result = CandlestickAnalyzer(calibrate=True, deterministic=True).analyze(chart.image)
+    assert result["extractionMethod"] == "contour"
+    assert stub.calls == 1
+    assert result["priceScale"] == scale.as_dict()
+    low, high = chart.ohlc[:, 2].min(), chart.ohlc[:, 1].max()
+    assert low * 0.98 <= result["currentPrice"] <= high * 1.02
+
+
+def test_synthetic_fallback_is_not_calibrated(monkeypatch):
+    # Synthetic candles were not read from the chart, whatever its axis says
+    stub = CountingCalibrator(PriceScale(slope=-0.5, intercept=300.0))
+    monkeypatch.setattr(calibration, "default_calibrator", stub)
+    blank = np.full((200, 200), 255, dtype=np.uint8)
+    result = CandlestickAnalyzer(calibrate=True, deterministic=True).analyze(blank)
+    assert result["extractionMethod"] == "synthetic"
+    assert stub.calls == 0
+    assert result["priceScale"] is None
+    assert "calibrate" not in result["stageTimings"]
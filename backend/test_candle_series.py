@@ -0,0 +1,267 @@
+"""
+Checks CandleSeries and the columnar scoring stages against the list-based
+code they replaced.
+
+    python -m pytest test_candle_series.py
+"""
+from typing import Dict, List
+
+import numpy as np
+import pytest
+
+from candle_series import Candle, CandleSeries
+from candlestick_analyzer import PATTERNS_DB, CandlestickAnalyzer
+from indicators import IndicatorContext
+
+
+# Reference copies of the List[Candle] scoring code before CandleSeries
+
+def _ref_historical(candles: List[Candle]) -> int:
+    if len(candles) < 5:
+        return 0
+    score = 0
+    bullish_count = sum(1 for c in candles[-5:] if c.close > c.open)
+    bearish_count = 5 - bullish_count
+    if bullish_count > bearish_count:
+        score += (bullish_count - bearish_count) * 2
+    else:
+        score -= (bearish_count - bullish_count) * 2
+    if len(candles) >= 8:
+        recent_changes = []
+        for i in range(len(candles)-7, len(candles)):
+            recent_changes.append((candles[i].close - candles[i-1].close) / candles[i-1].close)
+        momentum = sum(recent_changes)
+        if momentum > 0.02:
+            score += 10
+        elif momentum > 0:
+            score += 5
+        elif momentum < -0.02:
+            score -= 10
+        elif momentum < 0:
+            score -= 5
+    if len(candles) >= 10:
+        recent_lows = min(c.low for c in candles[-10:-5])
+        recent_highs = max(c.high for c in candles[-10:-5])
+        current_price = candles[-1].close
+        if candles[-2].low < recent_lows * 1.01 and current_price > candles[-2].close:
+            score += 12
+        if candles[-1].high > recent_highs * 0.99:
+            score += 8
+    if len(candles) >= 5:
+        avg_vol = np.mean([candles[i].volume for i in range(len(candles)-5, len(candles))])
+        if candles[-1].volume > avg_vol * 1.5:
+            score += 8 if candles[-1].close > candles[-1].open else -8
+    if len(candles) >= 8:
+        past_volatility = max([abs(c.close - c.open) for c in candles[-8:-4]])
+        current_volatility = abs(candles[-1].close - candles[-1].open)
+        if past_volatility > current_volatility * 2:
+            if candles[-1].close > np.mean([c.close for c in candles[-5:-1]]):
+                score += 5
+        elif current_volatility > past_volatility * 1.5:
+            score += 6 if candles[-1].close > candles[-1].open else -6
+    consecutive_bullish = 0
+    consecutive_bearish = 0
+    for i in range(len(candles)-1, max(0, len(candles)-6), -1):
+        if candles[i].close > candles[i].open:
+            consecutive_bullish += 1
+            consecutive_bearish = 0
+        else:
+            consecutive_bearish += 1
+            consecutive_bullish = 0
+    if consecutive_bullish >= 3:
+        score += consecutive_bullish * 2
+    elif consecutive_bearish >= 3:
+        score -= consecutive_bearish * 2
+    return max(min(score, 20), -20)
+
+
+def _ref_trend(candles: List[Candle]) -> Dict:
+    if len(candles) < 3:
+        return {"trend": "UNKNOWN", "strength": 0}
+    recent_close = candles[-1].close
+    recent_ma20 = np.mean([c.close for c in candles[-20:]])
+    recent_ma50 = np.mean([c.close for c in candles[-50:]] if len(candles) >= 50 else [c.close for c in candles])
+    if recent_close > recent_ma20 > recent_ma50:
+        trend, trend_strength = "UPTREND", 75
+    elif recent_close < recent_ma20 < recent_ma50:
+        trend, trend_strength = "DOWNTREND", 75
+    elif recent_close > recent_ma20:
+        trend, trend_strength = "WEAK_UPTREND", 50
+    elif recent_close < recent_ma20:
+        trend, trend_strength = "WEAK_DOWNTREND", 50
+    else:
+        trend, trend_strength = "SIDEWAYS", 30
+    return {
+        "trend": trend,
+        "strength": trend_strength,
+        "ma20": round(recent_ma20, 2),
+        "ma50": round(recent_ma50, 2),
+        "currentPrice": round(recent_close, 2)
+    }
+
+
+def _ref_key_levels(candles: List[Candle]) -> Dict:
+    if not candles:
+        return {"support": [], "resistance": []}
+    recent = candles[-20:]
+    highs = [c.high for c in recent]
+    lows = [c.low for c in recent]
+    resistances = []
+    supports = []
+    for i in range(1, len(recent) - 1):
+        if highs[i] > highs[i-1] and highs[i] >= highs[i+1]:
+            resistances.append(round(highs[i], 2))
+        if lows[i] < lows[i-1] and lows[i] <= lows[i+1]:
+            supports.append(round(lows[i], 2))
+    return {
+        "support": sorted(set(supports), reverse=True)[:3],
+        "resistance": sorted(set(resistances), reverse=True)[:3],
+        "lastHigh": round(max(highs), 2),
+        "lastLow": round(min(lows), 2)
+    }
+
+
+def _ref_prediction(candles: List[Candle], patterns: List[str], trend_analysis: Dict):
+    score = 50
+    historical_score = _ref_historical(candles)
+    trend = trend_analysis.get("trend", "UNKNOWN")
+    if "UPTREND" in trend:
+        score += 30
+    elif "DOWNTREND" in trend:
+        score -= 30
+    elif "WEAK_UPTREND" in trend:
+        score += 15
+    elif "WEAK_DOWNTREND" in trend:
+        score -= 15
+    score += historical_score
+    pattern_score = 0
+    for pattern in patterns:
+        if pattern in PATTERNS_DB:
+            reliability = PATTERNS_DB[pattern]["reliability"]
+            if PATTERNS_DB[pattern]["bias"] == "bullish":
+                pattern_score += reliability * 25
+            elif PATTERNS_DB[pattern]["bias"] == "bearish":
+                pattern_score -= reliability * 25
+    score += min(max(pattern_score, -35), 35)
+    if len(candles) >= 3:
+        recent_vol = np.mean([c.volume for c in candles[-3:]])
+        prev_vol = np.mean([c.volume for c in candles[-6:-3]]) if len(candles) >= 6 else recent_vol
+        vol_ratio = recent_vol / (prev_vol + 0.0001)
+        if vol_ratio > 1.3:
+            score += 10 if candles[-1].close > candles[-1].open else -10
+        elif vol_ratio > 1.1:
+            score += 5 if candles[-1].close > candles[-1].open else -5
+    gains = 0
+    losses = 0
+    if len(candles) >= 14:
+        for i in range(len(candles)-14, len(candles)):
+            change = candles[i].close - candles[i-1].close if i > 0 else 0
+            if change > 0:
+                gains += change
+            else:
+                losses += abs(change)
+        if gains + losses > 0:
+            rs = gains / (losses + 0.0001)
+            rsi = 100 - (100 / (1 + rs))
+            if rsi > 70:
+                score += 12
+            elif rsi > 60:
+                score += 6
+            elif rsi < 30:
+                score -= 12
+            elif rsi < 40:
+                score -= 6
+    current_price = candles[-1].close
+    key_levels = _ref_key_levels(candles)
+    support_levels = key_levels.get("support", [])
+    resistance_levels = key_levels.get("resistance", [])
+    if support_levels and current_price < support_levels[0] * 1.02:
+        score += 8
+    if resistance_levels and current_price > resistance_levels[0] * 0.98:
+        score -= 8
+    for candle in candles[-3:]:
+        body_size = abs(candle.close - candle.open)
+        wick_size = candle.high - candle.low
+        if wick_size > 0 and body_size / wick_size > 0.7:
+            score += 2 if candle.close > candle.open else -2
+    final_score = max(0, min(100, score))
+    if final_score > 60:
+        prediction = "UP"
+    elif final_score < 40:
+        prediction = "DOWN"
+    else:
+        prediction = "SIDEWAYS"
+    strength = int(abs(final_score - 50) * 2)
+    if prediction == "SIDEWAYS":
+        strength = max(0, min(40, strength))
+    return prediction, strength
+
+
+def _ref_levels(candles: List[Candle], prediction: str):
+    if not candles:
+        return "N/A", "N/A"
+    recent = candles[-5:]
+    current_price = candles[-1].close
+    if prediction == "UP":
+        sl = min([c.low for c in recent]) - 0.5
+        tp = current_price + (current_price - sl) * 2
+    else:
+        sl = max([c.high for c in recent]) + 0.5
+        tp = current_price - (sl - current_price) * 2
+    return f"{sl:.2f}", f"{tp:.2f}"
+
+
+def _random_candles(seed: int) -> List[Candle]:
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(3, 80))
+    closes = 50 + np.cumsum(rng.normal(0, 1, n))
+    opens = np.r_[closes[0], closes[:-1]] + rng.normal(0, 0.4, n)
+    # Every tenth series has flat candles, so the equal open/close branches run
+    if seed % 10 == 0:
+        opens[::3] = closes[::3]
+    highs = np.maximum(opens, closes) + np.abs(rng.normal(0, 0.8, n))
+    lows = np.minimum(opens, closes) - np.abs(rng.normal(0, 0.8, n))
+    volumes = rng.uniform(1000, 5000, n)
+    return [Candle(open=o, high=h, low=l, close=c, volume=v, index=i)
+            for i, (o, h, l, c, v) in enumerate(zip(opens.tolist(), highs.tolist(), lows.tolist(),
+                                                    closes.tolist(), volumes.tolist()))]
+
+
+@pytest.mark.parametrize("seed", range(300))
+def test_columnar_scoring_matches_list_based_code(seed):
+    analyzer = CandlestickAnalyzer()
+    candles = _random_candles(seed)
+    ctx = IndicatorContext(CandleSeries.from_candles(candles))
+    patterns = analyzer._identify_patterns(ctx)
+
+    assert analyzer._analyze_historical_patterns(ctx) == _ref_historical(candles)
+    trend = analyzer._analyze_trend(ctx)
+    assert trend == _ref_trend(candles)
+    assert ctx.key_levels == _ref_key_levels(candles)
+    prediction = analyzer._make_prediction(ctx, patterns, trend)
+    assert prediction == _ref_prediction(candles, patterns, trend)
+    for direction in ("UP", "DOWN"):
+        assert analyzer._calculate_levels(ctx.candles, direction) == _ref_levels(candles, direction)
+
+
+def test_slices_are_zero_copy_views():
+    candles = _random_candles(1)
+    series = CandleSeries.from_candles(candles)
+    tail = series[-5:]
+    assert len(tail) == 5
+    for column in CandleSeries.__slots__:
+        assert np.shares_memory(getattr(tail, column), getattr(series, column))
+    # Nested slices still view the original columns
+    assert np.shares_memory(tail[1:3].close, series.close)
+    assert tail.close.base is series.close
+
+
+def test_indexing_and_iteration_yield_candles():
+    candles = _random_candles(2)
+    series = CandleSeries.from_candles(candles)
+    assert series.to_candles() == candles
+    assert series[-1] == candles[-1]
+    assert list(series[2:6]) == candles[2:6]
+    assert CandleSeries.from_candles(series) is series
+    with pytest.raises(ValueError):
+        CandleSeries([1, 2], [1, 2], [1, 2], [1])
@@ -0,0 +1,42 @@
+"""
+Accuracy checks on the synthetic chart corpus.
+
+    python -m pytest test_chart_corpus.py
+"""
+import numpy as np
+
+from candle_series import Candle
+from candlestick_analyzer import CandlestickAnalyzer
+from chart_corpus import ChartSpec, render_chart, score_extraction
+
+
+def test_ground_truth_scores_perfectly():
+    chart = render_chart(ChartSpec(candles=30, width=800, height=500))
+    candles = [Candle(*row) for row in chart.truth.tolist()]
+    # A spurious candle in the middle must not shift the alignment
+    candles.insert(10, Candle(5, 6, 4, 5))
+    score = score_extraction(chart, candles)
+    assert score["matched"] == 30
+    assert score["recall"] == 1.0
+    assert score["highLowError"] == 0.0
+    assert score["directionAccuracy"] == 1.0
+
+
+def test_downscaled_chart_keeps_wicks():
+    # Wide candles are reduced about 4x before extraction, 1px wicks must survive it
+    chart = render_chart(ChartSpec(candles=30, width=3200, height=1800))
+    analyzer = CandlestickAnalyzer(extractor="columns", deterministic=True)
+    score = score_extraction(chart, analyzer._extract_candles_from_image(chart.image, np.random.default_rng(0)))
+    assert score["recall"] >= 0.9
+
+
+def test_contour_crop_keeps_recall_on_dense_charts():
+    # Gaps of dense high-DPI charts must survive the contour engine's closing passes
+    chart = render_chart(ChartSpec(candles=120, width=3200, height=1800))
+    matched = [
+        score_extraction(chart, CandlestickAnalyzer(deterministic=True, crop_plot=crop)
+                         ._extract_candles_from_image(chart.image, np.random.default_rng(0)))["matched"]
+        for crop in (False, True)
+    ]
+    # Cropping changes the CLAHE tiles and Otsu threshold, which may cost a candle
+    assert matched[1] >= matched[0] - 1
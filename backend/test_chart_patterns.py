@@ -0,0 +1,153 @@
+"""
+Checks SwingIndex and the vectorized chart-pattern detectors in
+chart_patterns.py against plain per-candle and per-swing loops.
+
+    python -m pytest test_chart_patterns.py
+"""
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pytest
+
+from candle_series import Candle, CandleSeries
+from candlestick_analyzer import CandlestickAnalyzer
+from chart_patterns import HIGH, LOW, SwingIndex, active_chart_patterns, find_chart_patterns
+
+
+def _ref_swings(candles: List[Candle], order: int = 2, min_move: float = 0.02) -> List[Tuple[int, float, int]]:
+    """Local extrema found bar by bar, then collapsed into a zigzag."""
+    n = len(candles)
+    if n < 2 * order + 1:
+        return []
+    highs = [c.high for c in candles]
+    lows = [c.low for c in candles]
+    candidates = []
+    for i in range(n - order):
+        left, right = slice(max(0, i - order), i), slice(i + 1, i + order + 1)
+        is_high = highs[i] > max(highs[left], default=-np.inf) and highs[i] >= max(highs[right])
+        is_low = lows[i] < min(lows[left], default=np.inf) and lows[i] <= min(lows[right])
+        found = []
+        if is_high:
+            found.append((i, highs[i], HIGH))
+        if is_low:
+            found.append((i, lows[i], LOW))
+        # An outside bar visits its low first when bullish, its high first when bearish
+        if len(found) == 2 and candles[i].close > candles[i].open:
+            found.reverse()
+        candidates.extend(found)
+
+    threshold = min_move * (max(highs) - min(lows))
+    swings = []
+    for position, price, kind in candidates:
+        if swings and swings[-1][2] == kind:
+            if (kind == HIGH and price > swings[-1][1]) or (kind == LOW and price < swings[-1][1]):
+                swings[-1] = (position, price, kind)
+        elif not swings or abs(price - swings[-1][1]) >= threshold:
+            swings.append((position, price, kind))
+    return swings
+
+
+def _ref_patterns(swings: List[Tuple[int, float, int]]) -> Dict[str, List[int]]:
+    """Every chart pattern, checked one window of consecutive swings at a time."""
+    prices = [price for _, price, _ in swings]
+    kinds = [kind for _, _, kind in swings]
+    found = {name: [] for name in ("Head & Shoulders", "Inverse Head & Shoulders", "Double Top",
+                                   "Double Bottom", "Triangle Pattern", "Flag Pattern")}
+
+    for name, kind in (("Head & Shoulders", HIGH), ("Inverse Head & Shoulders", LOW)):
+        for i in range(len(swings) - 4):
+            left, neck1, head, neck2, right = (p * kind for p in prices[i:i + 5])
+            height = head - (neck1 + neck2) / 2
+            if (kinds[i] == kind and head > left and head > right and
+                    min(left, right) > max(neck1, neck2) and
+                    abs(left - right) <= 0.3 * height and height > 0):
+                found[name].append(i + 4)
+
+    for name, kind in (("Double Top", HIGH), ("Double Bottom", LOW)):
+        for i in range(len(swings) - 2):
+            first, middle, second = (p * kind for p in prices[i:i + 3])
+            depth = min(first, second) - middle
+            if kinds[i] == kind and depth > 0 and abs(first - second) <= 0.1 * depth:
+                found[name].append(i + 2)
+
+    for i in range(len(swings) - 3):
+        a, b, c, d = prices[i:i + 4]
+        h1, l1, h2, l2 = (a, b, c, d) if kinds[i] == HIGH else (b, a, d, c)
+        if h2 <= h1 and l2 >= l1 and (h2 - l2) < (h1 - l1) * 0.9:
+            found["Triangle Pattern"].append(i + 3)
+
+    for i in range(len(swings) - 4):
+        window = prices[i:i + 5]
+        pole = abs(window[1] - window[0])
+        if pole >= 2.0 * (max(window[1:]) - min(window[1:])):
+            found["Flag Pattern"].append(i + 4)
+    return found
+
+
+def _random_candles(seed: int) -> List[Candle]:
+    rng = np.random.default_rng(seed)
+    n = int(rng.integers(0, 300))
+    closes = 100 + np.cumsum(rng.normal(0, 1, n))
+    # Every fifth series is rounded so equal highs, lows and plateaus are common
+    if seed % 5 == 0:
+        closes = np.round(closes)
+    opens = np.r_[closes[:1], closes[:-1]]
+    highs = np.maximum(opens, closes) + np.abs(rng.normal(0, 0.5, n))
+    lows = np.minimum(opens, closes) - np.abs(rng.normal(0, 0.5, n))
+    if seed % 5 == 0:
+        highs, lows = np.round(highs), np.round(lows)
+    return [Candle(open=o, high=h, low=l, close=c, index=i)
+            for i, (o, h, l, c) in enumerate(zip(opens.tolist(), highs.tolist(), lows.tolist(), closes.tolist()))]
+
+
+def _path(points: List[float], steps: int = 4) -> List[Candle]:
+    """Candles whose closes move in straight lines through the given points."""
+    closes = np.concatenate([np.linspace(a, b, steps, endpoint=False) for a, b in zip(points, points[1:])])
+    closes = np.r_[closes, points[-1]]
+    opens = np.r_[closes[:1], closes[:-1]]
+    return [Candle(open=o, high=max(o, c) + 0.5, low=min(o, c) - 0.5, close=c, index=i)
+            for i, (o, c) in enumerate(zip(opens.tolist(), closes.tolist()))]
+
+
+@pytest.mark.parametrize("seed", range(200))
+def test_swing_index_and_patterns_match_loops(seed):
+    candles = _random_candles(seed)
+    swings = SwingIndex.build(CandleSeries.from_candles(candles))
+    expected = _ref_swings(candles)
+
+    assert list(zip(swings.positions.tolist(), swings.prices.tolist(), swings.kinds.tolist())) == expected
+    found = find_chart_patterns(swings)
+    assert {name: ends.tolist() for name, ends in found.items()} == _ref_patterns(expected)
+
+
+def test_random_series_exercise_every_detector():
+    hits = set()
+    for seed in range(200):
+        found = _ref_patterns(_ref_swings(_random_candles(seed)))
+        hits.update(name for name, ends in found.items() if ends)
+    assert hits == set(find_chart_patterns(SwingIndex.build(CandleSeries.from_candles([]))))
+
+
+def test_inverse_head_and_shoulders_is_reported():
+    # Shoulders at 80, head at 70, neckline at 90, then a breakout still rising
+    candles = _path([100, 80, 90, 70, 90, 80, 95])
+    swings = SwingIndex.build(CandleSeries.from_candles(candles))
+    assert swings.kinds.tolist()[-5:] == [LOW, HIGH, LOW, HIGH, LOW]
+    assert "Inverse Head & Shoulders" in active_chart_patterns(swings, find_chart_patterns(swings))
+
+    result = CandlestickAnalyzer().analyze_series(candles)
+    assert "Inverse Head & Shoulders" in result["patterns"]
+    assert "Head & Shoulders" not in result["patterns"]
+    assert {"pattern": "Inverse Head & Shoulders", "index": int(swings.positions[-1])} in result["patternHistory"]
+
+    # The mirrored chart is a regular head and shoulders
+    mirrored = CandlestickAnalyzer().analyze_series(_path([100, 120, 110, 130, 110, 120, 105]))
+    assert "Head & Shoulders" in mirrored["patterns"]
+    assert "Inverse Head & Shoulders" not in mirrored["patterns"]
+
+
+def test_short_series_have_no_swings():
+    for n in range(5):
+        swings = SwingIndex.build(CandleSeries.from_candles(_path([100, 90, 110])[:n]))
+        assert len(swings) == 0
+        assert all(len(ends) == 0 for ends in find_chart_patterns(swings).values())
@@ -0,0 +1,82 @@
+"""
+Checks palette detection and colour extraction in color_segmentation.py on
+charts rendered by chart_corpus.py.
+
+    python -m pytest test_color_segmentation.py
+"""
+import cv2
+import numpy as np
+import pytest
+
+import color_segmentation
+from candlestick_analyzer import CandlestickAnalyzer
+from chart_corpus import ChartSpec, render_chart, score_extraction
+from color_segmentation import PALETTES, detect_palette
+
+# Corpus theme, the palette it is drawn in, and the direction accuracy required.
+# Monochrome candles are told apart by body brightness alone, which thin
+# bodies on narrow charts sometimes get wrong.
+THEMES = [("light", "green_red", 0.98), ("dark", "teal_pink", 0.98), ("mono", "white_black", 0.9)]
+SIZES = [(30, 800, 500), (120, 800, 500), (120, 1600, 900)]
+
+
+class CallCounter:
+    """Wraps a function and counts its calls."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.calls = 0
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        return self.fn(*args, **kwargs)
+
+
+@pytest.fixture
+def empty_palette_cache(monkeypatch):
+    monkeypatch.setattr(color_segmentation, "_palette_cache", {})
+    return color_segmentation._palette_cache
+
+
+def _hsv(image: np.ndarray) -> np.ndarray:
+    return cv2.cvtColor(image, cv2.COLOR_RGB2HSV)
+
+
+@pytest.mark.parametrize("theme,palette,accuracy", THEMES)
+@pytest.mark.parametrize("candles,width,height", SIZES)
+@pytest.mark.parametrize("seed", range(3))
+def test_extracted_directions_match_the_drawn_series(theme, palette, accuracy, candles, width, height, seed):
+    chart = render_chart(ChartSpec(candles=candles, width=width, height=height, theme=theme, seed=seed))
+    assert detect_palette(_hsv(chart.image)).name == palette
+
+    analyzer = CandlestickAnalyzer(extractor="color", deterministic=True)
+    extracted = analyzer._extract_candles_from_image(chart.image, np.random.default_rng(0))
+    score = score_extraction(chart, extracted)
+    assert score["recall"] >= 0.9
+    assert score["directionAccuracy"] >= accuracy
+
+
+@pytest.mark.parametrize("theme,palette", [(theme, palette) for theme, palette, _ in THEMES])
+def test_palette_decisions_are_cached_by_style(monkeypatch, empty_palette_cache, theme, palette):
+    classify = CallCounter(color_segmentation.classify_pixels)
+    ink = CallCounter(color_segmentation.ink_mask)
+    monkeypatch.setattr(color_segmentation, "classify_pixels", classify)
+    monkeypatch.setattr(color_segmentation, "ink_mask", ink)
+
+    first = render_chart(ChartSpec(candles=60, theme=theme, seed=1))
+    assert detect_palette(_hsv(first.image)) is PALETTES[palette]
+    assert list(empty_palette_cache.values()) == [palette]
+    assert ink.calls == 1
+    scored = (classify.calls, ink.calls)
+
+    # Another chart in the same theme shares the fingerprint and skips the scoring
+    second = render_chart(ChartSpec(candles=60, theme=theme, seed=2))
+    assert detect_palette(_hsv(second.image)) is PALETTES[palette]
+    assert (classify.calls, ink.calls) == scored
+    assert len(empty_palette_cache) == 1
+
+
+def test_themes_have_distinct_fingerprints(empty_palette_cache):
+    for theme, palette, _ in THEMES:
+        detect_palette(_hsv(render_chart(ChartSpec(candles=60, theme=theme)).image))
+    assert sorted(empty_palette_cache.values()) == sorted(palette for _, palette, _ in THEMES)
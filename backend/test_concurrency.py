@@ -0,0 +1,78 @@
+"""
+Concurrency stress test for CandlestickAnalyzer.
+
+Runs many analyses of the same charts from a thread pool against one shared
+analyzer and checks every result matches a serial run.
+
+    python test_concurrency.py --runs 5000 --threads 16
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from candlestick_analyzer import CandlestickAnalyzer
+
+
+def draw_chart(seed: int, candles: int = 40, width: int = 800, height: int = 500) -> np.ndarray:
+    """Render a simple random-walk candlestick chart."""
+    rng = np.random.default_rng(seed)
+    image = np.full((height, width, 3), 255, dtype=np.uint8)
+    closes = 50 + np.cumsum(rng.normal(0, 1, candles))
+    opens = np.r_[closes[0] - 1, closes[:-1]]
+    highs = np.maximum(opens, closes) + np.abs(rng.normal(0, 0.8, candles))
+    lows = np.minimum(opens, closes) - np.abs(rng.normal(0, 0.8, candles))
+    top, bottom = highs.max() + 2, lows.min() - 2
+
+    def y(price):
+        return int((top - price) / (top - bottom) * height)
+
+    step = width / (candles + 2)
+    for i in range(candles):
+        x = int((i + 1) * step)
+        color = (0, 160, 0) if closes[i] >= opens[i] else (200, 0, 0)
+        cv2.line(image, (x, y(highs[i])), (x, y(lows[i])), color, 1)
+        cv2.rectangle(image, (x - 3, y(max(opens[i], closes[i]))), (x + 3, y(min(opens[i], closes[i]))), color, -1)
+    return image
+
+
+def _strip_timings(result: dict) -> dict:
+    return {k: v for k, v in result.items() if k != "stageTimings"}
+
+
+def run_stress(runs: int = 200, threads: int = 8, charts: int = 8) -> float:
+    """Run `runs` analyses across `threads` and compare with serial results. Returns runs/sec."""
+    analyzer = CandlestickAnalyzer()
+    images = [draw_chart(seed) for seed in range(charts)]
+    expected = [_strip_timings(analyzer.analyze(image, seed=i)) for i, image in enumerate(images)]
+
+    def job(n: int):
+        i = n % charts
+        return i, _strip_timings(analyzer.analyze(images[i], seed=i))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(job, range(runs)))
+    elapsed = time.perf_counter() - start
+
+    mismatches = [n for n, (i, result) in enumerate(results) if result != expected[i]]
+    assert not mismatches, f"{len(mismatches)} of {runs} concurrent results differ from serial runs"
+    return runs / elapsed
+
+
+def test_concurrent_results_match_serial():
+    run_stress(runs=200, threads=8)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--charts", type=int, default=8)
+    args = parser.parse_args()
+
+    print(f"Running {args.runs} analyses on {args.threads} threads...")
+    rate = run_stress(args.runs, args.threads, args.charts)
+    print(f"OK: all results match serial runs ({rate:.1f} analyses/sec)")
@@ -0,0 +1,67 @@
+"""
+Checks of the SQLite job queue in jobs.py.
+
+    python -m pytest test_jobs.py
+"""
+import asyncio
+
+from jobs import FAILED, JobItem, JobRunner, JobStore
+
+
+def test_failed_items_are_retried_and_results_paged(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.create([JobItem(f"chart{i}.png", b"x") for i in range(5)]
+                          + [JobItem("broken.png", b"", error="Unsupported image format")], seed=7)
+    calls = {}
+
+    async def analyze(contents, filename, seed, reduce):
+        calls[filename] = calls.get(filename, 0) + 1
+        # chart1 fails once and chart2 every time
+        if filename == "chart2.png" or (filename == "chart1.png" and calls[filename] == 1):
+            raise RuntimeError("worker died")
+        return {"success": True, "seed": seed}
+
+    async def run():
+        runner = JobRunner(store, analyze, concurrency=2, max_attempts=3, retry_delay=0, poll_interval=0.01)
+        await runner.start()
+        for _ in range(500):
+            if store.get(job_id)["status"] == "completed":
+                break
+            await asyncio.sleep(0.01)
+        await runner.stop()
+
+    asyncio.run(run())
+    job = store.get(job_id, offset=0, limit=4)
+    assert job["progress"] == {"queued": 0, "running": 0, "done": 4, "failed": 2}
+    assert calls == {"chart0.png": 1, "chart1.png": 2, "chart2.png": 3, "chart3.png": 1, "chart4.png": 1}
+    assert [item["index"] for item in job["items"]] == [0, 1, 2, 3]
+    assert job["items"][0]["analysis"] == {"success": True, "seed": 7}
+    assert job["items"][2]["status"] == FAILED and job["items"][2]["attempts"] == 3
+    assert job["nextOffset"] == 4
+
+    last = store.get(job_id, offset=4, limit=4)
+    assert [item["filename"] for item in last["items"]] == ["chart4.png", "broken.png"]
+    assert last["nextOffset"] is None
+
+
+def test_interrupted_items_run_after_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    store = JobStore(path)
+    job_id = store.open_job()
+    store.add_item(job_id, 0, JobItem("chart.png", b"x"))
+    assert len(store.claim(10)) == 1
+    store.finish(job_id, 0, result={"success": True})
+    # Not complete while the upload is still being read
+    assert store.get(job_id)["status"] == "running"
+    store.add_item(job_id, 1, JobItem("chart2.png", b"y"))
+    store.seal_job(job_id, 2)
+    assert len(store.claim(10)) == 1
+    store.close()
+
+    # The process died while the item was running
+    store = JobStore(path)
+    assert store.recover() == 1
+    claimed = store.claim(10)
+    assert [item.filename for item in claimed] == ["chart2.png"]
+    assert store.payload(job_id, claimed[0].index) == b"y"
+    assert store.get(job_id)["total"] == 2
@@ -0,0 +1,26 @@
+"""
+Checks of the Prometheus text rendering in metrics.py.
+
+    python -m pytest test_metrics.py
+"""
+import metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = metrics.Registry()
+    histogram = registry.histogram("stage_seconds", "Stage time", ("stage",), buckets=(0.01, 0.1))
+    for value in (0.005, 0.05, 0.05, 3):
+        histogram.observe(value, stage="extract")
+
+    lines = registry.render().splitlines()
+    assert 'stage_seconds_bucket{stage="extract",le="0.01"} 1' in lines
+    assert 'stage_seconds_bucket{stage="extract",le="0.1"} 3' in lines
+    assert 'stage_seconds_bucket{stage="extract",le="+Inf"} 4' in lines
+    assert 'stage_seconds_count{stage="extract"} 4' in lines
+
+
+def test_disabled_metrics_ignore_updates(monkeypatch):
+    monkeypatch.setattr(metrics, "ENABLED", False)
+    counter = metrics.Registry().counter("fallbacks_total", "Fallbacks", ("to",))
+    counter.inc(to="edges")
+    assert counter.value(to="edges") == 0
@@ -0,0 +1,317 @@
+"""
+Checks the vectorized candlestick pattern masks in pattern_engine.py against
+the per-candle predicates they replaced.
+
+    python -m pytest test_pattern_engine.py
+"""
+from typing import List
+
+import numpy as np
+import pytest
+
+from candle_series import Candle, CandleSeries
+from pattern_engine import latest_patterns, scan_candlestick_patterns
+
+
+# Reference copies of the removed CandlestickAnalyzer._is_* predicates. Each
+# one saw the last five candles of the series, as _identify_patterns passed them.
+
+def _is_bullish_engulfing(candles: List[Candle]) -> bool:
+    if len(candles) < 2:
+        return False
+    prev = candles[-2]
+    curr = candles[-1]
+    return (curr.close > prev.open and curr.open < prev.close and
+            curr.close > prev.close and curr.open < prev.open and
+            abs(curr.close - curr.open) > abs(prev.close - prev.open))
+
+
+def _is_bearish_engulfing(candles: List[Candle]) -> bool:
+    if len(candles) < 2:
+        return False
+    prev = candles[-2]
+    curr = candles[-1]
+    return (curr.close < prev.open and curr.open > prev.close and
+            curr.close < prev.close and curr.open > prev.open and
+            abs(curr.close - curr.open) > abs(prev.close - prev.open))
+
+
+def _is_hammer(candle: Candle) -> bool:
+    body_size = abs(candle.close - candle.open)
+    lower_wick = min(candle.open, candle.close) - candle.low
+    upper_wick = candle.high - max(candle.close, candle.open)
+    if body_size == 0:
+        return False
+    return lower_wick > body_size * 2.5 and upper_wick < body_size * 0.5
+
+
+def _is_hanging_man(candle: Candle) -> bool:
+    body_size = abs(candle.close - candle.open)
+    lower_wick = min(candle.open, candle.close) - candle.low
+    upper_wick = candle.high - max(candle.close, candle.open)
+    if body_size == 0:
+        return False
+    return (lower_wick > body_size * 2.5 and upper_wick < body_size * 0.5 and
+            candle.close < candle.open)
+
+
+def _is_doji(candle: Candle) -> bool:
+    body_size = abs(candle.close - candle.open)
+    high_low = candle.high - candle.low
+    if high_low == 0:
+        return False
+    return body_size / high_low < 0.1
+
+
+def _is_spinning_top(candle: Candle) -> bool:
+    body_size = abs(candle.close - candle.open)
+    upper_wick = candle.high - max(candle.close, candle.open)
+    lower_wick = min(candle.open, candle.close) - candle.low
+    if body_size == 0:
+        return False
+    return body_size < 1 and upper_wick > body_size * 1.5 and lower_wick > body_size * 1.5
+
+
+def _is_long_legged_doji(candle: Candle) -> bool:
+    body_size = abs(candle.close - candle.open)
+    upper_wick = candle.high - max(candle.close, candle.open)
+    lower_wick = min(candle.open, candle.close) - candle.low
+    high_low = candle.high - candle.low
+    if high_low == 0:
+        return False
+    return (body_size / high_low < 0.1 and upper_wick > high_low * 0.3 and
+            lower_wick > high_low * 0.3)
+
+
+def _is_dragonfly_doji(candle: Candle) -> bool:
+    body_size = abs(candle.close - candle.open)
+    lower_wick = min(candle.open, candle.close) - candle.low
+    upper_wick = candle.high - max(candle.close, candle.open)
+    high_low = candle.high - candle.low
+    if high_low == 0:
+        return False
+    return (body_size / high_low < 0.1 and lower_wick > high_low * 0.5 and
+            upper_wick < high_low * 0.1)
+
+
+def _is_gravestone_doji(candle: Candle) -> bool:
+    body_size = abs(candle.close - candle.open)
+    upper_wick = candle.high - max(candle.close, candle.open)
+    lower_wick = min(candle.open, candle.close) - candle.low
+    high_low = candle.high - candle.low
+    if high_low == 0:
+        return False
+    return (body_size / high_low < 0.1 and upper_wick > high_low * 0.5 and
+            lower_wick < high_low * 0.1)
+
+
+def _is_morning_star(candles: List[Candle]) -> bool:
+    if len(candles) < 3:
+        return False
+    c1, c2, c3 = candles[-3], candles[-2], candles[-1]
+    return (c1.close < c1.open and c2.close < c2.open and
+            c3.close > c3.open and c3.close > c1.close)
+
+
+def _is_evening_star(candles: List[Candle]) -> bool:
+    if len(candles) < 3:
+        return False
+    c1, c2, c3 = candles[-3], candles[-2], candles[-1]
+    return (c1.close > c1.open and c2.close > c2.open and
+            c3.close < c3.open and c3.close < c1.close)
+
+
+def _is_three_white_soldiers(candles: List[Candle]) -> bool:
+    if len(candles) < 3:
+        return False
+    for i in range(len(candles)-3, len(candles)):
+        c = candles[i]
+        if c.close <= c.open:
+            return False
+        if i > 0 and c.close <= candles[i-1].close:
+            return False
+    return True
+
+
+def _is_three_black_crows(candles: List[Candle]) -> bool:
+    if len(candles) < 3:
+        return False
+    for i in range(len(candles)-3, len(candles)):
+        c = candles[i]
+        if c.close >= c.open:
+            return False
+        if i > 0 and c.close >= candles[i-1].close:
+            return False
+    return True
+
+
+def _is_piercing_line(candles: List[Candle]) -> bool:
+    if len(candles) < 2:
+        return False
+    prev, curr = candles[-2], candles[-1]
+    return (prev.close < prev.open and curr.close > curr.open and
+            curr.close > prev.close and curr.open < prev.close)
+
+
+def _is_dark_cloud_cover(candles: List[Candle]) -> bool:
+    if len(candles) < 2:
+        return False
+    prev, curr = candles[-2], candles[-1]
+    return (prev.close > prev.open and curr.close < curr.open and
+            curr.close < prev.close and curr.open > prev.close)
+
+
+def _is_bullish_harami(candles: List[Candle]) -> bool:
+    if len(candles) < 2:
+        return False
+    prev, curr = candles[-2], candles[-1]
+    prev_body = abs(prev.close - prev.open)
+    curr_body = abs(curr.close - curr.open)
+    return (prev.close < prev.open and curr.close > curr.open and
+            curr_body < prev_body and curr.open > prev.close and curr.close < prev.open)
+
+
+def _is_bearish_harami(candles: List[Candle]) -> bool:
+    if len(candles) < 2:
+        return False
+    prev, curr = candles[-2], candles[-1]
+    prev_body = abs(prev.close - prev.open)
+    curr_body = abs(curr.close - curr.open)
+    return (prev.close > prev.open and curr.close < curr.open and
+            curr_body < prev_body and curr.open < prev.close and curr.close > prev.open)
+
+
+def _is_rising_three_methods(candles: List[Candle]) -> bool:
+    if len(candles) < 5:
+        return False
+    if candles[0].close <= candles[0].open:
+        return False
+    for i in range(1, 4):
+        if candles[i].close > candles[i].open or candles[i].low < candles[i-1].low:
+            return False
+    return candles[4].close > candles[4].open and candles[4].close > candles[0].close
+
+
+def _is_falling_three_methods(candles: List[Candle]) -> bool:
+    if len(candles) < 5:
+        return False
+    if candles[0].close >= candles[0].open:
+        return False
+    for i in range(1, 4):
+        if candles[i].close < candles[i].open or candles[i].high > candles[i-1].high:
+            return False
+    return candles[4].close < candles[4].open and candles[4].close < candles[0].close
+
+
+def _last(predicate):
+    return lambda recent: predicate(recent[-1])
+
+
+REFERENCE = {
+    "Bullish Engulfing": _is_bullish_engulfing,
+    "Hammer": _last(_is_hammer),
+    "Morning Star": _is_morning_star,
+    "Three White Soldiers": _is_three_white_soldiers,
+    "Piercing Line": _is_piercing_line,
+    "Bullish Harami": _is_bullish_harami,
+    "Dragonfly Doji": _last(_is_dragonfly_doji),
+    "Bearish Engulfing": _is_bearish_engulfing,
+    "Hanging Man": _last(_is_hanging_man),
+    "Evening Star": _is_evening_star,
+    "Three Black Crows": _is_three_black_crows,
+    "Dark Cloud Cover": _is_dark_cloud_cover,
+    "Bearish Harami": _is_bearish_harami,
+    "Gravestone Doji": _last(_is_gravestone_doji),
+    "Doji (Indecision)": _last(_is_doji),
+    "Spinning Top": _last(_is_spinning_top),
+    "Long Legged Doji": _last(_is_long_legged_doji),
+    "Rising Three Methods": _is_rising_three_methods,
+    "Falling Three Methods": _is_falling_three_methods,
+}
+
+
+def _reference_masks(candles: List[Candle]) -> dict:
+    """Run every reference predicate on each prefix of the series."""
+    masks = {name: np.zeros(len(candles), dtype=bool) for name in REFERENCE}
+    for end in range(1, len(candles) + 1):
+        recent = candles[:end][-5:]
+        for name, predicate in REFERENCE.items():
+            masks[name][end - 1] = predicate(recent)
+    return masks
+
+
+def _series(opens, closes, highs, lows) -> List[Candle]:
+    return [Candle(open=o, high=max(h, o, c), low=min(l, o, c), close=c, index=i)
+            for i, (o, h, l, c) in enumerate(zip(opens, highs, lows, closes))]
+
+
+def _random_walk(seed: int, n: int) -> List[Candle]:
+    """Prices on a 0.5 grid so ties between opens, closes and extremes are common."""
+    rng = np.random.default_rng(seed)
+    closes = np.round((50 + np.cumsum(rng.normal(0, 1, n))) * 2) / 2
+    opens = np.r_[closes[0], closes[:-1]] + np.round(rng.normal(0, 0.6, n) * 2) / 2
+    highs = np.maximum(opens, closes) + np.round(np.abs(rng.normal(0, 1, n)) * 2) / 2
+    lows = np.minimum(opens, closes) - np.round(np.abs(rng.normal(0, 1, n)) * 2) / 2
+    return _series(opens.tolist(), closes.tolist(), highs.tolist(), lows.tolist())
+
+
+def _few_levels(seed: int, n: int) -> List[Candle]:
+    """OHLC drawn from five price levels: many dojis, zero-range and equal-price bars."""
+    rng = np.random.default_rng(seed)
+    o, c, a, b = rng.integers(0, 5, size=(4, n)).astype(float)
+    return _series(o.tolist(), c.tolist(), np.maximum(a, b).tolist(), np.minimum(a, b).tolist())
+
+
+def _edge_cases() -> List[Candle]:
+    bars = [
+        (10, 10, 10, 10),   # zero range
+        (10, 10, 10, 10),   # repeated flat bar
+        (10, 12, 8, 10),    # doji with equal wicks
+        (10, 12, 10, 10),   # gravestone, no lower wick
+        (10, 10, 6, 10),    # dragonfly, no upper wick
+        (10, 10.5, 9.5, 10.05),
+        (11, 11, 9, 9),     # bearish marubozu
+        (9, 11, 9, 11),     # bullish marubozu
+        (11, 11, 11, 11),
+        (11, 14, 7, 11.2),
+        (12, 13, 9, 11.5),  # hanging man shape
+        (11.5, 11.6, 8, 11.8),
+    ]
+    return [Candle(open=o, high=h, low=l, close=c, index=i) for i, (o, h, l, c) in enumerate(bars)]
+
+
+def _assert_masks_match(candles: List[Candle]):
+    masks = scan_candlestick_patterns(CandleSeries.from_candles(candles))
+    expected = _reference_masks(candles)
+    assert list(masks) == list(REFERENCE)
+    for name in REFERENCE:
+        assert masks[name].tolist() == expected[name].tolist(), name
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_masks_match_reference_on_random_series(seed):
+    _assert_masks_match(_random_walk(seed, 120))
+    _assert_masks_match(_few_levels(seed, 120))
+
+
+def test_masks_match_reference_on_edge_cases():
+    _assert_masks_match(_edge_cases())
+
+
+@pytest.mark.parametrize("length", range(0, 6))
+def test_masks_match_reference_below_pattern_windows(length):
+    # Shorter than the two-, three- or five-candle windows
+    for seed in range(10):
+        candles = _few_levels(seed, length)
+        _assert_masks_match(candles)
+        assert latest_patterns(scan_candlestick_patterns(CandleSeries.from_candles(candles))) == [
+            name for name, predicate in REFERENCE.items() if candles and predicate(candles[-5:])
+        ]
+
+
+def test_every_pattern_is_exercised():
+    hits = set()
+    for seed in range(20):
+        for candles in (_random_walk(seed, 120), _few_levels(seed, 120)):
+            hits.update(name for name, mask in _reference_masks(candles).items() if mask.any())
+    assert hits == set(REFERENCE)
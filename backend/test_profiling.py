@@ -0,0 +1,118 @@
+"""
+Checks of admin-only profiling through /analyze?profile= and /profiles/{id},
+and of load_profile in profiling.py.
+
+    python -m pytest test_profiling.py
+"""
+import pstats
+
+import cv2
+import pytest
+from fastapi.testclient import TestClient
+
+from chart_corpus import ChartSpec, render_chart
+from profiling import RateLimiter, load_profile
+
+TOKEN = "s3cret-admin-token"
+
+
+@pytest.fixture(scope="module")
+def png() -> bytes:
+    chart = render_chart(ChartSpec(candles=30, width=800, height=500))
+    return cv2.imencode(".png", cv2.cvtColor(chart.image, cv2.COLOR_RGB2BGR))[1].tobytes()
+
+
+@pytest.fixture
+def client(api, monkeypatch, tmp_path):
+    monkeypatch.setattr(api, "PROFILE_ADMIN_TOKEN", TOKEN)
+    monkeypatch.setattr(api, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(api, "profile_limiter", RateLimiter(10, per=60))
+    return TestClient(api.app)
+
+
+def _profile(client: TestClient, png: bytes, mode: str = "cprofile", token: str = TOKEN):
+    headers = {"X-Admin-Token": token} if token is not None else {}
+    return client.post(f"/analyze?profile={mode}", headers=headers,
+                       files={"file": ("chart.png", png, "image/png")})
+
+
+def test_profiling_is_disabled_without_a_token(api, client, monkeypatch, png):
+    monkeypatch.setattr(api, "PROFILE_ADMIN_TOKEN", "")
+    assert _profile(client, png).status_code == 404
+    assert client.get("/profiles/abc", headers={"X-Admin-Token": TOKEN}).status_code == 404
+
+
+@pytest.mark.parametrize("token", [None, "", "wrong", TOKEN + "x"])
+def test_bad_admin_token_is_forbidden(client, png, token):
+    assert _profile(client, png, token=token).status_code == 403
+    headers = {"X-Admin-Token": token} if token is not None else {}
+    assert client.get("/profiles/abc", headers=headers).status_code == 403
+
+
+def test_unknown_mode_is_refused(client, png):
+    assert _profile(client, png, mode="perf").status_code == 400
+
+
+def test_empty_bucket_answers_429_with_retry_after(api, client, monkeypatch, png):
+    monkeypatch.setattr(api, "profile_limiter", RateLimiter(2, per=60))
+    assert [_profile(client, png).status_code for _ in range(2)] == [200, 200]
+    limited = _profile(client, png)
+    assert limited.status_code == 429
+    # Two tokens a minute, the next one is at most 30s away
+    assert 1 <= int(limited.headers["Retry-After"]) <= 31
+    # A refused token check is not an analysis, plain requests still go through
+    assert client.post("/analyze", files={"file": ("chart.png", png, "image/png")}).status_code == 200
+
+
+def test_rejected_token_does_not_spend_the_bucket(api, client, monkeypatch, png):
+    monkeypatch.setattr(api, "profile_limiter", RateLimiter(1, per=60))
+    assert _profile(client, png, token="wrong").status_code == 403
+    assert _profile(client, png).status_code == 200
+
+
+def test_cprofile_run_is_saved_and_downloadable(client, png, tmp_path):
+    response = _profile(client, png, mode="cprofile")
+    assert response.status_code == 200
+    result = response.json()
+    assert result["success"] is True and result["cached"] is False
+    report = result["profile"]
+    assert report["mode"] == "cprofile" and report["id"].isalnum()
+    assert "analyze" in report["pstats"]
+
+    download = client.get(f"/profiles/{report['id']}", headers={"X-Admin-Token": TOKEN})
+    assert download.status_code == 200
+    assert download.headers["content-disposition"] == f'attachment; filename="{report["id"]}.pstats"'
+    stats = pstats.Stats(str(tmp_path / f"{report['id']}.pstats"))
+    assert stats.total_calls > 0
+
+
+def test_sampled_run_is_saved_and_downloadable(client, png, tmp_path):
+    response = _profile(client, png, mode="sample")
+    assert response.status_code == 200
+    report = response.json()["profile"]
+    assert report["mode"] == "sample" and report["id"].isalnum()
+
+    download = client.get(f"/profiles/{report['id']}", headers={"X-Admin-Token": TOKEN})
+    assert download.status_code == 200
+    assert download.headers["content-type"].startswith("text/plain")
+    assert download.text == report["collapsed"]
+    assert (tmp_path / f"{report['id']}.collapsed").read_text() == report["collapsed"]
+
+
+def test_unknown_profile_is_not_found(client):
+    assert client.get("/profiles/0123456789ab", headers={"X-Admin-Token": TOKEN}).status_code == 404
+
+
+@pytest.mark.parametrize("profile_id", ["", "..", "../secret", "secret.pstats", "a/b", "a b", "abc\x00"])
+def test_load_profile_rejects_ids_that_are_not_alphanumeric(tmp_path, profile_id):
+    directory = tmp_path / "profiles"
+    directory.mkdir()
+    (tmp_path / "secret.pstats").write_bytes(b"outside")
+    (directory / "secret.pstats.pstats").write_bytes(b"odd name")
+    assert load_profile(str(directory), profile_id) is None
+
+
+def test_load_profile_finds_saved_ids(tmp_path):
+    (tmp_path / "abc123.collapsed").write_bytes(b"main;run 3\n")
+    assert load_profile(str(tmp_path), "abc123") == ("abc123.collapsed", b"main;run 3\n")
+    assert load_profile(str(tmp_path), "abc124") is None
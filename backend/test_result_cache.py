@@ -0,0 +1,151 @@
+"""
+Checks of the in-memory and SQLite tiers of result_cache.py, and of cache
+hits through /analyze.
+
+    python -m pytest test_result_cache.py
+"""
+import sqlite3
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+import result_cache
+from chart_corpus import ChartSpec, render_chart
+from result_cache import ResultCache
+
+
+class Clock:
+    """Stands in for time.time and time.monotonic in result_cache."""
+
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(result_cache, "time", SimpleNamespace(time=clock, monotonic=clock))
+    return clock
+
+
+def _disk_rows(path) -> int:
+    with sqlite3.connect(str(path)) as db:
+        return db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = ResultCache(max_entries=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    assert cache.get("a") == {"n": 1}
+    cache.put("c", {"n": 3})
+
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1}
+    assert cache.get("c") == {"n": 3}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["stores"], stats["evictions"]) == (3, 1, 3, 1)
+    assert stats["entries"] == 2
+    assert stats["hitRate"] == 0.75
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ResultCache(max_entries=10, ttl_seconds=60)
+    cache.put("a", {"n": 1})
+    clock.now += 60
+    assert cache.get("a") == {"n": 1}
+    clock.now += 1
+    assert cache.get("a") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_disk_tier_survives_restart(clock, tmp_path):
+    path = str(tmp_path / "cache.db")
+    ResultCache(disk_path=path).put("a", {"n": 1})
+
+    cache = ResultCache(disk_path=path)
+    assert cache.get("a") == {"n": 1}
+    # Loaded back into memory, the next lookup does not read the file
+    assert cache.get("a") == {"n": 1}
+    stats = cache.stats()
+    assert (stats["diskHits"], stats["hits"], stats["misses"]) == (1, 1, 0)
+    assert stats["disk"] is True
+
+
+def test_disk_rows_are_capped(clock, tmp_path):
+    path = tmp_path / "cache.db"
+    cache = ResultCache(max_entries=100, disk_path=str(path), max_disk_rows=3)
+    for i in range(10):
+        clock.now += 1
+        cache.put(f"k{i}", {"n": i})
+
+    assert _disk_rows(path) == 3
+    assert cache.stats()["diskEvictions"] == 7
+    # The newest rows are the ones kept
+    reopened = ResultCache(max_entries=100, disk_path=str(path), max_disk_rows=3)
+    assert reopened.get("k9") == {"n": 9}
+    assert reopened.get("k6") is None
+
+
+def test_expired_rows_are_purged_periodically(clock, tmp_path):
+    path = tmp_path / "cache.db"
+    cache = ResultCache(ttl_seconds=600, disk_path=str(path), max_disk_rows=1000, purge_interval=300)
+    for i in range(5):
+        cache.put(f"old{i}", {"n": i})
+    clock.now += 200
+    # Within the purge interval and under a tenth of the cap, nothing is purged yet
+    cache.put("mid", {"n": 5})
+    assert _disk_rows(path) == 6
+
+    clock.now += 450
+    cache.put("new", {"n": 6})
+    assert _disk_rows(path) == 2
+
+    # Opening the file purges rows that expired while the process was down
+    clock.now += 1000
+    ResultCache(ttl_seconds=600, disk_path=str(path))
+    assert _disk_rows(path) == 0
+
+
+def test_zero_size_disables_both_tiers(clock, tmp_path):
+    path = tmp_path / "cache.db"
+    cache = ResultCache(max_entries=0, disk_path=str(path))
+    assert not cache.enabled
+    cache.put("a", {"n": 1})
+    assert cache.get("a") is None
+    assert _disk_rows(path) == 0
+    stats = cache.stats()
+    assert (stats["stores"], stats["hits"], stats["misses"], stats["entries"]) == (0, 0, 0, 0)
+
+
+def test_keys_hash_pixels_and_version():
+    image = np.arange(12, dtype=np.uint8).reshape(3, 4)
+    key = ResultCache.make_key(image, "1.0")
+    assert ResultCache.make_key(image.copy(), "1.0") == key
+    assert ResultCache.make_key(image, "1.1") != key
+    assert ResultCache.make_key(image.reshape(4, 3), "1.0") != key
+    assert ResultCache.seed_for(key) == ResultCache.seed_for(ResultCache.make_key(image.copy(), "1.0"))
+
+
+def test_repeated_upload_is_served_from_cache(api, monkeypatch):
+    monkeypatch.setattr(api, "result_cache", ResultCache(max_entries=8))
+    chart = render_chart(ChartSpec(candles=30, width=800, height=500))
+    png = cv2.imencode(".png", cv2.cvtColor(chart.image, cv2.COLOR_RGB2BGR))[1].tobytes()
+
+    client = TestClient(api.app)
+    first = client.post("/analyze", files={"file": ("chart.png", png, "image/png")})
+    second = client.post("/analyze", files={"file": ("again.png", png, "image/png")})
+    assert first.status_code == second.status_code == 200
+    assert first.json()["cached"] is False
+    assert second.json()["cached"] is True
+
+    strip = lambda result: {k: v for k, v in result.items() if k not in ("cached", "preprocess")}
+    assert strip(second.json()) == strip(first.json())
+    stats = client.get("/cache/stats").json()
+    assert (stats["hits"], stats["misses"], stats["stores"]) == (1, 1, 1)
@@ -0,0 +1,31 @@
+"""
+Checks of the incremental multi-symbol scanner.
+
+    python -m pytest test_scanner.py
+"""
+import os
+
+import numpy as np
+
+from chart_corpus import random_walk
+from scanner import scan
+
+
+def test_only_symbols_with_new_bars_are_analyzed(tmp_path):
+    store = tmp_path / "store"
+    store.mkdir()
+    for i, symbol in enumerate(("AAA", "BBB", "CCC")):
+        np.save(store / f"{symbol}.npy", random_walk(300, np.random.default_rng(i)))
+    state = str(tmp_path / "state.json")
+
+    first = scan(str(store), state, workers=1)
+    assert (first["analyzed"], first["unchanged"], first["newBars"]) == (3, 0, 900)
+    strengths = [row["strength"] for row in first["ranked"]]
+    assert strengths == sorted(strengths, reverse=True)
+
+    bars = np.load(store / "BBB.npy")
+    np.save(store / "BBB.npy", np.vstack([bars, random_walk(4, np.random.default_rng(9), bars[-1, 3])]))
+    os.remove(store / "CCC.npy")
+    second = scan(str(store), state, workers=1)
+    assert (second["symbols"], second["analyzed"], second["unchanged"], second["newBars"]) == (2, 1, 1, 4)
+    assert sorted(row["symbol"] for row in second["ranked"]) == ["AAA", "BBB"]
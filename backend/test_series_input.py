@@ -0,0 +1,34 @@
+"""
+Checks of OHLCV input parsing and series analysis.
+
+    python -m pytest test_series_input.py
+"""
+import numpy as np
+import pytest
+
+from candlestick_analyzer import CandlestickAnalyzer
+from chart_corpus import random_walk
+from series_input import parse_series, series_from_json
+
+
+def test_json_and_csv_give_the_same_analysis():
+    ohlc = random_walk(80, np.random.default_rng(3))
+    columns = series_from_json({name: ohlc[:, i].tolist() for i, name in enumerate(("open", "high", "low", "close"))})
+    csv = "Date,Open,High,Low,Close\n" + "\n".join(f"d{i},{o!r},{h!r},{l!r},{c!r}"
+                                                     for i, (o, h, l, c) in enumerate(ohlc.tolist()))
+    rows = parse_series(csv.encode(), "csv")
+    np.testing.assert_array_equal(columns.close, rows.close)
+
+    analyzer = CandlestickAnalyzer()
+    result = analyzer.analyze_series(rows)
+    assert result["success"] and result["dataSource"] == "ohlcv"
+    assert result["currentPrice"] == ohlc[-1, 3]
+    assert "extract" not in result["stageTimings"]
+    assert analyzer.analyze_series(columns)["strength"] == result["strength"]
+
+
+def test_invalid_candles_are_rejected():
+    with pytest.raises(ValueError, match="Missing OHLCV columns: close"):
+        series_from_json([{"open": 1, "high": 2, "low": 0}])
+    with pytest.raises(ValueError, match="High is below low in candle 1"):
+        series_from_json([[1, 2, 0, 1], [1, 0, 2, 1]])
@@ -0,0 +1,52 @@
+"""
+Checks that streaming updates match batch analysis.
+
+    python -m pytest test_streaming.py
+"""
+import numpy as np
+
+from candle_series import CandleSeries
+from candlestick_analyzer import CandlestickAnalyzer
+from chart_corpus import random_walk
+from chart_patterns import SwingIndex
+from indicators import IndicatorContext
+from streaming import MAX_CANDIDATES, SWING_WINDOW, BarWindow, StreamingAnalyzer, SwingTracker
+
+
+def test_updates_match_batch_prediction():
+    analyzer = CandlestickAnalyzer()
+    for seed in range(3):
+        rng = np.random.default_rng(seed)
+        ohlc = random_walk(200, rng)
+        if seed == 1:
+            # Whole-number prices give plateaus, dojis and outside bars
+            ohlc = np.round(ohlc)
+        candles = CandleSeries(*ohlc.T, volume=rng.integers(1, 100, len(ohlc)))
+        stream = StreamingAnalyzer(analyzer)
+        for n in range(1, len(candles) + 1):
+            update = stream.update(candles[n - 1])
+            if n < 3:
+                assert not update["success"]
+                continue
+            ctx = IndicatorContext(candles[:n])
+            patterns = analyzer._identify_patterns(ctx)
+            trend = analyzer._analyze_trend(ctx)
+            assert update["patterns"] == patterns, n
+            assert update["trend"] == trend, n
+            assert (update["prediction"], update["strength"]) == analyzer._make_prediction(ctx, patterns, trend), n
+
+
+def test_long_streams_keep_bounded_swing_state():
+    rng = np.random.default_rng(0)
+    # A slow drift keeps widening the range, so the zigzag threshold keeps changing
+    ohlc = random_walk(20000, rng) + np.arange(20000)[:, None] * 0.01
+    candles = CandleSeries(*ohlc.T)
+    window, swings = BarWindow(), SwingTracker()
+    for i in range(len(candles)):
+        window.append((candles.open[i], candles.high[i], candles.low[i], candles.close[i], 0.0))
+        swings.update(window.series())
+    assert len(swings._candidates) <= MAX_CANDIDATES
+    batch = SwingIndex.build(candles)
+    streamed = swings.index()
+    assert np.array_equal(streamed.positions, batch.positions[-SWING_WINDOW:])
+    assert np.array_equal(streamed.prices, batch.prices[-SWING_WINDOW:])
@@ -0,0 +1,147 @@
+"""
+Checks of the request body limits in uploads.py.
+
+    python -m pytest test_uploads.py
+"""
+import asyncio
+import io
+import struct
+import zlib
+
+import pytest
+from fastapi import FastAPI, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from PIL import Image
+
+import metrics
+from metrics import images_downscaled, images_rejected
+from uploads import BodySizeLimitMiddleware, read_upload
+
+
+def _echo_app(max_body_size: int):
+    """An app that counts the requests reaching it and echoes their body size."""
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, max_body_size=max_body_size, receive_timeout=1)
+    app.state.calls = 0
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        app.state.calls += 1
+        return {"size": len(await request.body())}
+
+    return app
+
+
+class CountingReads(io.BytesIO):
+    def __init__(self, data: bytes):
+        super().__init__(data)
+        self.reads = 0
+
+    def read(self, size: int = -1) -> bytes:
+        self.reads += 1
+        return super().read(size)
+
+
+def test_stream_outlives_receive_timeout():
+    app = FastAPI()
+    app.add_middleware(BodySizeLimitMiddleware, max_body_size=1024, receive_timeout=0.1)
+
+    @app.post("/batch")
+    async def batch(request: Request):
+        body = await request.body()
+
+        async def lines():
+            # Streams for several receive timeouts after the body was read
+            for i in range(6):
+                await asyncio.sleep(0.05)
+                yield f"{i} {len(body)}\n"
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    client = TestClient(app)
+    response = client.post("/batch", content=b"x" * 100)
+    assert response.status_code == 200
+    assert response.text.splitlines() == [f"{i} 100" for i in range(6)]
+    assert client.post("/batch", content=b"x" * 2000).status_code == 413
+
+
+def test_declared_length_over_limit_is_refused_unread():
+    app = _echo_app(1024)
+    client = TestClient(app)
+    response = client.post("/upload", content=b"x" * 2000)
+    assert response.status_code == 413
+    assert response.headers["connection"] == "close"
+    # Refused from the header, the route never ran
+    assert app.state.calls == 0
+    assert client.post("/upload", content=b"x" * 1024).json() == {"size": 1024}
+
+
+def test_streamed_body_over_limit_is_cut_off():
+    app = _echo_app(1024)
+    client = TestClient(app)
+
+    def chunks(count: int):
+        # No Content-Length, the size is only known as the chunks arrive
+        for _ in range(count):
+            yield b"x" * 300
+
+    response = client.post("/upload", content=chunks(10))
+    assert response.status_code == 413
+    assert response.json() == {"detail": "Request body too large"}
+    assert client.post("/upload", content=chunks(3)).json() == {"size": 900}
+
+
+def test_unrecognized_format_is_rejected_from_the_first_chunk():
+    data = CountingReads(b"\x00not an image" * 100000)
+    with pytest.raises(ValueError, match="unrecognized image format"):
+        asyncio.run(read_upload(UploadFile(data, filename="chart.png")))
+    assert data.reads == 1
+    assert data.tell() < len(data.getvalue())
+
+
+def _png_header(width: int, height: int) -> bytes:
+    """A small PNG whose IHDR declares width x height."""
+    buffer = io.BytesIO()
+    Image.new("L", (4, 4)).save(buffer, "PNG")
+    data = bytearray(buffer.getvalue())
+    ihdr = b"IHDR" + struct.pack(">II", width, height) + bytes(data[24:29])
+    data[12:29] = ihdr
+    data[29:33] = struct.pack(">I", zlib.crc32(ihdr))
+    return bytes(data)
+
+
+def _jpeg_header(width: int, height: int) -> bytes:
+    """A small JPEG whose SOF0 segment declares width x height."""
+    buffer = io.BytesIO()
+    Image.new("RGB", (16, 16)).save(buffer, "JPEG")
+    data = bytearray(buffer.getvalue())
+    sof = data.index(b"\xff\xc0")
+    data[sof + 5:sof + 9] = struct.pack(">HH", height, width)
+    return bytes(data)
+
+
+@pytest.mark.filterwarnings("ignore::PIL.Image.DecompressionBombWarning")
+@pytest.mark.parametrize("data, reduce, rejected", [
+    (_png_header(19000, 19000), None, "bomb"),
+    (_png_header(10000, 10000), None, "pixels"),
+    (_png_header(8000, 8000), 2, None),
+    (_jpeg_header(12000, 12000), 4, None),
+])
+def test_pixel_budget_rejects_or_reduces(monkeypatch, data, reduce, rejected):
+    monkeypatch.setattr(metrics, "ENABLED", True)
+    rejections = {reason: images_rejected.value(reason=reason) for reason in ("bomb", "pixels")}
+    downscales = {factor: images_downscaled.value(factor=factor) for factor in ("2", "4")}
+
+    upload = UploadFile(io.BytesIO(data), filename="chart")
+    if rejected:
+        with pytest.raises(ValueError):
+            asyncio.run(read_upload(upload))
+        rejections[rejected] += 1
+    else:
+        _, header = asyncio.run(read_upload(upload))
+        assert header.reduce == reduce
+        downscales[str(reduce)] += 1
+
+    assert {reason: images_rejected.value(reason=reason) for reason in rejections} == rejections
+    assert {factor: images_downscaled.value(factor=factor) for factor in downscales} == downscales
@@ -0,0 +1,76 @@
+"""
+Load test for the shared-memory WorkerPool.
+
+Checks pool results match in-process analysis, then measures throughput
+with 1, 2, 4, ... worker processes up to the core count.
+
+    python test_worker_pool.py --requests 400
+"""
+import argparse
+import os
+import signal
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from candlestick_analyzer import CandlestickAnalyzer
+from test_concurrency import _strip_timings, draw_chart
+from worker_pool import WorkerPool
+
+
+def run_load(workers: int, requests: int = 200, charts: int = 8) -> float:
+    """Push `requests` analyses through a pool of `workers` processes. Returns analyses/sec."""
+    analyzer = CandlestickAnalyzer()
+    images = [draw_chart(seed, candles=80, width=1600, height=900) for seed in range(charts)]
+    pool = WorkerPool(analyzer.config, workers).start()
+    try:
+        start = time.perf_counter()
+        # Two callers per worker keep every process busy, like the API dispatch threads
+        with ThreadPoolExecutor(max_workers=workers * 2) as callers:
+            list(callers.map(lambda n: pool.analyze(images[n % charts], seed=n), range(requests)))
+        return requests / (time.perf_counter() - start)
+    finally:
+        pool.shutdown()
+
+
+def test_pool_matches_in_process():
+    analyzer = CandlestickAnalyzer()
+    images = [draw_chart(seed) for seed in range(4)]
+    pool = WorkerPool(analyzer.config, workers=2).start()
+    try:
+        for seed, image in enumerate(images):
+            assert _strip_timings(pool.analyze(image, seed=seed)) == _strip_timings(analyzer.analyze(image, seed=seed))
+    finally:
+        pool.shutdown()
+
+
+def test_pool_recovers_from_a_dead_worker():
+    analyzer = CandlestickAnalyzer()
+    image = draw_chart(0)
+    pool = WorkerPool(analyzer.config, workers=1).start()
+    try:
+        os.kill(pool._pool.submit(os.getpid).result(), signal.SIGKILL)
+        assert _strip_timings(pool.analyze(image, seed=0)) == _strip_timings(analyzer.analyze(image, seed=0))
+        stats = pool.stats()
+        assert stats["restarts"] == 1 and stats["running"] and not stats["degraded"]
+    finally:
+        pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    counts = []
+    workers = 1
+    while workers < args.max_workers:
+        counts.append(workers)
+        workers *= 2
+    counts.append(args.max_workers)
+
+    baseline = None
+    for workers in counts:
+        rate = run_load(workers, args.requests)
+        baseline = baseline or rate
+        print(f"{workers:>3} workers: {rate:8.1f} analyses/sec  ({rate / baseline:.2f}x)")
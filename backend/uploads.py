@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException, UploadFile
+from PIL import Image, ImageFile
+
+from metrics import images_downscaled, images_rejected
+from preprocessing import DECODE_REDUCTIONS
+
+logger = logging.getLogger(__name__)
+
+# Largest accepted image file
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(10 * 1024 * 1024)))
+# Largest accepted request body, batches included
+MAX_REQUEST_BYTES = int(os.getenv("MAX_REQUEST_BYTES", str(100 * 1024 * 1024)))
+# Largest accepted job submission, it may carry hundreds of charts
+MAX_JOB_BYTES = int(os.getenv("MAX_JOB_BYTES", str(1024 * 1024 * 1024)))
+# Longest wait for the next chunk of a request body, in seconds
+UPLOAD_RECEIVE_TIMEOUT = float(os.getenv("UPLOAD_RECEIVE_TIMEOUT", "15"))
+# Widest or tallest image accepted, checked from the header
+MAX_IMAGE_SIDE = int(os.getenv("MAX_IMAGE_SIDE", "20000"))
+# Most pixels decoded per image, larger images are decoded at reduced size
+MAX_IMAGE_PIXELS = int(os.getenv("MAX_IMAGE_PIXELS", "24000000"))
+
+# Largest decode reduction per format. JPEGs shrink inside the decoder, other
+# formats are decoded in full first, so they may only exceed the budget 4x.
+_MAX_REDUCTION = {"JPEG": 8}
+_DEFAULT_MAX_REDUCTION = 2
+
+# Bytes read before the image header must have been recognized
+HEADER_PROBE_BYTES = 64 * 1024
+READ_CHUNK_BYTES = 64 * 1024
+# Multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+
+class BodySizeLimitMiddleware:
+    """
+    Enforces request body limits while the body streams in, before anything
+    is parsed or spooled. A declared Content-Length over the limit is refused
+    without reading, a body that grows past it is cut off with 413, and a
+    client that stalls between chunks longer than receive_timeout gets 408.
+    Neither applies once the body is complete, so responses may stream for
+    longer than receive_timeout.
+    """
+
+    def __init__(self, app, max_body_size: int = MAX_REQUEST_BYTES,
+                 path_limits: Optional[Dict[str, int]] = None,
+                 receive_timeout: float = UPLOAD_RECEIVE_TIMEOUT):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_limits = path_limits or {}
+        self.receive_timeout = receive_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] not in ("POST", "PUT", "PATCH"):
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.path_limits.get(scope["path"], self.max_body_size)
+        headers = dict(scope["headers"])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            logger.warning(f"Refusing {scope['path']}: declared body of {int(declared)} bytes exceeds {limit}")
+            await self._reject(send, 413, "Request body too large")
+            return
+
+        received = 0
+        body_complete = False
+
+        async def limited_receive():
+            nonlocal received, body_complete
+            # Once the body is in, receive() only waits for the disconnect, which a
+            # streaming response listens for as long as it streams
+            if body_complete:
+                return await receive()
+            try:
+                message = await asyncio.wait_for(receive(), timeout=self.receive_timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Request body for {scope['path']} stalled, closing")
+                raise HTTPException(status_code=408, detail="Timed out waiting for request body")
+            if message["type"] != "http.request":
+                body_complete = True
+                return message
+            received += len(message.get("body", b""))
+            if received > limit:
+                logger.warning(f"Cutting off {scope['path']}: body exceeds {limit} bytes")
+                raise HTTPException(status_code=413, detail="Request body too large")
+            body_complete = not message.get("more_body", False)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _reject(send, status: int, detail: str):
+        body = ('{"detail": "%s"}' % detail).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": [(b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"connection", b"close")],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+class ImageHeader(NamedTuple):
+    """What an upload's header declares, and the reduction its decode needs."""
+    format: str
+    width: int
+    height: int
+    reduce: int
+
+
+class HeaderProbe:
+    """
+    Recognizes an image from the first bytes of an upload, so unsupported
+    formats and absurd dimensions are rejected before the rest of the file
+    is read back or anything is decoded. By then Starlette has already
+    spooled the whole multipart body; only BodySizeLimitMiddleware acts
+    before buffering. Images over the pixel budget are planned for a
+    reduced-size decode.
+    """
+
+    def __init__(self, max_side: int = MAX_IMAGE_SIDE, max_pixels: int = MAX_IMAGE_PIXELS,
+                 probe_bytes: int = HEADER_PROBE_BYTES):
+        self.max_side = max_side
+        self.max_pixels = max_pixels
+        self.probe_bytes = probe_bytes
+        self.header: Optional[ImageHeader] = None
+        self._parser = ImageFile.Parser()
+        self._fed = 0
+
+    @property
+    def done(self) -> bool:
+        return self.header is not None
+
+    def _reject(self, reason: str, message: str):
+        images_rejected.inc(reason=reason)
+        raise ValueError(message)
+
+    def feed(self, chunk: bytes):
+        """Feed upload bytes until the header is known. Raises ValueError on bad images."""
+        if self.done:
+            return
+        self._fed += len(chunk)
+        try:
+            self._parser.feed(chunk)
+        except Image.DecompressionBombError as e:
+            self._reject("bomb", f"Image dimensions too large: {str(e)}")
+        except Exception as e:
+            self._reject("format", f"Invalid image file: {str(e)}")
+
+        image = self._parser.image
+        if image is not None:
+            # Only the header was needed, drop the partial decode
+            self._parser = None
+            self.header = self._plan(image.format, *image.size)
+        elif self._fed >= self.probe_bytes:
+            self._reject("format", "Invalid image file: unrecognized image format")
+
+    def _plan(self, image_format: str, width: int, height: int) -> ImageHeader:
+        if width > self.max_side or height > self.max_side:
+            self._reject("side", f"Image dimensions {width}x{height} exceed the {self.max_side}px limit")
+        max_reduction = _MAX_REDUCTION.get(image_format, _DEFAULT_MAX_REDUCTION)
+        for reduce in DECODE_REDUCTIONS:
+            if reduce > max_reduction:
+                break
+            if width * height <= self.max_pixels * reduce * reduce:
+                if reduce > 1:
+                    images_downscaled.inc(factor=reduce)
+                    logger.info(f"Decoding {width}x{height} {image_format} at 1/{reduce} size")
+                return ImageHeader(image_format, width, height, reduce)
+        self._reject("pixels", f"Image of {width * height} pixels exceeds the {self.max_pixels} pixel budget")
+
+    def finish(self) -> ImageHeader:
+        """The header of the whole upload, which must be a recognizable image."""
+        if not self.done:
+            self._reject("format", "Invalid image file: unrecognized image format")
+        return self.header
+
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[bytearray, ImageHeader]:
+    """
+    Read an upload in chunks, enforcing max_bytes as it grows and validating
+    the image header from the first chunks. Returns the bytes in one
+    buffer that decoding wraps without copying, and the header.
+    """
+    limit_mb = max_bytes // (1024 * 1024)
+    if file.size is not None and file.size > max_bytes:
+        raise ValueError(f"File size exceeds {limit_mb}MB limit")
+
+    buffer = bytearray()
+    probe = HeaderProbe()
+    while True:
+        chunk = await file.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        if len(buffer) + len(chunk) > max_bytes:
+            raise ValueError(f"File size exceeds {limit_mb}MB limit")
+        buffer += chunk
+        probe.feed(chunk)
+
+    if not buffer:
+        raise ValueError("File is empty")
+    return buffer, probe.finish()
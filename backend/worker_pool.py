@@ -0,0 +1,165 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from candlestick_analyzer import AnalyzerConfig, CandlestickAnalyzer
+
+logger = logging.getLogger(__name__)
+
+# Per-process state of a pool worker, set by _init_worker
+_worker_analyzer: Optional[CandlestickAnalyzer] = None
+_worker_barrier = None
+
+
+def _warmup_image() -> np.ndarray:
+    """A small chart that runs every extraction and scoring stage once."""
+    image = np.full((240, 400, 3), 255, dtype=np.uint8)
+    for i in range(20):
+        x = 20 + i * 18
+        y = 120 + int(40 * np.sin(i / 3))
+        color = (0, 160, 0) if i % 3 else (200, 0, 0)
+        cv2.line(image, (x + 3, y - 15), (x + 3, y + 45), color, 1)
+        cv2.rectangle(image, (x, y), (x + 7, y + 30), color, -1)
+    return image
+
+
+def _init_worker(config: AnalyzerConfig, barrier):
+    """Build the worker's analyzer and warm up OpenCV and NumPy code paths."""
+    global _worker_analyzer, _worker_barrier
+    # One OpenCV thread per worker, the pool provides the parallelism
+    cv2.setNumThreads(1)
+    _worker_analyzer = CandlestickAnalyzer(config)
+    _worker_barrier = barrier
+    image = _warmup_image()
+    _worker_analyzer.analyze(image if _worker_analyzer.needs_color else cv2.cvtColor(image, cv2.COLOR_RGB2GRAY), seed=0)
+
+
+def _worker_ready(timeout: float) -> int:
+    # Every worker blocks here until all of them exist, so start() forks the whole pool
+    _worker_barrier.wait(timeout)
+    return os.getpid()
+
+
+def _analyze_shared(name: str, shape: tuple, dtype: str, seed: Optional[int]) -> Dict:
+    """Analyze an image the API process placed in shared memory."""
+    # Attaching registers the name with the resource tracker the workers share
+    # with the API process, which owns the segment and unlinks it
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        image = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        try:
+            return _worker_analyzer.analyze(image, seed=seed)
+        finally:
+            del image
+    finally:
+        shm.close()
+
+
+class WorkerPool:
+    """
+    Pre-forked analyzer processes fed through shared memory.
+    The API process copies each decoded frame into a shared-memory segment
+    and sends workers only its name, shape and dtype, so no image is
+    pickled. Workers are spawned and warmed up by start(). If a worker dies,
+    the pool is rebuilt and the analysis retried once.
+    """
+
+    def __init__(self, config: AnalyzerConfig, workers: Optional[int] = None):
+        self.config = config
+        self.workers = workers or os.cpu_count() or 1
+        self._context = multiprocessing.get_context("spawn")
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._timeout = 120.0
+        self.completed = 0
+        # Workers that finished warming up in the last start, and pool rebuilds after a worker died
+        self.ready = 0
+        self.restarts = 0
+
+    def start(self, timeout: float = 120) -> "WorkerPool":
+        """
+        Spawn and warm up every worker, returning once all are ready or
+        timeout passed. A pool with only some workers ready is reported as
+        degraded; raises RuntimeError if none are.
+        """
+        self._timeout = timeout
+        with self._lock:
+            self._spawn()
+        if not self.ready:
+            raise RuntimeError(f"No pool worker was ready within {timeout:g}s")
+        return self
+
+    def _spawn(self):
+        start = time.perf_counter()
+        # A barrier has a fixed number of parties, each pool gets a fresh one
+        barrier = self._context.Barrier(self.workers)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=self._context,
+            initializer=_init_worker, initargs=(self.config, barrier),
+        )
+        ready = [self._pool.submit(_worker_ready, self._timeout) for _ in range(self.workers)]
+        done, _ = wait(ready, timeout=self._timeout)
+        self.ready = len({future.result() for future in done if future.exception() is None})
+        elapsed = time.perf_counter() - start
+        if self.ready < self.workers:
+            logger.error(f"Worker pool degraded: {self.ready} of {self.workers} workers ready after {elapsed:.1f}s")
+        else:
+            logger.info(f"Worker pool ready: {self.ready} workers in {elapsed:.1f}s")
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        with self._lock:
+            # Callers that hit the same broken pool restart it only once
+            if self._pool is not broken:
+                return
+            logger.error("A pool worker died, restarting the worker pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self.restarts += 1
+            self._spawn()
+
+    def analyze(self, image: np.ndarray, seed: Optional[int] = None) -> Dict:
+        """Analyze image on a worker. Blocks the calling thread until done."""
+        if self._pool is None:
+            raise RuntimeError("WorkerPool.start() has not been called")
+        shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+        try:
+            np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+            for attempt in range(2):
+                pool = self._pool
+                try:
+                    result = pool.submit(_analyze_shared, shm.name, image.shape, image.dtype.str, seed).result()
+                    break
+                except BrokenProcessPool:
+                    # One dead worker breaks the whole executor, rebuild it and retry once
+                    self._restart(pool)
+                    if attempt:
+                        raise
+        finally:
+            shm.close()
+            shm.unlink()
+        with self._lock:
+            self.completed += 1
+        return result
+
+    def stats(self) -> Dict:
+        return {
+            "workers": self.workers,
+            "ready": self.ready,
+            "running": self._pool is not None and self.ready > 0,
+            "degraded": self.ready < self.workers,
+            "restarts": self.restarts,
+            "completed": self.completed,
+        }
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+            self._pool = None